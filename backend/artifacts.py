@@ -0,0 +1,79 @@
+import hashlib
+import os
+import re
+import threading
+
+ARTIFACT_DIR = os.path.join("generated_images", "artifacts")
+ARTIFACT_URL_PREFIX = "/artifacts"
+# A name is its content hash, so a URL never changes meaning: cache it forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".bin": "application/octet-stream",
+}
+ARTIFACT_NAME = re.compile(r"^[0-9a-f]{32}(\.png|\.jpg|\.webp|\.bin)$")
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value covers `etag` (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == target:
+            return True
+    return False
+
+
+class ArtifactStore:
+    """
+    Generated files (visualizations, ...) stored under their content hash.
+
+    put() is idempotent: the same bytes always get the same name and are
+    written once, so repeat results share one file and one browser/CDN cache
+    entry. Files are written to a temporary name and renamed into place, so a
+    reader never sees a partial file.
+    """
+
+    def __init__(self, directory=ARTIFACT_DIR, url_prefix=ARTIFACT_URL_PREFIX):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, data, extension=".png"):
+        """Store `data` and return its artifact name"""
+        if extension not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported artifact type '{extension}'")
+        name = hashlib.sha256(data).hexdigest()[:32] + extension
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return name
+
+    def url(self, name):
+        return f"{self.url_prefix}/{name}"
+
+    def path(self, name):
+        """File path of an existing artifact, or None (also for anything that is not an artifact name)"""
+        if not ARTIFACT_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    @staticmethod
+    def etag(name):
+        # Strong: the name is a hash of the exact bytes
+        return f'"{name.split(".")[0]}"'
+
+    @staticmethod
+    def media_type(name):
+        return MEDIA_TYPES[os.path.splitext(name)[1]]
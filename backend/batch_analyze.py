@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Offline batch analysis of an image archive with KolamAIProcessor.
+
+Walks one or more directory trees and runs the pipeline over every image in a
+process pool (one single-threaded worker per usable core), streaming one
+record per image to JSONL or Parquet. The output doubles as the checkpoint:
+a rerun with the same --out skips every image already recorded, so an
+interrupted run resumes where it stopped.
+
+    jsonl    one JSON object per line, appended and flushed per image
+    parquet  a directory of part-NNNNN.parquet files, committed atomically
+             every --part-size images (needs pyarrow)
+
+With --retry-errors a failed image gets a new record; the latest one wins.
+
+Usage:
+    python batch_analyze.py ../kolam ../abhi --out data/batch/analysis.jsonl
+    python batch_analyze.py /archive --out data/batch/archive.parquet --workers 32
+    python batch_analyze.py ../kolam --out data/batch/kolam.jsonl --visualizations data/batch/png
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import runtime_budget
+from kolam_types import DEFAULT_CONFIG, load_config
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+PROGRESS_INTERVAL = 2.0     # seconds between progress lines when stderr is not a terminal
+
+
+def find_images(roots):
+    """Every image under `roots`, sorted, as normalised paths (the record keys)"""
+    paths = []
+    for root in roots:
+        if os.path.isfile(root):
+            paths.append(os.path.normpath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.normpath(os.path.join(dirpath, filename)))
+    return paths
+
+
+# ---------- Workers ----------
+
+_visualization_dir = None
+_config = None
+
+
+def _worker_init(visualization_dir, config):
+    global _visualization_dir, _config
+    _visualization_dir = visualization_dir
+    _config = config
+    import cv2
+    # One OpenCV thread per process; the pool already provides the parallelism
+    cv2.setNumThreads(1)
+    # Ctrl-C reaches the whole process group; only the parent handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The pipeline reports every step on stdout
+    sys.stdout = open(os.devnull, "w")
+
+
+def analyze_file(path):
+    """Worker: run the pipeline on one file and return its record"""
+    from kolam_processor import analyze
+
+    start = time.perf_counter()
+    record = {"path": path}
+    try:
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        result = analyze(image_bytes, _config, outputs=["visualization"] if _visualization_dir else ())
+        record["bytes"] = len(image_bytes)
+        record.update(result.to_dict())
+        if _visualization_dir:
+            name = path.replace(os.sep, "__").lstrip("._") + ".png"
+            with open(os.path.join(_visualization_dir, name), "wb") as f:
+                f.write(result.visualization)
+            record["visualization"] = name
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+# ---------- Output ----------
+
+class JsonlWriter:
+    """Appends one line per record; the existing lines are the checkpoint"""
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.done = set()
+        self.failed = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            self._recover()
+        self.file = open(path, "a")
+
+    def _recover(self):
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            # A crash can leave a partial last line; drop it
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            if line.strip():
+                record = json.loads(line)
+                (self.failed if "error" in record else self.done).add(record["path"])
+
+    def write(self, record):
+        if record.get("strokes") is not None:
+            record = dict(record, strokes=base64.b64encode(record["strokes"]).decode("ascii"))
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Buffers records and commits them as numbered part files; committed parts are the checkpoint"""
+
+    def __init__(self, path, restart=False, part_size=500):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use a .jsonl --out instead")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.part_size = part_size
+        self.buffer = []
+        self.done = set()
+        self.failed = set()
+        self.schema = pa.schema([
+            ("path", pa.string()),
+            ("error", pa.string()),
+            ("bytes", pa.int64()),
+            ("width", pa.int32()),
+            ("height", pa.int32()),
+            ("grid_size", pa.int32()),
+            ("dot_count", pa.int32()),
+            ("dots", pa.list_(pa.list_(pa.int32()))),
+            ("stroke_count", pa.int32()),
+            ("strokes", pa.binary()),
+            ("symmetry", pa.string()),            # JSON
+            ("lissajous_fit", pa.string()),       # JSON
+            ("tiles", pa.string()),               # tile_encoding text form
+            ("palette", pa.string()),             # JSON
+            ("stage_timings_ms", pa.string()),    # JSON
+            ("visualization", pa.string()),
+            ("elapsed_ms", pa.float64()),
+        ])
+
+        if restart:
+            for part in glob.glob(os.path.join(path, "part-*.parquet")):
+                os.remove(part)
+        os.makedirs(path, exist_ok=True)
+        self.parts = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        for part in self.parts:
+            table = pq.read_table(part, columns=["path", "error"])
+            for record_path, error in zip(table.column("path").to_pylist(), table.column("error").to_pylist()):
+                (self.failed if error else self.done).add(record_path)
+
+    def write(self, record):
+        row = dict(record)
+        for key in ("symmetry", "lissajous_fit", "palette", "stage_timings_ms"):
+            if row.get(key) is not None:
+                row[key] = json.dumps(row[key])
+        self.buffer.append(row)
+        if len(self.buffer) >= self.part_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        part = os.path.join(self.path, f"part-{len(self.parts):05d}.parquet")
+        table = self.pa.Table.from_pylist(self.buffer, schema=self.schema)
+        self.pq.write_table(table, part + ".tmp", compression="zstd")
+        os.replace(part + ".tmp", part)
+        self.parts.append(part)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def open_writer(path, output_format, restart, part_size):
+    if output_format is None:
+        output_format = "parquet" if path.endswith(".parquet") else "jsonl"
+    if output_format == "parquet":
+        return ParquetWriter(path, restart, part_size)
+    return JsonlWriter(path, restart)
+
+
+# ---------- Progress ----------
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Progress:
+    """Throughput and ETA over this run's completions (resumed images are not counted)"""
+
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self.completed = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+        self.last_report = 0.0
+
+    def update(self, record):
+        self.completed += 1
+        if "error" in record:
+            self.errors += 1
+        now = time.perf_counter()
+        if self.interactive or now - self.last_report >= PROGRESS_INTERVAL or self.completed == self.total:
+            self.last_report = now
+            self.report(now)
+
+    def line(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.start
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.completed
+        eta = _format_duration(remaining / rate) if rate > 0 else "?"
+        percent = 100 * self.completed / self.total if self.total else 100.0
+        return (f"{self.completed}/{self.total} ({percent:.1f}%)  {rate:.2f} img/s  "
+                f"ETA {eta}  errors {self.errors}")
+
+    def report(self, now=None):
+        if self.interactive:
+            self.stream.write("\r⏳ " + self.line(now) + "   ")
+        else:
+            self.stream.write("⏳ " + self.line(now) + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.interactive:
+            self.stream.write("\n")
+
+
+# ---------- Driver ----------
+
+def run_batch(roots, out, output_format=None, workers=None, restart=False, retry_errors=False,
+              part_size=500, visualization_dir=None, limit=None, config=DEFAULT_CONFIG):
+    """Analyse every image under `roots` not yet in `out`; returns (completed, errors)"""
+    writer = open_writer(out, output_format, restart, part_size)
+    skip = writer.done if retry_errors else writer.done | writer.failed
+    paths = [p for p in find_images(roots) if p not in skip]
+    if limit is not None:
+        paths = paths[:limit]
+    if visualization_dir:
+        os.makedirs(visualization_dir, exist_ok=True)
+
+    if workers is None:
+        workers = max(1, int(runtime_budget.detect_cpus()[0]))
+    print(f"📂 {len(paths)} images to analyse ({len(skip)} already in {out}), {workers} workers")
+    if not paths:
+        writer.close()
+        return 0, 0
+
+    progress = Progress(len(paths))
+    queue = iter(paths)
+    max_pending = workers * 4
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(visualization_dir, config))
+    try:
+        pending = set()
+        while True:
+            for path in queue:
+                pending.add(pool.submit(analyze_file, path))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                writer.write(record)
+                progress.update(record)
+    except KeyboardInterrupt:
+        progress.finish()
+        print(f"⏸️  Interrupted after {progress.completed} images; rerun with the same --out to resume")
+        # Running images finish (and are redone on resume); queued ones are dropped
+        pool.shutdown(cancel_futures=True)
+        raise
+    finally:
+        writer.close()
+    pool.shutdown()
+    progress.finish()
+
+    elapsed = time.perf_counter() - progress.start
+    print(f"✅ Batch complete - {progress.completed} images in {_format_duration(elapsed)} "
+          f"({progress.completed / max(elapsed, 1e-6):.2f} img/s), {progress.errors} errors")
+    return progress.completed, progress.errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse an image archive with the Kolam pipeline")
+    parser.add_argument("roots", nargs="+", help="Directories (walked recursively) or image files")
+    parser.add_argument("--out", required=True, help="Output .jsonl file or .parquet directory; also the checkpoint")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="Output format (default: from --out)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all usable cores)")
+    parser.add_argument("--restart", action="store_true", help="Discard existing results instead of resuming")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run images that failed last time")
+    parser.add_argument("--part-size", type=int, default=500, help="Images per Parquet part file")
+    parser.add_argument("--visualizations", help="Also write each composite PNG into this directory")
+    parser.add_argument("--limit", type=int, help="Analyse at most this many new images")
+    parser.add_argument("--config", help="Preset name (see presets/) or KolamConfig JSON file")
+    args = parser.parse_args()
+
+    config = load_config(args.config) if args.config else DEFAULT_CONFIG
+
+    try:
+        run_batch(
+            args.roots,
+            args.out,
+            output_format=args.format,
+            workers=args.workers,
+            restart=args.restart,
+            retry_errors=args.retry_errors,
+            part_size=args.part_size,
+            visualization_dir=args.visualizations,
+            limit=args.limit,
+            config=config,
+        )
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
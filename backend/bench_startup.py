@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark: cold vs warmed-up first request.
+
+Each run starts a fresh Python process that imports `main`, optionally runs
+the warm-up hook, and then sends a few /predict requests in-process through
+the ASGI app (starlette's TestClient, needs httpx from requirements-dev.txt).
+The near-duplicate index is off, or every repeat would be a cache hit. The
+report compares the first request against the steady-state median, which is
+what an autoscaled replica's first real user sees.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 5 --requests 10 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run_child(mode, requests):
+    """Runs inside the fresh process and prints one JSON line of timings"""
+    os.environ["KOLAM_WARMUP"] = "0"  # the benchmark triggers warm-up itself
+    os.environ["KOLAM_DUPLICATE_INDEX"] = "0"  # repeats of one image must run the pipeline
+
+    start = time.perf_counter()
+    import main
+    from starlette.testclient import TestClient
+    from startup import synthetic_kolam_image
+    import_ms = (time.perf_counter() - start) * 1000
+
+    warmup_ms = 0.0
+    if mode == "warm":
+        start = time.perf_counter()
+        main.run_warmup()
+        warmup_ms = (time.perf_counter() - start) * 1000
+
+    # A different image than the warm-up one, so nothing is trivially reused
+    image_bytes = synthetic_kolam_image(grid_size=4, size=480)
+
+    client = TestClient(main.app)
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.post("/predict", files={"file": ("bench.jpg", image_bytes, "image/jpeg")})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({
+        "mode": mode,
+        "import_ms": import_ms,
+        "warmup_ms": warmup_ms,
+        "first_request_ms": latencies[0],
+        "steady_state_ms": statistics.median(latencies[1:]) if len(latencies) > 1 else latencies[0],
+    }))
+
+
+def spawn(mode, requests):
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--requests", str(requests)],
+        capture_output=True, text=True, env=env, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    # The pipeline prints progress; the timings are the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start and warm-up of the Kolam backend")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per mode")
+    parser.add_argument("--requests", type=int, default=6, help="Requests per process")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, max(1, args.requests))
+        return
+
+    summary = {}
+    for mode in ("cold", "warm"):
+        runs = [spawn(mode, max(2, args.requests)) for _ in range(args.runs)]
+        summary[mode] = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in ("import_ms", "warmup_ms", "first_request_ms", "steady_state_ms")
+        }
+        summary[mode]["first_vs_steady"] = round(
+            summary[mode]["first_request_ms"] / max(summary[mode]["steady_state_ms"], 1e-6), 2
+        )
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print("⏱️  Startup benchmark (median of", args.runs, "fresh processes per mode)")
+    print(f"{'mode':<6} {'import':>9} {'warm-up':>9} {'1st req':>9} {'steady':>9} {'1st/steady':>11}")
+    for mode, s in summary.items():
+        print(f"{mode:<6} {s['import_ms']:>7.1f}ms {s['warmup_ms']:>7.1f}ms "
+              f"{s['first_request_ms']:>7.1f}ms {s['steady_state_ms']:>7.1f}ms {s['first_vs_steady']:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
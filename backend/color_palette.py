@@ -0,0 +1,141 @@
+import time
+
+import cv2
+import numpy as np
+
+WORKING_SIZE = 256          # longest side of the label map; masks come back at this resolution
+SAMPLE_PIXELS = 4096        # pixels clustered; the rest of the working image is only assigned
+BATCH_SIZE = 256            # mini-batch k-means batch
+ITERATIONS = 60             # mini-batches
+MERGE_DELTA_E = 12.0        # clusters closer than this (CIE76) are one colour
+MIN_COVERAGE = 0.005        # colours covering less of the image are dropped
+
+
+def _working_lab(original_img):
+    """The image at WORKING_SIZE as float LAB (L 0-100, a/b about -128-127)"""
+    height, width = original_img.shape[:2]
+    # Cheap strided pick first so INTER_AREA never touches a full-resolution image
+    step = max(1, min(height, width) // (4 * WORKING_SIZE))
+    reduced = original_img[::step, ::step]
+    scale = min(1.0, WORKING_SIZE / max(reduced.shape[:2]))
+    size = (max(1, round(reduced.shape[1] * scale)), max(1, round(reduced.shape[0] * scale)))
+    small = cv2.resize(reduced, size, interpolation=cv2.INTER_AREA) if scale < 1.0 else reduced
+    return cv2.cvtColor(small.astype(np.float32) / 255.0, cv2.COLOR_BGR2LAB)
+
+
+def _nearest(pixels, centers):
+    """Index of the nearest centre for each (N, 3) pixel"""
+    distances = (pixels * pixels).sum(axis=1)[:, None] - 2 * pixels @ centers.T + (centers * centers).sum(axis=1)
+    return distances.argmin(axis=1)
+
+
+def _kmeans_plus_plus(sample, k, rng):
+    centers = [sample[rng.integers(len(sample))]]
+    closest = ((sample - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            break
+        centers.append(sample[rng.choice(len(sample), p=closest / total)])
+        closest = np.minimum(closest, ((sample - centers[-1]) ** 2).sum(axis=1))
+    return np.array(centers, dtype=np.float32)
+
+
+def minibatch_kmeans(sample, k, rng):
+    """
+    Mini-batch k-means (Sculley 2010): each batch pulls its pixels' centres
+    towards them with a per-centre learning rate of 1 / pixels seen so far.
+    """
+    centers = _kmeans_plus_plus(sample, k, rng)
+    k = len(centers)
+    seen = np.zeros(k)
+    batches = sample[rng.integers(len(sample), size=(ITERATIONS, BATCH_SIZE))]
+    for batch in batches:
+        labels = _nearest(batch, centers)
+        members = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, batch[:, channel], minlength=k) for channel in range(3)], axis=1)
+        hit = members > 0
+        seen += members
+        # Moving each centre by count/seen towards its batch mean is the per-pixel 1/seen update, batched
+        rate = members[hit] / seen[hit]
+        centers[hit] += (rate[:, None] * (sums[hit] / members[hit, None] - centers[hit])).astype(np.float32)
+    return centers
+
+
+def _merge_close(centers, counts):
+    """Merge centres within MERGE_DELTA_E of each other, weighted by pixel count"""
+    centers, counts = list(centers), list(counts)
+    while len(centers) > 1:
+        array = np.array(centers)
+        distances = np.linalg.norm(array[:, None] - array[None], axis=2)
+        np.fill_diagonal(distances, np.inf)
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        if distances[i, j] >= MERGE_DELTA_E:
+            break
+        total = counts[i] + counts[j]
+        centers[i] = (centers[i] * counts[i] + centers[j] * counts[j]) / max(total, 1)
+        counts[i] = total
+        del centers[j], counts[j]
+    return np.array(centers, dtype=np.float32)
+
+
+def analyze_palette(original_img, colors=6, seed=0):
+    """
+    Dominant colours of an image and where they are.
+
+    Mini-batch k-means in LAB on SAMPLE_PIXELS pixels of the image downsampled
+    to WORKING_SIZE; every working pixel is then assigned to its nearest
+    colour. Returns (palette, labels): palette["colors"] is sorted by coverage,
+    each {hex, rgb, lab, coverage}; labels is a uint8 map at working
+    resolution indexing into it (see region_masks).
+    """
+    start = time.perf_counter()
+    lab = _working_lab(original_img)
+    pixels = lab.reshape(-1, 3)
+    rng = np.random.default_rng(seed)
+    sample = pixels if len(pixels) <= SAMPLE_PIXELS else pixels[rng.choice(len(pixels), SAMPLE_PIXELS, replace=False)]
+
+    centers = minibatch_kmeans(sample, colors, rng)
+    counts = np.bincount(_nearest(sample, centers), minlength=len(centers))
+    centers = _merge_close(centers[counts > 0], counts[counts > 0])
+
+    labels = _nearest(pixels, centers)
+    coverage = np.bincount(labels, minlength=len(centers)) / len(pixels)
+    keep = coverage >= min(MIN_COVERAGE, coverage.max())
+    if not keep.all():
+        # Pixels of dropped colours go to the nearest colour that is kept
+        centers = centers[keep]
+        labels = _nearest(pixels, centers)
+        coverage = np.bincount(labels, minlength=len(centers)) / len(pixels)
+
+    # Sort by coverage and relabel so that label i is colour i of the palette
+    order = np.argsort(-coverage, kind="stable")
+    relabel = np.empty(len(order), dtype=np.uint8)
+    relabel[order] = np.arange(len(order))
+    labels = relabel[labels].reshape(lab.shape[:2])
+    centers, coverage = centers[order], coverage[order]
+
+    bgr = cv2.cvtColor(centers.reshape(1, -1, 3), cv2.COLOR_LAB2BGR).reshape(-1, 3)
+    rgb = np.clip(np.round(bgr[:, ::-1] * 255), 0, 255).astype(int)
+    palette = {
+        "colors": [
+            {
+                "hex": "#{:02X}{:02X}{:02X}".format(*color),
+                "rgb": color.tolist(),
+                "lab": [round(float(v), 1) for v in center],
+                "coverage": round(float(fraction), 4),
+            }
+            for color, center, fraction in zip(rgb, centers, coverage)
+        ],
+        "working_size": [int(lab.shape[1]), int(lab.shape[0])],
+        "sample_pixels": len(sample),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    return palette, labels
+
+
+def region_masks(labels, count=None):
+    """One uint8 0/255 mask per palette colour, at the label map's resolution"""
+    if count is None:
+        count = int(labels.max()) + 1 if labels.size else 0
+    return [np.where(labels == index, 255, 0).astype(np.uint8) for index in range(count)]
@@ -0,0 +1,115 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# PNG zlib level for the composite: 1 is fastest, 9 smallest. PIL used 6.
+PNG_COMPRESSION = int(os.environ.get("KOLAM_PNG_COMPRESSION", "3"))
+
+TITLE_FONT = cv2.FONT_HERSHEY_SIMPLEX
+TITLE_SCALE = 0.8
+TITLE_THICKNESS = 2
+TITLE_ORIGIN = (10, 35)
+
+# (title, BGR colour) per panel, row-major; "{dots}" is filled in per request
+STEP9_LAYOUT = (
+    ("1. Original Image", (255, 255, 255)),
+    ("2. Grayscale", (255, 255, 255)),
+    ("3. Detected Dots ({dots})", (0, 255, 0)),
+    ("4. Skeleton Pattern", (255, 255, 255)),
+    ("5. Mathematical Curves", (255, 100, 255)),
+    ("6. Enhanced Recreation", (255, 255, 0)),
+)
+
+
+class TitleOverlay:
+    """
+    A title rasterised once as an alpha mask over a small box. putText
+    antialiases, so applying it is a blend; with the colour term premultiplied
+    the result is bit-identical to calling putText on the panel.
+    """
+
+    def __init__(self, text, color):
+        (text_width, text_height), baseline = cv2.getTextSize(text, TITLE_FONT, TITLE_SCALE, TITLE_THICKNESS)
+        x, y = TITLE_ORIGIN
+        pad = TITLE_THICKNESS + 2
+        self.top = max(0, y - text_height - pad)
+        self.left = max(0, x - pad)
+        alpha = np.zeros((y + baseline + pad - self.top, x + text_width + pad - self.left), dtype=np.uint8)
+        cv2.putText(alpha, text, (x - self.left, y - self.top), TITLE_FONT, TITLE_SCALE, 255, TITLE_THICKNESS)
+        alpha = alpha.astype(np.uint32)[..., None]
+        self.inverse = 255 - alpha
+        self.premultiplied = np.array(color, dtype=np.uint32) * alpha + 127
+
+    def apply(self, panel):
+        height, width = self.inverse.shape[:2]
+        region = panel[self.top:self.top + height, self.left:self.left + width]
+        rows, columns = region.shape[:2]
+        region[...] = (region * self.inverse[:rows, :columns] + self.premultiplied[:rows, :columns]) // 255
+
+
+class CompositeRenderer:
+    """
+    Grid compositor for the step 9 visualization.
+
+    Titles are rasterised once per layout (the dots-count title once per
+    count) and the output canvas is allocated once per thread, so a render
+    only copies the panels in, stamps the cached title masks and encodes the
+    canvas straight to PNG with cv2.imencode.
+    """
+
+    def __init__(self, panel_size, layout=STEP9_LAYOUT, columns=3, compression=PNG_COMPRESSION):
+        self.panel_size = panel_size
+        self.layout = layout
+        self.columns = columns
+        self.rows = -(-len(layout) // columns)
+        self.encode_params = [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+        self._titles = {}
+        self._titles_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _title(self, index, **fields):
+        text, color = self.layout[index]
+        text = text.format(**fields)
+        overlay = self._titles.get(text)
+        if overlay is None:
+            with self._titles_lock:
+                overlay = self._titles.setdefault(text, TitleOverlay(text, color))
+        return overlay
+
+    def _canvas(self):
+        # One canvas per thread: parallel requests render concurrently
+        canvas = getattr(self._local, "canvas", None)
+        if canvas is None:
+            size = self.panel_size
+            canvas = np.empty((self.rows * size, self.columns * size, 3), dtype=np.uint8)
+            self._local.canvas = canvas
+        return canvas
+
+    def panel(self, canvas, index):
+        size = self.panel_size
+        row, column = divmod(index, self.columns)
+        return canvas[row * size:(row + 1) * size, column * size:(column + 1) * size]
+
+    def render(self, panels, **fields):
+        """
+        Composite `panels` (row-major; BGR, or single-channel which is broadcast
+        to grey) and return the PNG bytes. Missing panels (and None) are left
+        black, with their title.
+        """
+        canvas = self._canvas()
+        if len(panels) < len(self.layout):
+            canvas.fill(0)
+        for index, content in enumerate(panels):
+            target = self.panel(canvas, index)
+            if content is None:
+                target.fill(0)
+            else:
+                target[...] = content[..., None] if content.ndim == 2 else content
+            self._title(index, **fields).apply(target)
+
+        ok, encoded = cv2.imencode(".png", canvas, self.encode_params)
+        if not ok:
+            raise ValueError("Could not encode visualization")
+        return encoded.tobytes()
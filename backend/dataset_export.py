@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Export the consented `dataset_contributions` as memory-mappable training shards.
+
+Images are decoded and letterboxed to a fixed size in a process pool, then
+written as uint8 `.npy` shards (one JSONL metadata file per shard) together
+with an `index.json` manifest. Exports are incremental: the manifest keeps a
+(timestamp, id) watermark and every shard is committed atomically, so an
+interrupted run simply resumes after the last committed shard. A partial
+last shard is filled up by the next run, so every shard but the last holds
+exactly `shard_size` images.
+
+Usage:
+    python dataset_export.py --out data/training_export
+    python dataset_export.py --out data/training_export --size 128 --grayscale
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+DB_PATH = "kolamlab.db"
+INDEX_FILENAME = "index.json"
+INDEX_VERSION = 1
+
+
+def letterbox(img, size, pad_value=255):
+    """Resize keeping aspect ratio and pad to a size x size square"""
+    h, w = img.shape[:2]
+    scale = size / max(h, w)
+    new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(img, (new_w, new_h), interpolation=interpolation)
+
+    out_shape = (size, size) + img.shape[2:]
+    out = np.full(out_shape, pad_value, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    out[top:top + new_h, left:left + new_w] = resized
+    return out
+
+
+def decode_contribution(args):
+    """Worker: decode one contribution image into a fixed-size uint8 array (or None)"""
+    path, size, grayscale = args
+    if not path or not os.path.exists(path):
+        return None
+
+    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    img = cv2.imread(path, flag)
+    if img is None:
+        return None
+    if not grayscale:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return letterbox(img, size)
+
+
+def _worker_init():
+    # One OpenCV thread per process; the pool already provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def load_index(out_dir):
+    path = os.path.join(out_dir, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def fetch_new_contributions(db_path, watermark, limit):
+    """Rows strictly after the (timestamp, id) watermark, oldest first"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT id, svg, original_image_path, confidence, tags, region, timestamp, consent_version "
+            "FROM dataset_contributions "
+            "WHERE (COALESCE(timestamp, ''), id) > (?, ?) "
+            "ORDER BY COALESCE(timestamp, ''), id LIMIT ?",
+            (watermark["timestamp"], watermark["id"], limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def export_contributions(db_path=DB_PATH, out_dir="data/training_export", size=256,
+                         grayscale=False, shard_size=512, workers=None, image_root="."):
+    """Export every contribution newer than the stored watermark; returns the updated index"""
+    os.makedirs(out_dir, exist_ok=True)
+    index = load_index(out_dir)
+    sample_shape = [size, size] if grayscale else [size, size, 3]
+
+    if index is None:
+        index = {
+            "version": INDEX_VERSION,
+            "sample_shape": sample_shape,
+            "dtype": "uint8",
+            "shard_size": shard_size,
+            "watermark": {"timestamp": "", "id": ""},
+            "shards": [],
+            "skipped": [],
+            "total": 0,
+        }
+    elif index["sample_shape"] != sample_shape:
+        raise ValueError(
+            f"Existing export in {out_dir} uses samples of shape {index['sample_shape']}, "
+            f"not {sample_shape}; export to a new directory instead"
+        )
+
+    shard_size = index["shard_size"]
+    workers = workers or os.cpu_count() or 1
+    start = time.time()
+    exported = 0
+
+    print(f"📦 Exporting contributions from {db_path} to {out_dir} ({workers} workers)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+        while True:
+            # A partial last shard (the previous run ran out of rows) is topped up before a new one starts
+            last = index["shards"][-1] if index["shards"] else None
+            resumed = last if last is not None and last["count"] < shard_size else None
+            kept = resumed["count"] if resumed else 0
+
+            rows = fetch_new_contributions(db_path, index["watermark"], shard_size - kept)
+            if not rows:
+                break
+
+            jobs = [
+                (os.path.join(image_root, row["original_image_path"] or ""), size, grayscale)
+                for row in rows
+            ]
+            chunksize = max(1, len(jobs) // (workers * 4))
+
+            shard_number = len(index["shards"]) - (1 if resumed else 0)
+            shard_name = f"shard_{shard_number:05d}"
+            npy_path = os.path.join(out_dir, shard_name + ".npy")
+            meta_path = os.path.join(out_dir, shard_name + ".jsonl")
+
+            # Fill the shard in place on disk instead of holding it in memory
+            images = np.lib.format.open_memmap(
+                npy_path + ".tmp", mode="w+", dtype=np.uint8, shape=tuple([kept + len(rows)] + sample_shape)
+            )
+            count = kept
+            with open(meta_path + ".tmp", "w") as meta_file:
+                if resumed:
+                    # Rewrite the committed rows; the old files stay valid until the replace below
+                    images[:kept] = np.load(npy_path, mmap_mode="r")[:kept]
+                    with open(meta_path) as old_meta:
+                        for _, line in zip(range(kept), old_meta):
+                            meta_file.write(line)
+                for row, img in zip(rows, pool.map(decode_contribution, jobs, chunksize=chunksize)):
+                    if img is None:
+                        index["skipped"].append(row["id"])
+                        continue
+                    images[count] = img
+                    row["tags"] = json.loads(row["tags"]) if row["tags"] else []
+                    meta_file.write(json.dumps(row) + "\n")
+                    count += 1
+            images.flush()
+            del images
+
+            # Commit the shard files before advancing the watermark
+            os.replace(npy_path + ".tmp", npy_path)
+            os.replace(meta_path + ".tmp", meta_path)
+
+            if resumed:
+                resumed["count"] = count
+                resumed["last_timestamp"] = rows[-1]["timestamp"]
+            else:
+                index["shards"].append({
+                    "file": shard_name + ".npy",
+                    "metadata": shard_name + ".jsonl",
+                    "count": count,
+                    "first_timestamp": rows[0]["timestamp"],
+                    "last_timestamp": rows[-1]["timestamp"],
+                })
+            count -= kept
+            index["total"] += count
+            index["watermark"] = {"timestamp": rows[-1]["timestamp"] or "", "id": rows[-1]["id"]}
+            _write_json_atomic(os.path.join(out_dir, INDEX_FILENAME), index)
+
+            exported += count
+            elapsed = time.time() - start
+            print(f"✓ {shard_name}: {count}/{len(rows)} images{' appended' if resumed else ''} "
+                  f"({exported / max(elapsed, 1e-6):.1f} images/s)")
+
+    print(f"✅ Export complete - {exported} new images, {index['total']} total in {len(index['shards'])} shards")
+    return index
+
+
+class KolamShardDataset:
+    """
+    Training-side reader for an export directory.
+
+    Shards are opened with `np.load(mmap_mode="r")`, so indexing returns a
+    view into the page cache with no per-sample decoding.
+    """
+
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        self.index = load_index(export_dir)
+        if self.index is None:
+            raise FileNotFoundError(f"No {INDEX_FILENAME} found in {export_dir}")
+
+        self.shards = [s for s in self.index["shards"] if s["count"] > 0]
+        self._offsets = np.cumsum([0] + [s["count"] for s in self.shards]).tolist()
+        self._arrays = {}
+        self._metadata = {}
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def _locate(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        shard = bisect.bisect_right(self._offsets, i) - 1
+        return shard, i - self._offsets[shard]
+
+    def shard_array(self, shard):
+        """Memory-mapped uint8 array of one shard, trimmed to its valid rows"""
+        if shard not in self._arrays:
+            info = self.shards[shard]
+            arr = np.load(os.path.join(self.export_dir, info["file"]), mmap_mode="r")
+            self._arrays[shard] = arr[:info["count"]]
+        return self._arrays[shard]
+
+    def shard_metadata(self, shard):
+        if shard not in self._metadata:
+            with open(os.path.join(self.export_dir, self.shards[shard]["metadata"])) as f:
+                self._metadata[shard] = [json.loads(line) for line in f]
+        return self._metadata[shard]
+
+    def __getitem__(self, i):
+        shard, row = self._locate(i)
+        return self.shard_array(shard)[row], self.shard_metadata(shard)[row]
+
+    def iter_batches(self, batch_size=64):
+        """Yield (images, metadata) batches as contiguous slices of the mapped shards"""
+        for shard in range(len(self.shards)):
+            images, metadata = self.shard_array(shard), self.shard_metadata(shard)
+            for start in range(0, len(images), batch_size):
+                yield images[start:start + batch_size], metadata[start:start + batch_size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export dataset_contributions as .npy training shards")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database with dataset_contributions")
+    parser.add_argument("--out", default="data/training_export", help="Export directory")
+    parser.add_argument("--size", type=int, default=256, help="Output image side length in pixels")
+    parser.add_argument("--grayscale", action="store_true", help="Export single-channel images")
+    parser.add_argument("--shard-size", type=int, default=512, help="Images per shard")
+    parser.add_argument("--workers", type=int, default=None, help="Decoder processes (default: all cores)")
+    parser.add_argument("--image-root", default=".", help="Base directory for original_image_path")
+    args = parser.parse_args()
+
+    export_contributions(
+        db_path=args.db,
+        out_dir=args.out,
+        size=args.size,
+        grayscale=args.grayscale,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        image_root=args.image_root,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Latency budgets for /predict and /analyze.
+
+A request gets a budget from `X-Kolam-Budget-Ms` and/or the server policy
+KOLAM_LATENCY_BUDGET_MS (the tighter one wins; neither means no deadline).
+The pipeline never rejects work for lack of time: the Deadline is asked
+before every stage and degrades in steps as the budget runs out
+
+    working_resolution  the image is downscaled when its estimated cost
+                        (KOLAM_MS_PER_MEGAPIXEL) exceeds what is left
+    cheap_detection     dot detection without the fallback passes, with a
+                        stricter Hough threshold and a bounded spacing filter
+    skipped_stage       optional analyses (symmetry, Lissajous fit, tiles,
+                        palette), then the decorated visualization panels
+
+and every step taken is reported back, so a client can tell a degraded
+answer from a full one. Without a budget nothing here runs.
+"""
+
+import math
+import os
+import time
+from dataclasses import replace
+
+import cv2
+
+BUDGET_HEADER = "X-Kolam-Budget-Ms"
+POLICY_BUDGET_MS = float(os.environ.get("KOLAM_LATENCY_BUDGET_MS", "0") or 0) or None
+# Rough full-pipeline cost per megapixel on a busy image; 150 for a plain kolam, 300-1100 for rangolis
+MS_PER_MEGAPIXEL = float(os.environ.get("KOLAM_MS_PER_MEGAPIXEL", "400"))
+RESOLUTION_HEADROOM = 0.8      # share of the remaining budget the downscaled image may be estimated to use
+MIN_WORKING_SIDE = 512         # never downscale the longest side below this (pulli radii are 5-15 px)
+
+CHEAP_DETECTION_BELOW = 0.5    # remaining fraction of the budget under which dot detection is cheap,
+                               # and the share of what is left the image may be estimated to need before it is
+SKIP_ANALYSES_BELOW = 0.35     # ... under which the optional analyses are skipped
+SKIP_PANELS_BELOW = 0.2        # ... under which the decorated panels are left black
+CHEAP_DETECTION = {"fallback": False, "hough_param2": 20, "max_candidates": 256}
+
+OPTIONAL_ANALYSES = ("symmetry", "lissajous_fit", "tiles", "tile_panel", "color_analysis")
+OPTIONAL_PANELS = ("dots_panel", "math_panel", "enhanced_panel")
+
+
+def request_budget(header_value, policy_ms=POLICY_BUDGET_MS):
+    """Budget in ms for a request: the tighter of the header and the policy, or None; ValueError on a bad header"""
+    budget = policy_ms
+    if header_value is not None:
+        try:
+            requested = float(header_value)
+        except ValueError:
+            raise ValueError(f"{BUDGET_HEADER} must be a number of milliseconds")
+        if not requested > 0 or math.isinf(requested):
+            raise ValueError(f"{BUDGET_HEADER} must be positive")
+        budget = requested if budget is None else min(budget, requested)
+    return budget
+
+
+def estimated_ms(img):
+    height, width = img.shape[:2]
+    return width * height / 1e6 * MS_PER_MEGAPIXEL
+
+
+class Deadline:
+    """
+    A latency budget started at construction. Pass `before_stage` as the
+    stage graph's `before` hook (see StageGraph.run); it only ever adjusts the
+    inputs of a stage or fills in its outputs with None.
+    """
+
+    def __init__(self, budget_ms, start=None):
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter() if start is None else start
+        self.degradations = []
+        self._resolution_checked = False
+
+    @property
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    @property
+    def remaining_ms(self):
+        return self.budget_ms - self.elapsed_ms
+
+    @property
+    def remaining_fraction(self):
+        return self.remaining_ms / self.budget_ms
+
+    def _record(self, step, **details):
+        self.degradations.append({"step": step, "at_ms": round(self.elapsed_ms, 1), **details})
+
+    def before_stage(self, stage, values):
+        # The first stage to read the decoded image decides its working resolution
+        if not self._resolution_checked and "original" in stage.inputs:
+            self._resolution_checked = True
+            self._fit_resolution(values)
+
+        if stage.name == "dot_candidates":
+            # Hough candidates, and the spacing filter over them, grow with the busyness the estimate misses
+            if self.remaining_fraction < CHEAP_DETECTION_BELOW or \
+                    estimated_ms(values["original"]) > CHEAP_DETECTION_BELOW * self.remaining_ms:
+                config = values["config"]
+                values["config"] = replace(config, **dict(
+                    CHEAP_DETECTION, hough_param2=max(config.hough_param2, CHEAP_DETECTION["hough_param2"])))
+                self._record("cheap_detection")
+        elif (stage.name in OPTIONAL_ANALYSES and self.remaining_fraction < SKIP_ANALYSES_BELOW) or \
+                (stage.name in OPTIONAL_PANELS and self.remaining_fraction < SKIP_PANELS_BELOW):
+            values.update((name, None) for name in stage.outputs)
+            self._record("skipped_stage", stage=stage.name)
+
+    def _fit_resolution(self, values):
+        original = values["original"]
+        height, width = original.shape[:2]
+        cost = estimated_ms(original)
+        available = RESOLUTION_HEADROOM * max(self.remaining_ms, 0.0)
+        if cost <= available:
+            return
+        scale = max(math.sqrt(available / cost), MIN_WORKING_SIDE / max(width, height))
+        if scale >= 0.95:
+            return
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        values["original"] = cv2.resize(original, size, interpolation=cv2.INTER_AREA)
+        self._record("working_resolution", scale=round(scale, 3), size=list(size), original_size=[width, height])
+
+    @property
+    def degraded(self):
+        return bool(self.degradations)
+
+    def report(self):
+        """The budget, the time used so far and the degradation steps taken, for the response"""
+        return {
+            "budget_ms": round(self.budget_ms, 1),
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "degradations": list(self.degradations),
+        }
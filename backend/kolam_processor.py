@@ -1,229 +1,825 @@
 import cv2
 import numpy as np
-import io
 import base64
+import hashlib
+import json
 import os
 from datetime import datetime
-from PIL import Image
 from collections import deque
 import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-class KolamAIProcessor:
+import runtime_budget
+from stroke_encoding import trace_strokes, encode_strokes
+from stage_graph import Stage, StageGraph
+from near_duplicates import perceptual_hashes
+from symmetry import analyze_symmetry
+from composite_renderer import CompositeRenderer
+from lissajous_fit import fit_lissajous, fit_usable, curve_parameters
+from tile_encoding import classify_tiles, render_tiles, tiles_to_text
+from color_palette import analyze_palette
+from kolam_types import DEFAULT_CONFIG, KolamResult, Path, load_config
+
+
+def binarize(gray_img, threshold=127):
+    """Binary threshold used by the pipeline: dark strokes become 255"""
+    _, binary = cv2.threshold(gray_img, threshold, 255, cv2.THRESH_BINARY_INV)
+    return binary
+
+
+def detect_dots(gray_img, max_dots=12, fallback=True, verbose=True,
+                min_dist=20, param1=50, param2=12, min_radius=5, max_radius=15,
+                edge_margin=15, min_contrast=5, min_spacing=15, max_candidates=None):
     """
-    Complete Kolam AI processing pipeline following the notebook steps:
-    1. Upload Image
-    2. Preprocessing (grayscale, threshold)
-    3. Circle/Dot Detection (Hough Transform)
-    4. Skeletonization
-    5. Noise Removal & Cleanup
-    6. Tracing Kolam Path
-    7. Mathematical Kolam Simulation (Lissajous)
-    8. Grid Size Analysis
-    9. Final Output & Visualization
+    Dot (pulli) detection on a grayscale image - the notebook-proven Hough algorithm.
+    
+    Returns (x, y, r) tuples sorted by contrast. `fallback` enables the sensitive
+    second pass and the 3x3 grid estimate when nothing is found; `max_dots=None`
+    keeps every candidate (used when analysing tiles of a larger image) and
+    `max_candidates` bounds the quadratic spacing filter on busy images. The
+    remaining parameters of the first pass default to the notebook values
+    (see KolamConfig).
     """
+    log = print if verbose else (lambda *args, **kwargs: None)
     
-    def __init__(self):
-        self.original_img = None
-        self.gray_img = None
-        self.binary_img = None
-        self.detected_dots = []
-        self.skeleton_img = None
-        self.grid_size = None
-        self.processed_results = {}
+    log("🎯 Detecting Kolam dots using notebook-proven algorithm...")
     
-    def step1_upload_image(self, image_bytes):
-        """Step 1: Upload and read image"""
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        self.original_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        print(f"✓ Step 1: Image uploaded - Shape: {self.original_img.shape}")
-        return self.original_img
+    height, width = gray_img.shape
     
-    def step2_preprocessing(self):
-        """Step 2: Convert to grayscale and apply binary thresholding"""
-        # Convert to grayscale
-        self.gray_img = cv2.cvtColor(self.original_img, cv2.COLOR_BGR2GRAY)
-        
-        # Apply binary thresholding
-        _, self.binary_img = cv2.threshold(self.gray_img, 127, 255, cv2.THRESH_BINARY_INV)
-        
-        print("✓ Step 2: Preprocessing complete - Grayscale & Binary threshold applied")
-        return self.gray_img, self.binary_img
+    # Use the exact same approach as the working notebook
+    # Use Hough Circle Transform with notebook-proven parameters
+    circles = cv2.HoughCircles(
+        gray_img,  # Use grayscale directly (like notebook)
+        cv2.HOUGH_GRADIENT,
+        dp=1,
+        minDist=min_dist,       # 20 in the notebook
+        param1=param1,          # 50 in the notebook
+        param2=param2,          # 12 in the notebook - key parameter for sensitivity
+        minRadius=min_radius,   # 5 in the notebook
+        maxRadius=max_radius    # 15 in the notebook
+    )
     
-    def step3_detect_dots(self):
-        """Step 3: Precise Kolam Dot Detection - Based on proven notebook algorithm"""
-        print("🎯 Detecting Kolam dots using notebook-proven algorithm...")
+    detected_dots = []
+    
+    if circles is not None:
+        # Convert the circle parameters to integers (same as notebook)
+        circles = np.uint16(np.around(circles))
         
-        height, width = self.gray_img.shape
+        log(f"📊 Hough Circles found: {len(circles[0])} dots using notebook parameters")
         
-        # Use the exact same approach as the working notebook
-        # Apply median blur for noise reduction (same as notebook)
-        blurred = cv2.medianBlur(self.gray_img, 5)
+        # Simple filtering to ensure quality dots
+        candidate_dots = []
         
-        # Use Hough Circle Transform with notebook-proven parameters
-        circles = cv2.HoughCircles(
-            self.gray_img,  # Use grayscale directly (like notebook)
+        for i in circles[0, :]:
+            x, y, r = int(i[0]), int(i[1]), int(i[2])
+            
+            # Basic edge margin check
+            if (edge_margin <= x <= width - edge_margin and 
+                edge_margin <= y <= height - edge_margin):
+                
+                # Basic quality check - ensure it's in a reasonable area
+                roi_size = max(r * 2, 10)
+                x1, y1 = max(0, x - roi_size), max(0, y - roi_size)
+                x2, y2 = min(width, x + roi_size), min(height, y + roi_size)
+                
+                if x2 > x1 and y2 > y1:
+                    roi = gray_img[y1:y2, x1:x2]
+                    roi_std = np.std(roi)
+                    
+                    # Only require minimal contrast (more permissive)
+                    if roi_std > min_contrast:  # Very low threshold
+                        candidate_dots.append((x, y, r, roi_std))
+        
+        # Sort by quality (contrast) but keep most dots
+        candidate_dots.sort(key=lambda dot: dot[3], reverse=True)
+        if max_candidates is not None:
+            candidate_dots = candidate_dots[:max_candidates]
+        
+        # Apply minimal spacing constraints - more permissive than before
+        final_dots = []
+        
+        for x, y, r, quality in candidate_dots:
+            # Check spacing from already selected dots
+            valid_spacing = True
+            for fx, fy, fr in final_dots:
+                distance = np.sqrt((x - fx)**2 + (y - fy)**2)
+                if distance < min_spacing:
+                    valid_spacing = False
+                    break
+            
+            if valid_spacing:
+                final_dots.append((x, y, r))
+        
+        detected_dots = final_dots
+        
+    elif fallback:
+        log("❌ No circles detected with notebook parameters")
+        
+        # Fallback: Try with even more sensitive parameters
+        log("🔄 Trying more sensitive detection...")
+        
+        # Median blur for noise reduction (same as notebook); only the sensitive pass uses it
+        blurred = cv2.medianBlur(gray_img, 5)
+        circles_sensitive = cv2.HoughCircles(
+            blurred,
             cv2.HOUGH_GRADIENT,
             dp=1,
-            minDist=20,     # Same as notebook
-            param1=50,      # Same as notebook  
-            param2=12,      # Same as notebook - key parameter for sensitivity
-            minRadius=5,    # Same as notebook
-            maxRadius=15    # Same as notebook
+            minDist=15,     # Reduced min distance
+            param1=30,      # Lower edge threshold
+            param2=8,       # Even lower accumulator threshold
+            minRadius=3,    # Smaller minimum radius
+            maxRadius=20    # Larger maximum radius
         )
         
-        self.detected_dots = []
-        
-        if circles is not None:
-            # Convert the circle parameters to integers (same as notebook)
-            circles = np.uint16(np.around(circles))
-            
-            print(f"📊 Hough Circles found: {len(circles[0])} dots using notebook parameters")
+        if circles_sensitive is not None:
+            circles_sensitive = np.uint16(np.around(circles_sensitive))
+            log(f"📊 Sensitive detection found: {len(circles_sensitive[0])} dots")
             
-            # Simple filtering to ensure quality dots
-            candidate_dots = []
-            
-            for i in circles[0, :]:
+            # Take the best dots from sensitive detection
+            for i in circles_sensitive[0, :]:
                 x, y, r = int(i[0]), int(i[1]), int(i[2])
                 
-                # Basic edge margin check
-                edge_margin = 15
-                if (edge_margin <= x <= width - edge_margin and 
-                    edge_margin <= y <= height - edge_margin):
-                    
-                    # Basic quality check - ensure it's in a reasonable area
-                    roi_size = max(r * 2, 10)
-                    x1, y1 = max(0, x - roi_size), max(0, y - roi_size)
-                    x2, y2 = min(width, x + roi_size), min(height, y + roi_size)
+                sensitive_margin = 10
+                if (sensitive_margin <= x <= width - sensitive_margin and 
+                    sensitive_margin <= y <= height - sensitive_margin):
+                    detected_dots.append((x, y, r))
                     
-                    if x2 > x1 and y2 > y1:
-                        roi = self.gray_img[y1:y2, x1:x2]
-                        roi_std = np.std(roi)
-                        
-                        # Only require minimal contrast (more permissive)
-                        if roi_std > 5:  # Very low threshold
-                            candidate_dots.append((x, y, r, roi_std))
-            
-            # Sort by quality (contrast) but keep most dots
-            candidate_dots.sort(key=lambda dot: dot[3], reverse=True)
-            
-            # Apply minimal spacing constraints - more permissive than before
-            final_dots = []
-            min_spacing = 15  # Reduced minimum spacing
-            
-            for x, y, r, quality in candidate_dots:
-                # Check spacing from already selected dots
-                valid_spacing = True
-                for fx, fy, fr in final_dots:
-                    distance = np.sqrt((x - fx)**2 + (y - fy)**2)
-                    if distance < min_spacing:
-                        valid_spacing = False
+                    if len(detected_dots) >= 9:  # Limit to 9 dots
                         break
+        
+        # Final fallback: Use grid estimation if still no dots
+        if len(detected_dots) == 0:
+            log("🔄 Final fallback: Grid estimation...")
+            
+            # Create a 3x3 grid estimation
+            margin = min(width, height) // 6
+            grid_width = width - 2 * margin
+            grid_height = height - 2 * margin
+            
+            for i in range(3):
+                for j in range(3):
+                    x = margin + (grid_width * (i + 1)) // 4
+                    y = margin + (grid_height * (j + 1)) // 4
+                    r = max(5, min(width, height) // 60)
+                    detected_dots.append((x, y, r))
+    
+    # Ensure we don't have too many dots (limit to reasonable number)
+    if max_dots is not None and len(detected_dots) > max_dots:
+        # Keep the first max_dots dots (they're already sorted by quality)
+        detected_dots = detected_dots[:max_dots]
+    
+    log(f"✅ Step 3: Notebook-based dot detection complete - Found {len(detected_dots)} dots")
+    log(f"   📍 Dot positions: {[(x, y) for x, y, r in detected_dots[:3]]}{'...' if len(detected_dots) > 3 else ''}")
+    
+    return detected_dots
+
+
+def skeletonize(binary_img):
+    """Morphological skeleton of the inverted binary image (single-pixel lines)"""
+    # Invert binary image for skeletonization
+    inverted = cv2.bitwise_not(binary_img)
+    
+    # OpenCV-based skeletonization using morphological operations
+    skeleton = np.zeros(inverted.shape, np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+    
+    while True:
+        # Erode the image
+        eroded = cv2.erode(inverted, kernel)
+        # Dilate the eroded image
+        opened = cv2.dilate(eroded, kernel)
+        # Subtract the opened image from the original
+        subset = cv2.subtract(inverted, opened)
+        # Union of skeleton and subset
+        skeleton = cv2.bitwise_or(skeleton, subset)
+        # Update inverted image
+        inverted = eroded.copy()
+        
+        # If the image is completely eroded, break
+        if cv2.countNonZero(inverted) == 0:
+            break
+    
+    return skeleton
+
+
+def estimate_grid_size(detected_dots):
+    """Estimate the (square) pulli grid size from (x, y, r) dots"""
+    if not detected_dots:
+        return 3
+    
+    # Extract dot positions
+    dot_positions = [(x, y) for x, y, r in detected_dots]
+    
+    if len(dot_positions) < 4:
+        return max(2, int(np.sqrt(len(dot_positions))))
+    
+    # Estimate grid size based on dot distribution
+    x_coords = [pos[0] for pos in dot_positions]
+    
+    # Calculate approximate grid dimensions
+    x_range = max(x_coords) - min(x_coords)
+    
+    # Sort by x to find horizontal spacing
+    sorted_x = sorted(set([int(x/20)*20 for x in x_coords]))  # Quantize to reduce noise
+    if len(sorted_x) > 1:
+        avg_spacing = np.mean(np.diff(sorted_x))
+        estimated_cols = max(2, int(x_range / avg_spacing) + 1) if avg_spacing > 0 else int(np.sqrt(len(dot_positions)))
+    else:
+        estimated_cols = int(np.sqrt(len(dot_positions)))
+    
+    return max(2, min(estimated_cols, int(np.sqrt(len(dot_positions)) + 1)))
+
+
+# ---------- Pipeline stages ----------
+# Pure functions of their inputs; the stage graph below wires them together.
+
+def decode_image(image_bytes):
+    """Step 1: Upload and read image"""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    original_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if original_img is None:
+        raise ValueError("Could not decode image")
+    print(f"✓ Step 1: Image uploaded - Shape: {original_img.shape}")
+    return original_img
+
+
+def preprocess(original_img, config):
+    """Step 2: Convert to grayscale and apply binary thresholding"""
+    gray_img = cv2.cvtColor(original_img, cv2.COLOR_BGR2GRAY)
+    binary_img = binarize(gray_img, config.threshold)
+    print("✓ Step 2: Preprocessing complete - Grayscale & Binary threshold applied")
+    return gray_img, binary_img
+
+
+def color_analysis(original_img, config):
+    """Dominant colour palette and per-colour label map (rangolis; see color_palette)"""
+    palette, labels = analyze_palette(original_img, config.palette_colors)
+    print(f"✓ Palette: {len(palette['colors'])} colours - {' '.join(c['hex'] for c in palette['colors'])}")
+    return palette, labels
+
+
+def find_dot_candidates(gray_img, config):
+    """Step 3: Dot detection with the configured Hough parameters, before the max_dots cap"""
+    return detect_dots(gray_img, **dict(config.detection_kwargs(), max_dots=None))
+
+
+def find_dots(dot_candidates, config):
+    """Step 3: The best config.max_dots candidates (they are sorted by contrast)"""
+    if config.max_dots is not None and len(dot_candidates) > config.max_dots:
+        print(f"   Keeping the {config.max_dots} highest-contrast of {len(dot_candidates)} dots")
+        return dot_candidates[:config.max_dots]
+    return dot_candidates
+
+
+def remove_noise(binary_img):
+    """Step 5: Noise removal and cleanup using morphological operations"""
+    # Define kernel for morphological operations
+    kernel = np.ones((3, 3), np.uint8)
+    
+    # Apply opening (erosion followed by dilation) to remove noise
+    opened = cv2.morphologyEx(binary_img, cv2.MORPH_OPEN, kernel)
+    
+    # Apply closing (dilation followed by erosion) to close gaps
+    closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, kernel)
+    
+    print("✓ Step 5: Noise removal complete - Morphological operations applied")
+    return closed
+
+
+def trace_paths(skeleton):
+    """Step 6: Trace continuous paths (8-connected skeleton components) using BFS"""
+    visited = np.zeros_like(skeleton, dtype=bool)
+    components = []
+    
+    directions = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
+    
+    for i in range(skeleton.shape[0]):
+        for j in range(skeleton.shape[1]):
+            if skeleton[i,j] > 0 and not visited[i,j]:
+                # Start BFS from this point
+                component = []
+                queue = deque([(i,j)])
+                visited[i,j] = True
                 
-                if valid_spacing:
-                    final_dots.append((x, y, r))
-            
-            self.detected_dots = final_dots
-            
-        else:
-            print("❌ No circles detected with notebook parameters")
-            
-            # Fallback: Try with even more sensitive parameters
-            print("🔄 Trying more sensitive detection...")
-            
-            circles_sensitive = cv2.HoughCircles(
-                blurred,
-                cv2.HOUGH_GRADIENT,
-                dp=1,
-                minDist=15,     # Reduced min distance
-                param1=30,      # Lower edge threshold
-                param2=8,       # Even lower accumulator threshold
-                minRadius=3,    # Smaller minimum radius
-                maxRadius=20    # Larger maximum radius
-            )
-            
-            if circles_sensitive is not None:
-                circles_sensitive = np.uint16(np.around(circles_sensitive))
-                print(f"📊 Sensitive detection found: {len(circles_sensitive[0])} dots")
-                
-                # Take the best dots from sensitive detection
-                for i in circles_sensitive[0, :]:
-                    x, y, r = int(i[0]), int(i[1]), int(i[2])
+                while queue:
+                    y, x = queue.popleft()
+                    component.append((x, y))
                     
-                    edge_margin = 10
-                    if (edge_margin <= x <= width - edge_margin and 
-                        edge_margin <= y <= height - edge_margin):
-                        self.detected_dots.append((x, y, r))
-                        
-                        if len(self.detected_dots) >= 9:  # Limit to 9 dots
-                            break
-            
-            # Final fallback: Use grid estimation if still no dots
-            if len(self.detected_dots) == 0:
-                print("🔄 Final fallback: Grid estimation...")
-                
-                # Create a 3x3 grid estimation
-                margin = min(width, height) // 6
-                grid_width = width - 2 * margin
-                grid_height = height - 2 * margin
+                    # Check 8-connected neighbors
+                    for dy, dx in directions:
+                        ny, nx = y + dy, x + dx
+                        if (0 <= ny < skeleton.shape[0] and 
+                            0 <= nx < skeleton.shape[1] and
+                            skeleton[ny, nx] > 0 and 
+                            not visited[ny, nx]):
+                            visited[ny, nx] = True
+                            queue.append((ny, nx))
                 
-                for i in range(3):
-                    for j in range(3):
-                        x = margin + (grid_width * (i + 1)) // 4
-                        y = margin + (grid_height * (j + 1)) // 4
-                        r = max(5, min(width, height) // 60)
-                        self.detected_dots.append((x, y, r))
+                if len(component) > 10:  # Only keep significant components
+                    components.append(component)
+    
+    print(f"✓ Step 6: Path tracing complete - Found {len(components)} continuous paths")
+    return components
+
+
+def extract_strokes(skeleton):
+    """Ordered, simplified strokes along the skeleton for client-side animation"""
+    strokes = trace_strokes(skeleton)
+    print(f"✓ Strokes: {len(strokes)} strokes, {sum(len(s) for s in strokes)} points")
+    return strokes
+
+
+def analyze_grid(detected_dots):
+    """Step 8: Analyze grid structure from detected dots"""
+    grid_size = estimate_grid_size(detected_dots)
+    if detected_dots:
+        print(f"✓ Step 8: Grid analysis complete - Estimated grid size: {grid_size}x{grid_size}")
+    return grid_size
+
+
+def encode_tiles(skeleton, dot_candidates):
+    """Symbolic per-pulli tile code (see tile_encoding); uses every candidate, the lattice fit rejects strays"""
+    tiles = classify_tiles(skeleton, dot_candidates)
+    if tiles is not None:
+        print(f"✓ Tiles: {tiles.shape[0]}x{tiles.shape[1]} cells, {len(np.unique(tiles))} tile types")
+    return tiles
+
+
+def render_tile_panel(tiles):
+    """Clean redraw of the kolam from its tile code, in the visualization's dark theme"""
+    if tiles is None:
+        return None
+    return render_tiles(tiles, PANEL_SIZE, color=(255, 100, 255), background=40, dot_color=(0, 255, 0))
+
+
+def lissajous_patterns(grid_size, lissajous_fit):
+    """Step 7: Mathematical Kolam simulation using enhanced Lissajous curves"""
+    fit_a, fit_b, fit_delta, _ = curve_parameters(grid_size, lissajous_fit)
+    
+    def generate_kolam_lissajous(grid_size, pattern_type=1):
+        """Generate Kolam-style Lissajous curves with different patterns"""
+        t = np.linspace(0, 4 * np.pi, 2000)
+        
+        if pattern_type == 1:
+            # Primary interwoven pattern: fitted to the drawing when possible
+            a, b = fit_a, fit_b
+            delta = fit_delta
+        elif pattern_type == 2:
+            # Secondary supporting pattern
+            a, b = fit_a + 1, fit_b + 1
+            delta = 0
+        else:
+            # Tertiary decorative pattern
+            a, b = max(1, fit_a - 1), fit_b + 2
+            delta = np.pi / 4
+        
+        x = np.sin(a * t + delta)
+        y = np.sin(b * t)
         
-        # Ensure we don't have too many dots (limit to reasonable number)
-        if len(self.detected_dots) > 12:
-            # Keep the first 12 dots (they're already sorted by quality)
-            self.detected_dots = self.detected_dots[:12]
+        return list(zip(x, y))
+    
+    # Generate multiple complementary patterns
+    patterns = []
+    for i in range(3):
+        pattern = generate_kolam_lissajous(grid_size, i + 1)
+        patterns.append(pattern)
+    
+    print(f"✓ Step 7: Mathematical simulation complete - Generated {len(patterns)} enhanced Lissajous patterns")
+    return patterns
+
+
+def draw_debug_dots(gray_img, detected_dots, grid_size):
+    """Debug visualization of the dot detection (ranked by detection quality)"""
+    print("🔬 Debug: Creating dot detection visualization...")
+    
+    height, width = gray_img.shape
+    
+    # Create debug visualization
+    debug_img = cv2.cvtColor(gray_img, cv2.COLOR_GRAY2BGR)
+    
+    # Draw all detected dots with different colors based on quality
+    for i, (x, y, r) in enumerate(detected_dots):
+        # Color based on detection order (quality ranking)
+        if i == 0:
+            color = (0, 255, 0)      # Best quality: Green
+        elif i < 3:
+            color = (0, 255, 255)    # High quality: Yellow
+        elif i < 6:
+            color = (255, 165, 0)    # Medium quality: Orange
+        else:
+            color = (255, 0, 255)    # Lower quality: Magenta
         
-        print(f"✅ Step 3: Notebook-based dot detection complete - Found {len(self.detected_dots)} dots")
-        print(f"   📍 Dot positions: {[(x, y) for x, y, r in self.detected_dots[:3]]}{'...' if len(self.detected_dots) > 3 else ''}")
+        # Draw detection circle
+        cv2.circle(debug_img, (x, y), r + 3, color, 2)
+        cv2.circle(debug_img, (x, y), 3, (0, 0, 255), -1)  # Red center
         
-        return self.detected_dots
+        # Add number label
+        cv2.putText(debug_img, str(i+1), (x-10, y-r-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
     
-    def debug_dot_detection(self, save_debug_images=True):
-        """Debug function to visualize dot detection process"""
-        if self.gray_img is None:
-            print("❌ No grayscale image available for debugging")
-            return
-        
-        print("🔬 Debug: Creating dot detection visualization...")
-        
-        height, width = self.gray_img.shape
-        
-        # Create debug visualization
-        debug_img = cv2.cvtColor(self.gray_img, cv2.COLOR_GRAY2BGR)
-        
-        # Draw all detected dots with different colors based on quality
-        for i, (x, y, r) in enumerate(self.detected_dots):
-            # Color based on detection order (quality ranking)
-            if i == 0:
-                color = (0, 255, 0)      # Best quality: Green
-            elif i < 3:
-                color = (0, 255, 255)    # High quality: Yellow
-            elif i < 6:
-                color = (255, 165, 0)    # Medium quality: Orange
-            else:
-                color = (255, 0, 255)    # Lower quality: Magenta
-            
-            # Draw detection circle
-            cv2.circle(debug_img, (x, y), r + 3, color, 2)
-            cv2.circle(debug_img, (x, y), 3, (0, 0, 255), -1)  # Red center
-            
-            # Add number label
-            cv2.putText(debug_img, str(i+1), (x-10, y-r-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        
-        # Add statistics text
-        text_lines = [
-            f"Total Dots Detected: {len(self.detected_dots)}",
-            f"Image Size: {width}x{height}",
-            f"Grid Estimate: {self.grid_size}x{self.grid_size}" if self.grid_size else "Grid: Not calculated"
+    # Add statistics text
+    text_lines = [
+        f"Total Dots Detected: {len(detected_dots)}",
+        f"Image Size: {width}x{height}",
+        f"Grid Estimate: {grid_size}x{grid_size}" if grid_size else "Grid: Not calculated"
+    ]
+    
+    for i, line in enumerate(text_lines):
+        cv2.putText(debug_img, line, (10, 30 + i*25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    
+    return debug_img
+
+
+def render_enhanced(original_shape, detected_dots, skeleton_img):
+    """Create an enhanced version combining detected elements with artistic rendering"""
+    # Create a clean background
+    height, width = original_shape[:2]
+    enhanced = np.ones((height, width, 3), dtype=np.uint8) * 50  # Dark background
+    
+    # Draw detected dots
+    for x, y, r in detected_dots:
+        cv2.circle(enhanced, (x, y), r+2, (255, 255, 255), -1)  # White filled circles
+        cv2.circle(enhanced, (x, y), r+2, (200, 100, 255), 3)   # Purple outline
+    
+    # Draw skeleton paths in bright color
+    mask = skeleton_img > 0
+    enhanced[mask] = [255, 150, 100]  # Orange/coral color for paths
+    
+    return enhanced
+
+
+PANEL_SIZE = 400   # each of the six panels of the final visualization is PANEL_SIZE x PANEL_SIZE
+STEP9_RENDERER = CompositeRenderer(PANEL_SIZE)
+
+
+def render_original_panel(original_img):
+    """Panel 1: the original image resized to the panel size"""
+    return cv2.resize(original_img, (PANEL_SIZE, PANEL_SIZE))
+
+
+def render_dots_panel(original_img, original_panel, detected_dots):
+    """Panel 3: detected dots drawn over the resized original"""
+    height, width = PANEL_SIZE, PANEL_SIZE
+    
+    # Create dots visualization with improved visibility and correct positioning
+    dots_img = original_panel.copy()
+    
+    # Get original image dimensions
+    orig_height, orig_width = original_img.shape[:2]
+    
+    print(f"Debug: Original image size: {orig_width}x{orig_height}, Resized: {width}x{height}")
+    
+    for i, (x, y, r) in enumerate(detected_dots):
+        # Correctly scale coordinates from original image to resized image
+        x_scaled = int(x * width / orig_width)
+        y_scaled = int(y * height / orig_height)
+        r_scaled = max(3, int(r * width / orig_width))
+        
+        # Ensure coordinates are within bounds
+        x_scaled = max(0, min(x_scaled, width - 1))
+        y_scaled = max(0, min(y_scaled, height - 1))
+        
+        if i < 5:  # Debug first 5 dots
+            print(f"Debug dot {i}: orig({x},{y}) -> scaled({x_scaled},{y_scaled})")
+        
+        # Draw multiple circles for better visibility
+        cv2.circle(dots_img, (x_scaled, y_scaled), r_scaled + 4, (0, 255, 0), 3)  # Green outer circle
+        cv2.circle(dots_img, (x_scaled, y_scaled), r_scaled, (255, 255, 255), -1)  # White filled circle
+        cv2.circle(dots_img, (x_scaled, y_scaled), r_scaled, (0, 0, 255), 2)       # Blue outline
+        cv2.circle(dots_img, (x_scaled, y_scaled), 3, (255, 0, 0), -1)             # Red center dot
+    
+    return dots_img
+
+
+def render_math_panel(grid_size, lissajous_fit):
+    """Panel 5: the fitted Lissajous curve when the fit is good, else the grid-size curves"""
+    a, b, delta, ratio = curve_parameters(grid_size, lissajous_fit)
+    caption = None
+    if fit_usable(lissajous_fit):
+        caption = f"fit a={a} b={b} d={math.degrees(delta):.0f} res={lissajous_fit['residual']:.2f}"
+        # Rounded so that near-identical fits share a cached panel
+        delta, ratio = round(delta, 2), round(ratio * 20) / 20
+    return _math_panel(grid_size, a, b, delta, ratio, caption)
+
+
+@lru_cache(maxsize=128)
+def _math_panel(grid_size, a, b, delta, ratio, caption):
+    """Rendered math panel for one set of curve parameters (cached, read-only)"""
+    height, width = PANEL_SIZE, PANEL_SIZE
+    math_img = np.zeros((height, width, 3), dtype=np.uint8)
+    math_img.fill(40)  # Dark gray background instead of black
+    
+    # Draw Lissajous pattern with improved visibility
+    if grid_size > 0:
+        # Generate more points for smoother curves
+        t = np.linspace(0, 4 * np.pi, 2000)  # More points and longer curve
+        
+        # Create mathematical Kolam patterns from the fitted (or grid) frequencies
+        center_x, center_y = width // 2, height // 2
+        scale = min(width, height) // 3
+        # Keep the fitted aspect ratio inside the panel
+        scale_x = scale / max(ratio, 1.0)
+        scale_y = scale * min(ratio, 1.0)
+        
+        # Pattern 1: Main Lissajous curve (Purple)
+        x_liss1 = center_x + scale_x * np.sin(a * t + delta)
+        y_liss1 = center_y + scale_y * np.sin(b * t)
+        
+        # Pattern 2: Secondary curve (Cyan)
+        x_liss2 = center_x + scale_x * 0.8 * np.sin((a+1) * t)
+        y_liss2 = center_y + scale_y * 0.8 * np.sin(b * t + np.pi/4)
+        
+        # Pattern 3: Tertiary curve (Yellow)
+        x_liss3 = center_x + scale_x * 0.6 * np.sin(a * t + np.pi/3)
+        y_liss3 = center_y + scale_y * 0.6 * np.sin((b+1) * t + np.pi/6)
+        
+        patterns = [
+            (x_liss1, y_liss1, (255, 100, 255), 3),  # Purple, thick
+            (x_liss2, y_liss2, (100, 255, 255), 2),  # Cyan, medium
+            (x_liss3, y_liss3, (255, 255, 100), 2)   # Yellow, medium
         ]
         
-        for i, line in enumerate(text_lines):
-            cv2.putText(debug_img, line, (10, 30 + i*25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        for x_curve, y_curve, color, thickness in patterns:
+            # Convert to integer coordinates and ensure bounds
+            x_scaled = np.clip(x_curve.astype(np.int32), 0, width-1)
+            y_scaled = np.clip(y_curve.astype(np.int32), 0, height-1)
+            
+            # Draw the curve as one polyline instead of 2000 separate lines
+            curve = np.stack([x_scaled, y_scaled], axis=1)
+            cv2.polylines(math_img, [curve], False, color, thickness)
+        
+        # Add strategic grid dots based on actual Kolam structure (not a full grid)
+        if grid_size >= 3:
+            # Only add key intersection points, not every grid point
+            key_points = [
+                (center_x, center_y),  # Center
+                (center_x - scale//2, center_y - scale//2),  # Top-left
+                (center_x + scale//2, center_y - scale//2),  # Top-right
+                (center_x - scale//2, center_y + scale//2),  # Bottom-left
+                (center_x + scale//2, center_y + scale//2),  # Bottom-right
+            ]
+            
+            # Add some intermediate points for larger grids
+            if grid_size >= 4:
+                key_points.extend([
+                    (center_x, center_y - scale//2),  # Top-center
+                    (center_x, center_y + scale//2),  # Bottom-center
+                    (center_x - scale//2, center_y),  # Left-center
+                    (center_x + scale//2, center_y),  # Right-center
+                ])
+            
+            # Draw key dots
+            for x_dot, y_dot in key_points:
+                if 0 <= x_dot < width and 0 <= y_dot < height:
+                    cv2.circle(math_img, (x_dot, y_dot), 8, (255, 255, 255), -1)
+                    cv2.circle(math_img, (x_dot, y_dot), 8, (0, 0, 0), 2)
+                    cv2.circle(math_img, (x_dot, y_dot), 3, (255, 0, 0), -1)
+    
+    if caption:
+        cv2.putText(math_img, caption, (10, height - 12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (220, 220, 220), 1)
+    
+    math_img.setflags(write=False)
+    return math_img
+
+
+def render_enhanced_panel(original_img, detected_dots, skeleton_img):
+    """Panel 6: enhanced recreation resized to the panel size"""
+    enhanced_img = render_enhanced(original_img.shape, detected_dots, skeleton_img)
+    return cv2.resize(enhanced_img, (PANEL_SIZE, PANEL_SIZE))
+
+
+def compose_visualization(original_panel, gray_img, skeleton_img, detected_dots,
+                          dots_panel, math_panel, enhanced_panel):
+    """Step 9: Create final output combining all panels, encoded as PNG"""
+    size = (PANEL_SIZE, PANEL_SIZE)
+    panels = [
+        original_panel,
+        cv2.resize(gray_img, size),
+        dots_panel,
+        cv2.resize(skeleton_img, size),
+        math_panel,
+        enhanced_panel,
+    ]
+    return STEP9_RENDERER.render(panels, dots=len(detected_dots))
+
+
+PIPELINE = StageGraph([
+    Stage("upload", decode_image, ["image_bytes"], ["original"]),
+    Stage("preprocessing", preprocess, ["original", "config"], ["gray", "binary"]),
+    Stage("fingerprint", perceptual_hashes, ["gray"], ["fingerprint"]),
+    Stage("color_analysis", color_analysis, ["original", "config"], ["palette", "color_labels"]),
+    Stage("dot_candidates", find_dot_candidates, ["gray", "config"], ["dot_candidates"]),
+    Stage("dot_detection", find_dots, ["dot_candidates", "config"], ["dots"]),
+    Stage("skeletonization", skeletonize, ["binary"], ["skeleton"]),
+    Stage("noise_removal", remove_noise, ["binary"], ["clean_binary"]),
+    Stage("symmetry", analyze_symmetry, ["binary"], ["symmetry"]),
+    Stage("path_tracing", trace_paths, ["skeleton"], ["paths"]),
+    Stage("strokes", extract_strokes, ["skeleton"], ["strokes"]),
+    Stage("grid_analysis", analyze_grid, ["dots"], ["grid_size"]),
+    Stage("lissajous_fit", fit_lissajous, ["strokes", "original"], ["lissajous_fit"]),
+    Stage("tiles", encode_tiles, ["skeleton", "dot_candidates"], ["tiles"]),
+    Stage("tile_panel", render_tile_panel, ["tiles"], ["tile_panel"]),
+    Stage("mathematical_simulation", lissajous_patterns, ["grid_size", "lissajous_fit"], ["lissajous"]),
+    Stage("debug_dots", draw_debug_dots, ["gray", "dots", "grid_size"], ["debug_dots"]),
+    # Step 9 panels are independent stages so they can render in parallel
+    Stage("original_panel", render_original_panel, ["original"], ["original_panel"]),
+    Stage("dots_panel", render_dots_panel, ["original", "original_panel", "dots"], ["dots_panel"]),
+    Stage("math_panel", render_math_panel, ["grid_size", "lissajous_fit"], ["math_panel"]),
+    Stage("enhanced_panel", render_enhanced_panel, ["original", "dots", "skeleton"], ["enhanced_panel"]),
+    Stage("final_visualization", compose_visualization,
+          ["original_panel", "gray", "skeleton", "dots", "dots_panel", "math_panel", "enhanced_panel"],
+          ["visualization"]),
+], sources=["image_bytes", "config"])
+
+# What a full /predict needs; paths and lissajous are only computed on demand
+FULL_OUTPUTS = ["original", "dots", "grid_size", "strokes", "symmetry", "lissajous_fit", "tiles", "palette",
+                "visualization"]
+# What analyze() computes unless asked for more ("paths", "visualization")
+RESULT_OUTPUTS = ["original", "dots", "grid_size", "strokes", "symmetry", "lissajous_fit", "tiles", "palette",
+                  "color_labels"]
+
+# KOLAM_PRESET picks the parameters of KolamAIProcessor (see param_sweep.py --export)
+ACTIVE_CONFIG = load_config(os.environ["KOLAM_PRESET"]) if os.environ.get("KOLAM_PRESET") else DEFAULT_CONFIG
+
+# Bump when a stage or the stored analysis fields change, so stored analyses are not reused
+PIPELINE_CODE_VERSION = 1
+
+
+def pipeline_version(config=None):
+    """Version tag of stored analyses: the code version plus a hash of the active config"""
+    config = config or ACTIVE_CONFIG
+    digest = hashlib.sha256(json.dumps(config.to_dict(), sort_keys=True).encode()).hexdigest()[:12]
+    return f"{PIPELINE_CODE_VERSION}-{digest}"
+
+_stage_executor = None
+_stage_executor_lock = threading.Lock()
+
+
+def stage_executor():
+    """Process-wide thread pool for intra-request stage parallelism, sized by the runtime budget"""
+    global _stage_executor
+    if _stage_executor is None:
+        with _stage_executor_lock:
+            if _stage_executor is None:
+                _stage_executor = ThreadPoolExecutor(
+                    max_workers=runtime_budget.executor_workers(), thread_name_prefix="kolam-stage"
+                )
+    return _stage_executor
+
+
+def parallel_enabled():
+    """
+    KOLAM_PIPELINE_MODE: "parallel", "serial" or "auto" (default) - parallel
+    only when the worker has more than one thread in its budget.
+    """
+    mode = os.environ.get("KOLAM_PIPELINE_MODE", "auto")
+    if mode == "auto":
+        return runtime_budget.executor_workers() > 1
+    return mode == "parallel"
+
+
+def run_pipeline(values, outputs, parallel=None, timings=None, deadline=None):
+    """
+    Compute `outputs` into the memo dict `values` (sources: "image_bytes" or an
+    already decoded "original", plus "config"). parallel=None follows
+    KOLAM_PIPELINE_MODE (see parallel_enabled). A Deadline degrades the
+    remaining stages as its budget runs out (see deadline.py).
+    """
+    if parallel is None:
+        parallel = parallel_enabled()
+    before = deadline.before_stage if deadline is not None else None
+    if parallel:
+        return PIPELINE.run_parallel(values, outputs, stage_executor(), timings, before)
+    return PIPELINE.run(values, outputs, timings, before)
+
+
+def build_result(values, timings=None, deadline=None):
+    """KolamResult from computed pipeline values (RESULT_OUTPUTS must be present)"""
+    height, width = values["original"].shape[:2]
+    paths = values.get("paths")
+    return KolamResult(
+        width=width,
+        height=height,
+        grid_size=values["grid_size"],
+        dots=np.array(values["dots"], dtype=np.int32).reshape(-1, 3),
+        strokes=tuple(Path(points) for points in values["strokes"]),
+        symmetry=values.get("symmetry"),
+        lissajous_fit=values.get("lissajous_fit"),
+        tiles=values.get("tiles"),
+        palette=values.get("palette"),
+        color_labels=values.get("color_labels"),
+        paths=tuple(Path(points) for points in paths) if paths is not None else None,
+        visualization=values.get("visualization"),
+        stage_timings_ms=dict(timings or {}),
+        deadline=deadline.report() if deadline is not None else None,
+        config=values["config"],
+    )
+
+
+def analyze(image, config=DEFAULT_CONFIG, outputs=(), parallel=False, deadline=None):
+    """
+    Analyse one image and return a KolamResult.
+
+    `image` is encoded bytes or a decoded BGR array; `outputs` adds optional
+    outputs ("paths", "visualization", ...) to RESULT_OUTPUTS. Stateless: no
+    memo outlives the call, so it is safe from any thread or pool worker.
+    Serial by default, since callers that batch parallelise across images.
+    With a Deadline, outputs it had to skip are None (see result.deadline).
+    """
+    if isinstance(image, np.ndarray):
+        values = {"original": image, "config": config}
+    else:
+        values = {"image_bytes": image, "config": config}
+    timings = {}
+    run_pipeline(values, RESULT_OUTPUTS + [o for o in outputs if o not in RESULT_OUTPUTS], parallel, timings,
+                 deadline)
+    return build_result(values, timings, deadline)
+
+
+class KolamAIProcessor:
+    """
+    Complete Kolam AI processing pipeline following the notebook steps:
+    1. Upload Image
+    2. Preprocessing (grayscale, threshold)
+    3. Circle/Dot Detection (Hough Transform)
+    4. Skeletonization
+    5. Noise Removal & Cleanup
+    6. Tracing Kolam Path
+    7. Mathematical Kolam Simulation (Lissajous)
+    8. Grid Size Analysis
+    9. Final Output & Visualization
+
+    The steps are stages of PIPELINE. `compute(outputs)` runs only what the
+    requested outputs depend on; intermediates are memoized on the processor,
+    so use one processor per request (image). This is a stateful wrapper
+    around the functional core (run_pipeline / analyze); `result()` returns
+    the immutable KolamResult of what has been computed. With a Deadline
+    (see deadline.py) every compute() is held to its budget.
+    """
+    
+    def __init__(self, config=None, deadline=None):
+        self.config = config or ACTIVE_CONFIG
+        self.deadline = deadline
+        self.values = {}
+        self.stage_timings = {}
+        self.processed_results = {}
+        self._sync_attributes()
+    
+    def load(self, image_bytes):
+        """Start a new image: forget every memoized intermediate"""
+        self.values = {"image_bytes": image_bytes, "config": self.config}
+        self.stage_timings = {}
+        self._sync_attributes()
+    
+    def compute(self, outputs, parallel=None):
+        """
+        Compute the named outputs (see PIPELINE.outputs) and return them as a dict.
+        parallel=None follows KOLAM_PIPELINE_MODE (see parallel_enabled).
+        """
+        if "image_bytes" not in self.values:
+            raise ValueError("No image loaded")
+        try:
+            return run_pipeline(self.values, outputs, parallel, self.stage_timings, self.deadline)
+        finally:
+            self._sync_attributes()
+    
+    def result(self, outputs=()):
+        """Immutable KolamResult of the loaded image, computing whatever is still missing"""
+        self.compute(RESULT_OUTPUTS + [o for o in outputs if o not in RESULT_OUTPUTS])
+        return build_result(self.values, self.stage_timings, self.deadline)
+    
+    def _sync_attributes(self):
+        # Keep the attribute interface the step methods always exposed
+        values = self.values
+        self.original_img = values.get("original")
+        self.gray_img = values.get("gray")
+        self.binary_img = values.get("clean_binary", values.get("binary"))
+        self.detected_dots = values.get("dots", [])
+        self.skeleton_img = values.get("skeleton")
+        self.grid_size = values.get("grid_size")
+        self.traced_paths = values.get("paths", [])
+        self.strokes = values.get("strokes", [])
+        self.final_visualization = values.get("visualization")  # raw PNG bytes
+    
+    def step1_upload_image(self, image_bytes):
+        """Step 1: Upload and read image"""
+        self.load(image_bytes)
+        return self.compute(["original"])["original"]
+    
+    def step2_preprocessing(self):
+        """Step 2: Convert to grayscale and apply binary thresholding"""
+        results = self.compute(["gray", "binary"])
+        return results["gray"], results["binary"]
+    
+    def step3_detect_dots(self):
+        """Step 3: Precise Kolam Dot Detection - Based on proven notebook algorithm"""
+        return self.compute(["dots"])["dots"]
+    
+    def debug_dot_detection(self, save_debug_images=True):
+        """Debug function to visualize dot detection process"""
+        debug_img = self.compute(["debug_dots"])["debug_dots"]
         
         if save_debug_images:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -236,346 +832,65 @@ class KolamAIProcessor:
     
     def step4_skeletonization(self):
         """Step 4: Skeletonization to thin lines to single-pixel width using OpenCV"""
-        # Invert binary image for skeletonization
-        inverted = cv2.bitwise_not(self.binary_img)
-        
-        # OpenCV-based skeletonization using morphological operations
-        skeleton = np.zeros(inverted.shape, np.uint8)
-        kernel = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
-        
-        while True:
-            # Erode the image
-            eroded = cv2.erode(inverted, kernel)
-            # Dilate the eroded image
-            opened = cv2.dilate(eroded, kernel)
-            # Subtract the opened image from the original
-            subset = cv2.subtract(inverted, opened)
-            # Union of skeleton and subset
-            skeleton = cv2.bitwise_or(skeleton, subset)
-            # Update inverted image
-            inverted = eroded.copy()
-            
-            # If the image is completely eroded, break
-            if cv2.countNonZero(inverted) == 0:
-                break
-        
-        self.skeleton_img = skeleton
-        
+        skeleton = self.compute(["skeleton"])["skeleton"]
         print("✓ Step 4: Skeletonization complete - Lines thinned using OpenCV morphology")
-        return self.skeleton_img
+        return skeleton
     
     def step5_noise_removal(self):
         """Step 5: Noise removal and cleanup using morphological operations"""
-        # Define kernel for morphological operations
-        kernel = np.ones((3, 3), np.uint8)
-        
-        # Apply opening (erosion followed by dilation) to remove noise
-        opened = cv2.morphologyEx(self.binary_img, cv2.MORPH_OPEN, kernel)
-        
-        # Apply closing (dilation followed by erosion) to close gaps
-        closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, kernel)
-        
-        # Update binary image with cleaned version
-        self.binary_img = closed
-        
-        print("✓ Step 5: Noise removal complete - Morphological operations applied")
-        return closed
+        return self.compute(["clean_binary"])["clean_binary"]
     
     def step6_trace_kolam_path(self):
         """Step 6: Trace continuous paths using BFS/DFS approach"""
-        def find_connected_components(skeleton):
-            """Find connected components in skeleton image"""
-            visited = np.zeros_like(skeleton, dtype=bool)
-            components = []
-            
-            directions = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
-            
-            for i in range(skeleton.shape[0]):
-                for j in range(skeleton.shape[1]):
-                    if skeleton[i,j] > 0 and not visited[i,j]:
-                        # Start BFS from this point
-                        component = []
-                        queue = deque([(i,j)])
-                        visited[i,j] = True
-                        
-                        while queue:
-                            y, x = queue.popleft()
-                            component.append((x, y))
-                            
-                            # Check 8-connected neighbors
-                            for dy, dx in directions:
-                                ny, nx = y + dy, x + dx
-                                if (0 <= ny < skeleton.shape[0] and 
-                                    0 <= nx < skeleton.shape[1] and
-                                    skeleton[ny, nx] > 0 and 
-                                    not visited[ny, nx]):
-                                    visited[ny, nx] = True
-                                    queue.append((ny, nx))
-                        
-                        if len(component) > 10:  # Only keep significant components
-                            components.append(component)
-            
-            return components
-        
-        traced_paths = find_connected_components(self.skeleton_img)
-        print(f"✓ Step 6: Path tracing complete - Found {len(traced_paths)} continuous paths")
-        return traced_paths
+        return self.compute(["paths"])["paths"]
+    
+    def extract_strokes(self):
+        """Ordered, simplified strokes along the skeleton for client-side animation"""
+        return self.compute(["strokes"])["strokes"]
+    
+    def stroke_blob(self):
+        """Strokes as a delta-encoded int16 blob (see stroke_encoding)"""
+        height, width = self.skeleton_img.shape[:2]
+        return encode_strokes(self.strokes, width, height)
     
     def step7_mathematical_simulation(self):
         """Step 7: Mathematical Kolam simulation using enhanced Lissajous curves"""
-        if self.grid_size is None:
-            self.grid_size = max(3, int(np.sqrt(len(self.detected_dots))) if self.detected_dots else 3)
-        
-        def generate_kolam_lissajous(grid_size, pattern_type=1):
-            """Generate Kolam-style Lissajous curves with different patterns"""
-            t = np.linspace(0, 4 * np.pi, 2000)
-            
-            if pattern_type == 1:
-                # Primary interwoven pattern
-                a, b = grid_size, grid_size - 1
-                delta = np.pi / 2
-            elif pattern_type == 2:
-                # Secondary supporting pattern
-                a, b = grid_size + 1, grid_size
-                delta = 0
-            else:
-                # Tertiary decorative pattern
-                a, b = grid_size - 1, grid_size + 1
-                delta = np.pi / 4
-            
-            x = np.sin(a * t + delta)
-            y = np.sin(b * t)
-            
-            return list(zip(x, y))
-        
-        # Generate multiple complementary patterns
-        patterns = []
-        for i in range(3):
-            pattern = generate_kolam_lissajous(self.grid_size, i + 1)
-            patterns.append(pattern)
-        
-        print(f"✓ Step 7: Mathematical simulation complete - Generated {len(patterns)} enhanced Lissajous patterns")
-        return patterns
+        return self.compute(["lissajous"])["lissajous"]
     
     def step8_grid_analysis(self):
         """Step 8: Analyze grid structure from detected dots"""
-        if not self.detected_dots:
-            self.grid_size = 3
-            return self.grid_size
-        
-        # Extract dot positions
-        dot_positions = [(x, y) for x, y, r in self.detected_dots]
-        
-        if len(dot_positions) < 4:
-            self.grid_size = max(2, int(np.sqrt(len(dot_positions))))
-        else:
-            # Estimate grid size based on dot distribution
-            x_coords = [pos[0] for pos in dot_positions]
-            y_coords = [pos[1] for pos in dot_positions]
-            
-            # Calculate approximate grid dimensions
-            x_range = max(x_coords) - min(x_coords)
-            y_range = max(y_coords) - min(y_coords)
-            
-            # Estimate based on spacing
-            if len(dot_positions) > 1:
-                # Sort by x to find horizontal spacing
-                sorted_x = sorted(set([int(x/20)*20 for x in x_coords]))  # Quantize to reduce noise
-                if len(sorted_x) > 1:
-                    avg_spacing = np.mean(np.diff(sorted_x))
-                    estimated_cols = max(2, int(x_range / avg_spacing) + 1) if avg_spacing > 0 else int(np.sqrt(len(dot_positions)))
-                else:
-                    estimated_cols = int(np.sqrt(len(dot_positions)))
-                
-                self.grid_size = max(2, min(estimated_cols, int(np.sqrt(len(dot_positions)) + 1)))
-            else:
-                self.grid_size = int(np.sqrt(len(dot_positions)))
-        
-        print(f"✓ Step 8: Grid analysis complete - Estimated grid size: {self.grid_size}x{self.grid_size}")
-        return self.grid_size
+        return self.compute(["grid_size"])["grid_size"]
     
     def step9_final_visualization(self):
         """Step 9: Create final output combining all elements using OpenCV"""
-        # Create a comprehensive visualization using OpenCV
-        
-        # Resize all images to the same size for consistent display
-        height, width = 400, 400
-        
-        # Prepare images - include both grayscale and binary
-        original_resized = cv2.resize(self.original_img, (width, height))
-        grayscale_resized = cv2.resize(self.gray_img, (width, height))  # Use grayscale instead of binary
-        binary_resized = cv2.resize(self.binary_img, (width, height))
-        skeleton_resized = cv2.resize(self.skeleton_img, (width, height))
-        
-        # Create dots visualization with improved visibility and correct positioning
-        dots_img = original_resized.copy()
-        
-        # Get original image dimensions
-        orig_height, orig_width = self.original_img.shape[:2]
-        
-        print(f"Debug: Original image size: {orig_width}x{orig_height}, Resized: {width}x{height}")
-        
-        for i, (x, y, r) in enumerate(self.detected_dots):
-            # Correctly scale coordinates from original image to resized image
-            x_scaled = int(x * width / orig_width)
-            y_scaled = int(y * height / orig_height)
-            r_scaled = max(3, int(r * width / orig_width))
-            
-            # Ensure coordinates are within bounds
-            x_scaled = max(0, min(x_scaled, width - 1))
-            y_scaled = max(0, min(y_scaled, height - 1))
-            
-            if i < 5:  # Debug first 5 dots
-                print(f"Debug dot {i}: orig({x},{y}) -> scaled({x_scaled},{y_scaled})")
-            
-            # Draw multiple circles for better visibility
-            cv2.circle(dots_img, (x_scaled, y_scaled), r_scaled + 4, (0, 255, 0), 3)  # Green outer circle
-            cv2.circle(dots_img, (x_scaled, y_scaled), r_scaled, (255, 255, 255), -1)  # White filled circle
-            cv2.circle(dots_img, (x_scaled, y_scaled), r_scaled, (0, 0, 255), 2)       # Blue outline
-            cv2.circle(dots_img, (x_scaled, y_scaled), 3, (255, 0, 0), -1)             # Red center dot
-        
-        # Create mathematical simulation visualization with proper Kolam patterns
-        math_img = np.zeros((height, width, 3), dtype=np.uint8)
-        math_img.fill(40)  # Dark gray background instead of black
-        
-        # Draw Lissajous pattern with improved visibility
-        if self.grid_size > 0:
-            # Generate more points for smoother curves
-            t = np.linspace(0, 4 * np.pi, 2000)  # More points and longer curve
-            
-            # Create mathematical Kolam patterns based on grid size
-            center_x, center_y = width // 2, height // 2
-            scale = min(width, height) // 3
-            
-            # Pattern 1: Main Lissajous curve (Purple)
-            a, b = self.grid_size, self.grid_size - 1
-            x_liss1 = center_x + scale * np.sin(a * t + np.pi/2)
-            y_liss1 = center_y + scale * np.sin(b * t)
-            
-            # Pattern 2: Secondary curve (Cyan)
-            x_liss2 = center_x + scale * 0.8 * np.sin((a+1) * t)
-            y_liss2 = center_y + scale * 0.8 * np.sin(b * t + np.pi/4)
-            
-            # Pattern 3: Tertiary curve (Yellow)
-            x_liss3 = center_x + scale * 0.6 * np.sin(a * t + np.pi/3)
-            y_liss3 = center_y + scale * 0.6 * np.sin((b+1) * t + np.pi/6)
-            
-            patterns = [
-                (x_liss1, y_liss1, (255, 100, 255), 3),  # Purple, thick
-                (x_liss2, y_liss2, (100, 255, 255), 2),  # Cyan, medium
-                (x_liss3, y_liss3, (255, 255, 100), 2)   # Yellow, medium
-            ]
-            
-            for x_curve, y_curve, color, thickness in patterns:
-                # Convert to integer coordinates and ensure bounds
-                x_scaled = np.clip(x_curve.astype(int), 0, width-1)
-                y_scaled = np.clip(y_curve.astype(int), 0, height-1)
-                
-                # Draw the curve
-                for i in range(len(x_scaled) - 1):
-                    cv2.line(math_img, (x_scaled[i], y_scaled[i]), (x_scaled[i+1], y_scaled[i+1]), color, thickness)
-            
-            # Add strategic grid dots based on actual Kolam structure (not a full grid)
-            if self.grid_size >= 3:
-                # Only add key intersection points, not every grid point
-                key_points = [
-                    (center_x, center_y),  # Center
-                    (center_x - scale//2, center_y - scale//2),  # Top-left
-                    (center_x + scale//2, center_y - scale//2),  # Top-right
-                    (center_x - scale//2, center_y + scale//2),  # Bottom-left
-                    (center_x + scale//2, center_y + scale//2),  # Bottom-right
-                ]
-                
-                # Add some intermediate points for larger grids
-                if self.grid_size >= 4:
-                    key_points.extend([
-                        (center_x, center_y - scale//2),  # Top-center
-                        (center_x, center_y + scale//2),  # Bottom-center
-                        (center_x - scale//2, center_y),  # Left-center
-                        (center_x + scale//2, center_y),  # Right-center
-                    ])
-                
-                # Draw key dots
-                for x_dot, y_dot in key_points:
-                    if 0 <= x_dot < width and 0 <= y_dot < height:
-                        cv2.circle(math_img, (x_dot, y_dot), 8, (255, 255, 255), -1)
-                        cv2.circle(math_img, (x_dot, y_dot), 8, (0, 0, 0), 2)
-                        cv2.circle(math_img, (x_dot, y_dot), 3, (255, 0, 0), -1)
-        
-        # Create enhanced Kolam
-        enhanced_img = self.create_enhanced_kolam()
-        enhanced_resized = cv2.resize(enhanced_img, (width, height))
-        
-        # Convert grayscale and skeleton to 3-channel for concatenation
-        grayscale_3ch = cv2.cvtColor(grayscale_resized, cv2.COLOR_GRAY2BGR)
-        skeleton_3ch = cv2.cvtColor(skeleton_resized, cv2.COLOR_GRAY2BGR)
-        
-        # Create a 2x3 grid of images
-        top_row = np.hstack([original_resized, grayscale_3ch, dots_img])
-        bottom_row = np.hstack([skeleton_3ch, math_img, enhanced_resized])
-        final_img = np.vstack([top_row, bottom_row])
-        
-        # Add titles using OpenCV text with better visibility
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.8
-        thickness = 2
-        
-        # Top row titles
-        cv2.putText(final_img, "1. Original Image", (10, 35), font, font_scale, (255, 255, 255), thickness)
-        cv2.putText(final_img, "2. Grayscale", (width + 10, 35), font, font_scale, (255, 255, 255), thickness)
-        cv2.putText(final_img, f"3. Detected Dots ({len(self.detected_dots)})", (2*width + 10, 35), font, font_scale, (0, 255, 0), thickness)
-        
-        # Bottom row titles
-        cv2.putText(final_img, "4. Skeleton Pattern", (10, height + 35), font, font_scale, (255, 255, 255), thickness)
-        cv2.putText(final_img, "5. Mathematical Curves", (width + 10, height + 35), font, font_scale, (255, 100, 255), thickness)
-        cv2.putText(final_img, "6. Enhanced Recreation", (2*width + 10, height + 35), font, font_scale, (255, 255, 0), thickness)
-        
-        # Convert to PIL Image and then to base64
-        final_img_rgb = cv2.cvtColor(final_img, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(final_img_rgb)
-        
-        buf = io.BytesIO()
-        pil_img.save(buf, format='PNG')
-        buf.seek(0)
-        
-        return buf.getvalue()
+        return self.compute(["visualization"])["visualization"]
     
     def create_enhanced_kolam(self):
         """Create an enhanced version combining detected elements with artistic rendering"""
-        # Create a clean background
-        height, width = self.original_img.shape[:2]
-        enhanced = np.ones((height, width, 3), dtype=np.uint8) * 50  # Dark background
-        
-        # Draw detected dots
-        for x, y, r in self.detected_dots:
-            cv2.circle(enhanced, (x, y), r+2, (255, 255, 255), -1)  # White filled circles
-            cv2.circle(enhanced, (x, y), r+2, (200, 100, 255), 3)   # Purple outline
-        
-        # Draw skeleton paths in bright color
-        skeleton_colored = cv2.cvtColor(self.skeleton_img, cv2.COLOR_GRAY2BGR)
-        mask = self.skeleton_img > 0
-        enhanced[mask] = [255, 150, 100]  # Orange/coral color for paths
-        
-        return enhanced
+        results = self.compute(["original", "dots", "skeleton"])
+        return render_enhanced(results["original"].shape, results["dots"], results["skeleton"])
     
-    def process_complete_pipeline(self, image_bytes):
-        """Execute the complete 9-step Kolam AI pipeline"""
+    def process_complete_pipeline(self, image_bytes, debug=None, parallel=None):
+        """
+        Execute the Kolam AI pipeline for a full /predict response.
+        Only the stages the response needs run; the dot debug image is opt-in
+        (debug=True or KOLAM_DEBUG_DOTS=1). parallel=None follows
+        KOLAM_PIPELINE_MODE; profiled requests pass False so that every stage
+        runs on the profiled thread.
+        """
         print("🎨 Starting Kolam AI Complete Pipeline...")
-        
-        # Execute all steps in sequence
-        self.step1_upload_image(image_bytes)
-        self.step2_preprocessing()
-        self.step3_detect_dots()
-        
-        # Add debug visualization for dot detection
-        self.debug_dot_detection(save_debug_images=True)
-        
-        self.step4_skeletonization()
-        self.step5_noise_removal()
-        self.step6_trace_kolam_path()
-        self.step8_grid_analysis()  # Do grid analysis before mathematical simulation
-        lissajous_patterns = self.step7_mathematical_simulation()
-        final_visualization = self.step9_final_visualization()
+        if debug is None:
+            debug = os.environ.get("KOLAM_DEBUG_DOTS", "0") == "1"
+        
+        start = time.perf_counter()
+        if parallel is None:
+            parallel = parallel_enabled()
+        if self.values.get("image_bytes") is not image_bytes:
+            self.load(image_bytes)  # otherwise keep what was already computed for this image
+        self.compute(FULL_OUTPUTS, parallel=parallel)
+        wall_ms = (time.perf_counter() - start) * 1000
+        if debug:
+            self.debug_dot_detection(save_debug_images=True)
         
         # Prepare results
         self.processed_results = {
@@ -583,8 +898,18 @@ class KolamAIProcessor:
             'detected_dots_count': len(self.detected_dots),
             'grid_size': self.grid_size,
             'processing_complete': True,
-            'final_visualization': base64.b64encode(final_visualization).decode('utf-8')
+            'stroke_count': len(self.strokes),
+            'symmetry': self.values["symmetry"],
+            'lissajous_fit': self.values["lissajous_fit"],
+            'tiles': tiles_to_text(self.values["tiles"]),
+            'palette': self.values["palette"],
+            'stage_timings_ms': dict(self.stage_timings),
+            'pipeline_mode': 'parallel' if parallel else 'serial',
+            'deadline': self.deadline.report() if self.deadline is not None else None,
+            'strokes': base64.b64encode(self.stroke_blob()).decode('utf-8'),
+            'final_visualization': base64.b64encode(self.final_visualization).decode('utf-8')
         }
         
-        print("✅ Kolam AI Pipeline Complete!")
-        return self.processed_results
\ No newline at end of file
+        print(f"✅ Kolam AI Pipeline Complete! ({len(self.stage_timings)} stages, {wall_ms:.0f}ms "
+              f"{'parallel' if parallel else 'serial'})")
+        return self.processed_results
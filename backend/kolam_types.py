@@ -0,0 +1,191 @@
+"""
+Immutable configuration and result types of the analysis core (see
+kolam_processor.analyze).
+
+Results hold NumPy arrays instead of lists of tuples and use __slots__, so
+they are cheap to pickle into and out of process pools and safe to share
+between threads. KolamConfig is frozen and hashable, so it can key caches.
+"""
+
+import json
+import os
+from collections import namedtuple
+from dataclasses import dataclass, asdict, fields
+
+import numpy as np
+
+from stroke_encoding import encode_strokes
+from tile_encoding import tiles_to_text
+
+# A detected pulli; a tuple, so `for x, y, r in dots` keeps working
+Dot = namedtuple("Dot", ["x", "y", "r"])
+
+
+def _readonly(array, dtype):
+    view = np.asarray(array, dtype=dtype).view()
+    view.flags.writeable = False
+    return view
+
+
+@dataclass(frozen=True, slots=True)
+class KolamConfig:
+    """Tunable pipeline parameters; the defaults are the notebook-proven values"""
+    threshold: int = 127            # binarization: darker pixels are strokes
+    max_dots: int = 12              # None keeps every detected dot
+    fallback: bool = True           # sensitive second Hough pass and 3x3 grid estimate
+    hough_min_dist: int = 20
+    hough_param1: float = 50
+    hough_param2: float = 12
+    min_radius: int = 5
+    max_radius: int = 15
+    edge_margin: int = 15           # dots closer than this to the border are dropped
+    min_contrast: float = 5.0       # minimum grey-level std around a dot
+    min_spacing: int = 15           # minimum distance between kept dots
+    max_candidates: int = None      # highest-contrast circles given to the spacing filter; None keeps all
+    palette_colors: int = 6         # k of the colour palette k-means (before merging close colours)
+
+    def detection_kwargs(self):
+        """Keyword arguments for kolam_processor.detect_dots"""
+        return {
+            "max_dots": self.max_dots,
+            "fallback": self.fallback,
+            "min_dist": self.hough_min_dist,
+            "param1": self.hough_param1,
+            "param2": self.hough_param2,
+            "min_radius": self.min_radius,
+            "max_radius": self.max_radius,
+            "edge_margin": self.edge_margin,
+            "min_contrast": self.min_contrast,
+            "min_spacing": self.min_spacing,
+            "max_candidates": self.max_candidates,
+        }
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown config keys: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+DEFAULT_CONFIG = KolamConfig()
+
+PRESET_DIR = "presets"
+
+
+def preset_path(name):
+    return os.path.join(PRESET_DIR, f"{name}.json")
+
+
+def save_preset(name, config, metrics=None, source=None):
+    """Write a named preset: the config plus how it scored and where it came from"""
+    os.makedirs(PRESET_DIR, exist_ok=True)
+    path = preset_path(name)
+    with open(path, "w") as f:
+        json.dump({"name": name, "config": config.to_dict(), "metrics": metrics or {}, "source": source},
+                  f, indent=2)
+    return path
+
+
+def load_config(name_or_path):
+    """KolamConfig from a preset name, a preset file or a bare config JSON file"""
+    path = name_or_path if os.path.exists(name_or_path) else preset_path(name_or_path)
+    if not os.path.exists(path):
+        raise ValueError(f"No preset or config file '{name_or_path}'")
+    with open(path) as f:
+        data = json.load(f)
+    return KolamConfig.from_dict(data["config"] if "config" in data else data)
+
+
+@dataclass(frozen=True, slots=True)
+class Path:
+    """An ordered polyline (stroke) or pixel chain (traced path) as an (N, 2) int32 x, y array"""
+    points: np.ndarray
+
+    def __post_init__(self):
+        object.__setattr__(self, "points", _readonly(self.points, np.int32).reshape(-1, 2))
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def bbox(self):
+        """(x_min, y_min, x_max, y_max)"""
+        (x0, y0), (x1, y1) = self.points.min(axis=0), self.points.max(axis=0)
+        return int(x0), int(y0), int(x1), int(y1)
+
+
+@dataclass(frozen=True, slots=True)
+class KolamResult:
+    """
+    Analysis of one image. `dots` is an (N, 3) int32 array of x, y, r and
+    `tiles` a (rows, cols) uint8 tile code (see tile_encoding), or None.
+    `color_labels` maps each pixel of the palette's working resolution to
+    its colour in `palette["colors"]` (see color_mask).
+    `paths` and `visualization` are None unless they were requested.
+    `deadline` reports the budget and any degradations when one was set.
+    """
+    width: int
+    height: int
+    grid_size: int
+    dots: np.ndarray
+    strokes: tuple
+    symmetry: dict = None
+    lissajous_fit: dict = None
+    tiles: np.ndarray = None
+    palette: dict = None
+    color_labels: np.ndarray = None
+    paths: tuple = None
+    visualization: bytes = None
+    stage_timings_ms: dict = None
+    deadline: dict = None
+    config: KolamConfig = DEFAULT_CONFIG
+
+    def __post_init__(self):
+        object.__setattr__(self, "dots", _readonly(self.dots, np.int32).reshape(-1, 3))
+        if self.tiles is not None:
+            object.__setattr__(self, "tiles", _readonly(self.tiles, np.uint8))
+        if self.color_labels is not None:
+            object.__setattr__(self, "color_labels", _readonly(self.color_labels, np.uint8))
+
+    @property
+    def dot_list(self):
+        return [Dot(int(x), int(y), int(r)) for x, y, r in self.dots]
+
+    @property
+    def dot_count(self):
+        return len(self.dots)
+
+    @property
+    def stroke_count(self):
+        return len(self.strokes)
+
+    def color_mask(self, index):
+        """Boolean mask of palette colour `index` at the palette's working resolution"""
+        return self.color_labels == index
+
+    def stroke_blob(self):
+        """Strokes as a delta-encoded int16 blob (see stroke_encoding)"""
+        return encode_strokes([s.points for s in self.strokes], self.width, self.height)
+
+    def to_dict(self):
+        """Plain-Python summary (strokes as the encoded blob; no visualization or paths)"""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "grid_size": self.grid_size,
+            "dot_count": self.dot_count,
+            "dots": self.dots.tolist(),
+            "stroke_count": self.stroke_count,
+            "strokes": self.stroke_blob(),
+            "symmetry": self.symmetry,
+            "lissajous_fit": self.lissajous_fit,
+            "tiles": tiles_to_text(self.tiles),
+            "palette": self.palette,
+            "stage_timings_ms": dict(self.stage_timings_ms or {}),
+            "deadline": self.deadline,
+        }
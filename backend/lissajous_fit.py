@@ -0,0 +1,196 @@
+import math
+import time
+
+import numpy as np
+
+FIT_POINTS = 256            # arc-length samples of the stroke
+MAX_HARMONIC = 12           # highest frequency considered on either axis
+MIN_FIT_LENGTH = 20.0       # pixels; shorter strokes are noise
+MAX_RESIDUAL = 0.3          # above this the fit does not describe the drawing
+CLOSED_GAP = 0.05           # end-to-start gap, as a fraction of the length, that still counts as closed
+TANGENT_SPAN = 6.0          # pixels used to estimate a stroke's direction at its ends
+CORNER_STEP = 3.0           # resampling step, in pixels, before looking for corners
+CORNER_ANGLE = 50.0         # degrees of turn over 2 * CORNER_STEP pixels that count as a corner
+MAX_JOIN_GAP = 0.08         # largest gap bridged when chaining strokes, as a fraction of the image diagonal
+MAX_CHAIN_PIECES = 400      # longest pieces considered; busy rangolis split into thousands
+
+
+def _direction(points, at_end):
+    """Unit tangent leaving the polyline at one end, over about TANGENT_SPAN pixels"""
+    ordered = points[::-1] if not at_end else points
+    tip = ordered[-1]
+    for previous in ordered[-2::-1]:
+        if np.linalg.norm(tip - previous) >= TANGENT_SPAN:
+            break
+    vector = tip - previous
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _resample_polyline(points, step):
+    """The polyline with vertices every `step` pixels of arc length"""
+    steps = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    positions = np.concatenate([[0.0], np.cumsum(steps)])
+    u = np.arange(0.0, positions[-1], step)
+    return np.stack([np.interp(u, positions, points[:, 0]), np.interp(u, positions, points[:, 1])], axis=1)
+
+
+def split_at_corners(points):
+    """
+    Cut a stroke wherever it turns sharply. Kolam lines are smooth; a corner
+    means the skeleton walk turned onto the other line at a crossing.
+    """
+    points = _resample_polyline(points, CORNER_STEP)
+    if len(points) < 5:
+        return [points]
+    before = points[2:-2] - points[:-4]
+    after = points[4:] - points[2:-2]
+    cosine = (before * after).sum(axis=1) / (
+        np.linalg.norm(before, axis=1) * np.linalg.norm(after, axis=1) + 1e-9)
+    sharp = cosine < math.cos(math.radians(CORNER_ANGLE))
+    # One cut per corner: the sharpest vertex of each run of sharp vertices
+    cuts, run = [], []
+    for index in range(len(sharp) + 1):
+        if index < len(sharp) and sharp[index]:
+            run.append(index)
+        elif run:
+            cuts.append(min(run, key=lambda i: cosine[i]) + 2)
+            run = []
+    bounds = [0] + cuts + [len(points) - 1]
+    return [points[a:b + 1] for a, b in zip(bounds, bounds[1:]) if b - a >= 1]
+
+
+def chain_strokes(strokes, max_gap):
+    """
+    Join skeleton strokes into one path, the way the kolam is drawn.
+
+    Strokes are cut at corners, where the skeleton walk turned at a crossing
+    or the skeleton broke the line. Then, starting from the longest piece, we
+    keep stepping to the piece whose endpoint is near and whose direction
+    continues the current one (straight through crossings), first forwards
+    and then backwards from the start.
+    """
+    pieces = []
+    for stroke in strokes:
+        points = np.asarray(stroke, dtype=np.float64).reshape(-1, 2)
+        if len(points) >= 2:
+            pieces.extend(p for p in split_at_corners(points) if len(p) >= 2)
+    if not pieces:
+        return None
+    lengths = np.array([float(np.linalg.norm(np.diff(p, axis=0), axis=1).sum()) for p in pieces])
+    # Chaining is quadratic in the piece count; the line is made of the long pieces
+    longest = np.argsort(-lengths, kind="stable")[:MAX_CHAIN_PIECES]
+    pieces = [pieces[i] for i in longest]
+    first = 0
+    used = {first}
+    taken = np.zeros(2 * len(pieces), dtype=bool)
+    taken[0:2] = True
+    # Endpoint table: row 2i is the start of piece i, row 2i + 1 its end
+    ends = np.array([point for p in pieces for point in (p[0], p[-1])])
+    leaving = np.array([d for p in pieces for d in (-_direction(p, False), -_direction(p, True))])
+
+    path = [pieces[first]]
+    for _ in range(2):
+        while len(used) < len(pieces):
+            tip, heading = path[-1][-1], _direction(path[-1], True)
+            gaps = np.linalg.norm(ends - tip, axis=1)
+            # Cost: gap plus turning; 1 - cos is 0 straight on and 2 for a U-turn
+            cost = gaps / max_gap + (1 - leaving @ heading)
+            cost[(gaps > max_gap) | taken] = np.inf
+            best = int(np.argmin(cost))
+            if not np.isfinite(cost[best]):
+                break
+            index = best // 2
+            used.add(index)
+            taken[2 * index:2 * index + 2] = True
+            path.append(pieces[index] if best % 2 == 0 else pieces[index][::-1])
+        path = [p[::-1] for p in path[::-1]]
+    return np.vstack(path), len(used)
+
+
+def _arc_length_samples(points, count):
+    """`count` points equally spaced along the polyline, closed back to its start"""
+    closed = np.vstack([points, points[:1]])
+    steps = np.linalg.norm(np.diff(closed, axis=0), axis=1)
+    positions = np.concatenate([[0.0], np.cumsum(steps)])
+    u = np.linspace(0.0, positions[-1], count, endpoint=False)
+    return np.interp(u, positions, closed[:, 0]), np.interp(u, positions, closed[:, 1])
+
+
+def _dominant(spectrum):
+    """Strongest harmonic 1..MAX_HARMONIC of an rfft: (k, amplitude, phase of sin(k t + phase))"""
+    band = spectrum[1:MAX_HARMONIC + 1]
+    k = int(np.argmax(np.abs(band))) + 1
+    amplitude = 2 * abs(spectrum[k]) / FIT_POINTS
+    return k, amplitude, float(np.angle(spectrum[k])) + math.pi / 2
+
+
+def fit_lissajous(strokes, original_img):
+    """
+    Fit x = A sin(a t + delta), y = B sin(b t) to the traced kolam line.
+
+    The skeleton strokes are chained into one path (see chain_strokes),
+    resampled by arc length and treated as one period, so one FFT per axis
+    gives the dominant frequency, amplitude and phase. a and b are reduced by
+    their gcd and delta is reported modulo 2*pi/b (shifting t by a period of
+    y leaves the curve unchanged), in its smaller form of the two traversal
+    directions. `residual` is the RMS error of the
+    single-harmonic reconstruction relative to the path's spread (0 = exact).
+    Returns None when there is no usable stroke.
+    """
+    start = time.perf_counter()
+    height, width = original_img.shape[:2]
+    chained = chain_strokes(strokes, max(8.0, MAX_JOIN_GAP * math.hypot(width, height)))
+    if chained is None:
+        return None
+    best, joined = chained
+    best_length = float(np.linalg.norm(np.diff(best, axis=0), axis=1).sum())
+    if best_length < MIN_FIT_LENGTH:
+        return None
+
+    x, y = _arc_length_samples(best, FIT_POINTS)
+    center = x.mean(), y.mean()
+    x, y = x - center[0], y - center[1]
+    kx, amplitude_x, phase_x = _dominant(np.fft.rfft(x))
+    ky, amplitude_y, phase_y = _dominant(np.fft.rfft(y))
+
+    t = 2 * math.pi * np.arange(FIT_POINTS) / FIT_POINTS
+    error = (x - amplitude_x * np.sin(kx * t + phase_x)) ** 2 + (y - amplitude_y * np.sin(ky * t + phase_y)) ** 2
+    spread = float((x * x + y * y).sum())
+    residual = math.sqrt(float(error.sum()) / spread) if spread > 0 else 1.0
+
+    divisor = math.gcd(kx, ky)
+    a, b = kx // divisor, ky // divisor
+    period = 2 * math.pi / b
+    delta = phase_x - a * phase_y / b
+    # Tracing the same curve backwards gives pi - delta - a*pi/b; report the smaller
+    candidates = [d % period for d in (delta, math.pi - delta - a * math.pi / b)]
+    delta = min(0.0 if period - d < 1e-3 else d for d in candidates)
+    gap = float(np.linalg.norm(best[-1] - best[0]))
+
+    return {
+        "a": a,
+        "b": b,
+        "delta": round(delta, 4),
+        "delta_deg": round(math.degrees(delta), 1),
+        "residual": round(residual, 4),
+        "amplitude": [round(float(amplitude_x), 1), round(float(amplitude_y), 1)],
+        "center": [round(float(center[0]), 1), round(float(center[1]), 1)],
+        "closed": gap <= CLOSED_GAP * best_length,
+        "path_length": round(best_length, 1),
+        "strokes_joined": joined,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def fit_usable(fit):
+    """A closed path that the fitted curve describes; an open fragment fits anything"""
+    return fit is not None and fit["closed"] and fit["residual"] <= MAX_RESIDUAL
+
+
+def curve_parameters(grid_size, fit=None):
+    """(a, b, delta, y/x amplitude ratio) for drawing: the fit when it is good, else the grid heuristic"""
+    if fit_usable(fit):
+        ratio = fit["amplitude"][1] / fit["amplitude"][0] if fit["amplitude"][0] > 0 else 1.0
+        return fit["a"], fit["b"], fit["delta"], min(2.0, max(0.5, ratio))
+    return grid_size, grid_size - 1, math.pi / 2, 1.0
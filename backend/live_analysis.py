@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+import base64
+import binascii
+import time
+
+from kolam_processor import detect_dots, estimate_grid_size
+
+WORKING_WIDTH = 320          # frames are analysed at this width
+STILL_THRESHOLD = 1.5        # mean abs difference below which the last result is reused
+TRACK_THRESHOLD = 12.0       # above this the scene changed too much to track; run Hough again
+REDETECT_EVERY = 30          # force a fresh detection every N frames to correct tracker drift
+MAX_LOST_FRACTION = 0.3      # re-detect if the tracker loses more than this share of dots
+
+LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+
+
+def decode_frame(message):
+    """Frames arrive as raw JPEG/PNG bytes or as base64 text (optionally a data URL); None if unreadable"""
+    if isinstance(message, str):
+        try:
+            message = base64.b64decode(message.split(",", 1)[-1])
+        except (binascii.Error, ValueError):
+            return None
+    if not message:
+        return None
+    return cv2.imdecode(np.frombuffer(message, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+class LiveFrameAnalyzer:
+    """
+    Per-connection state for live camera analysis.
+
+    Every frame is downscaled to WORKING_WIDTH. Hough dot detection only runs
+    when the scene changed a lot (or periodically); small camera motion is
+    followed with pyramidal Lucas-Kanade optical flow on the previous dots,
+    and a still scene reuses the previous result outright.
+    """
+
+    def __init__(self, working_width=WORKING_WIDTH):
+        self.working_width = working_width
+        self.prev_small = None
+        self.dots = np.empty((0, 3), dtype=np.float32)   # x, y, r in working coordinates
+        self.grid_size = None
+        self.frames_since_detect = 0
+        self.frame_count = 0
+
+    def _detect(self, small):
+        found = detect_dots(small, max_dots=None, fallback=False, verbose=False)
+        self.dots = np.array(found, dtype=np.float32).reshape(-1, 3)
+        self.frames_since_detect = 0
+        return "detected"
+
+    def _track(self, small):
+        points = np.ascontiguousarray(self.dots[:, :2]).reshape(-1, 1, 2)
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_small, small, points, None, **LK_PARAMS)
+        found = status.ravel() == 1
+        if found.mean() < 1 - MAX_LOST_FRACTION:
+            return self._detect(small)
+
+        tracked = self.dots[found].copy()
+        tracked[:, :2] = new_points[found].reshape(-1, 2)
+        self.dots = tracked
+        return "tracked"
+
+    def analyze(self, message):
+        start = time.perf_counter()
+        gray = decode_frame(message)
+        if gray is None:
+            return {"error": "Could not decode frame"}
+
+        height, width = gray.shape
+        scale = min(1.0, self.working_width / width)
+        small = gray if scale == 1.0 else cv2.resize(
+            gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+        self.frame_count += 1
+        self.frames_since_detect += 1
+
+        if self.prev_small is None or self.prev_small.shape != small.shape:
+            mode = self._detect(small)
+            change = None
+        else:
+            change = float(cv2.absdiff(small, self.prev_small).mean())
+            if change > TRACK_THRESHOLD or self.frames_since_detect >= REDETECT_EVERY or len(self.dots) == 0:
+                mode = self._detect(small)
+            elif change < STILL_THRESHOLD:
+                mode = "reused"
+            else:
+                mode = self._track(small)
+
+        if mode != "reused" or self.grid_size is None:
+            self.grid_size = estimate_grid_size([tuple(d) for d in self.dots])
+        self.prev_small = small
+
+        # Report dots in the coordinates of the frame the client sent
+        dots = [
+            [round(float(x) / scale, 1), round(float(y) / scale, 1), round(float(r) / scale, 1)]
+            for x, y, r in self.dots
+        ]
+        return {
+            "frame": self.frame_count,
+            "mode": mode,
+            "dots": dots,
+            "detected_dots_count": len(dots),
+            "grid_size": self.grid_size,
+            "frame_shape": [height, width],
+            "change": None if change is None else round(change, 2),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
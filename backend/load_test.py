@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Load test for the Kolam backend.
+
+Replays the image corpus (../kolam, ../abhi and synthetic pulli grids) against
+an endpoint at a fixed concurrency (closed loop) or a fixed arrival rate (open
+loop, Poisson arrivals), either in-process over the ASGI transport or against a
+running server. Reports throughput, latency percentiles, error and 429 rates,
+near-duplicate cache hits and the server's RSS over time.
+
+The corpus is small, so after one pass nearly every /predict would be a
+near-duplicate hit (see near_duplicates.py), which measures SQLite and not
+the pipeline. The in-process app therefore runs without the index unless
+--duplicate-index is given; start a server under test with
+KOLAM_DUPLICATE_INDEX=0 for the same reason (the report counts hits).
+Needs httpx, from requirements-dev.txt.
+
+Usage:
+    python load_test.py                                   # in-process, 4 concurrent, 30s
+    python load_test.py --concurrency 16 --duration 60
+    python load_test.py --rate 5 --duration 60            # open loop, 5 req/s
+    python load_test.py --url http://localhost:8080 --server-pid 1234
+    python load_test.py --endpoint /strokes --corpus synthetic --json
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+CORPUS_DIRS = {"kolam": os.path.join(REPO_ROOT, "kolam"), "abhi": os.path.join(REPO_ROOT, "abhi")}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+RSS_INTERVAL = 1.0
+
+
+def load_corpus(sources, synthetic_count=8):
+    """List of (name, bytes) from the requested sources"""
+    images = []
+    for source in sources:
+        if source == "synthetic":
+            from startup import synthetic_kolam_image
+            for i in range(synthetic_count):
+                grid, size = 2 + i % 5, 240 + 80 * (i % 4)
+                images.append((f"synthetic_{grid}x{grid}_{size}.jpg", synthetic_kolam_image(grid, size)))
+            continue
+
+        root = CORPUS_DIRS[source]
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    with open(os.path.join(dirpath, filename), "rb") as f:
+                        images.append((filename, f.read()))
+    return images
+
+
+def read_rss_mb(pid):
+    """Resident set size of `pid` from /proc, in MB (None where /proc is unavailable)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class LoadRun:
+    def __init__(self, client, endpoint, images, server_pid):
+        self.client = client
+        self.endpoint = endpoint
+        self.images = images
+        self.server_pid = server_pid
+        self.results = []     # (finish offset s, latency ms, status or None)
+        self.duplicate_hits = 0
+        self.rss = []         # (offset s, MB)
+        self.start = None
+
+    async def one_request(self, scheduled=None):
+        name, data = random.choice(self.images)
+        mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        # Open-loop latency counts from the scheduled arrival, so queueing is not hidden
+        begin = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            response = await self.client.post(self.endpoint, files={"file": (name, data, mime)})
+            status = response.status_code
+            if b'"near_duplicate"' in response.content:
+                self.duplicate_hits += 1
+        except Exception:
+            status = None
+        end = time.perf_counter()
+        self.results.append((end - self.start, (end - begin) * 1000, status))
+
+    def sample_rss(self, stop):
+        # A thread, not a task: in-process handlers that block the event loop would starve it
+        while True:
+            mb = read_rss_mb(self.server_pid)
+            if mb is not None:
+                self.rss.append((round(time.perf_counter() - self.start, 1), round(mb, 1)))
+            if stop.wait(RSS_INTERVAL):
+                break
+
+    async def closed_loop(self, concurrency, deadline, total):
+        async def worker():
+            while time.perf_counter() < deadline and (total is None or len(self.results) < total):
+                await self.one_request()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, rate, deadline, total, max_inflight):
+        inflight = set()
+        sent = 0
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline and (total is None or sent < total):
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(inflight) >= max_inflight:
+                # Client-side saturation: count as an error instead of queueing without bound
+                self.results.append((time.perf_counter() - self.start, 0.0, None))
+            else:
+                task = asyncio.create_task(self.one_request(scheduled=next_arrival))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+            sent += 1
+            next_arrival += random.expovariate(rate)
+        if inflight:
+            await asyncio.gather(*inflight)
+
+    async def run(self, concurrency, rate, duration, total, max_inflight):
+        self.start = time.perf_counter()
+        deadline = self.start + duration
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.sample_rss, args=(stop,), daemon=True)
+        sampler.start()
+        if rate:
+            await self.open_loop(rate, deadline, total, max_inflight)
+        else:
+            await self.closed_loop(concurrency, deadline, total)
+        stop.set()
+        sampler.join()
+        return time.perf_counter() - self.start
+
+
+def summarize(results, rss, elapsed, duplicate_hits=0):
+    latencies = sorted(ms for _, ms, status in results if status is not None and 200 <= status < 300)
+    count = len(results)
+    throttled = sum(1 for _, _, status in results if status == 429)
+    errors = sum(1 for _, _, status in results if status is None or (status >= 400 and status != 429))
+
+    timeline = {}
+    for offset, _, status in results:
+        bucket = timeline.setdefault(int(offset), {"second": int(offset), "completed": 0, "errors": 0})
+        bucket["completed"] += 1
+        if status is None or status >= 400:
+            bucket["errors"] += 1
+
+    return {
+        "requests": count,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throttled_rate": round(throttled / count, 4) if count else 0.0,
+        "near_duplicate_rate": round(duplicate_hits / count, 4) if count else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 1) if latencies else None,
+            **{f"p{q}": round(percentile(latencies, q), 1) if latencies else None for q in (50, 90, 95, 99)},
+            "max": round(latencies[-1], 1) if latencies else None,
+        },
+        "rss_mb": {
+            "start": rss[0][1] if rss else None,
+            "peak": max(mb for _, mb in rss) if rss else None,
+            "end": rss[-1][1] if rss else None,
+        },
+        "rss_timeline": rss,
+        "timeline": [timeline[k] for k in sorted(timeline)],
+    }
+
+
+async def run_load(args, images):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        server_pid = args.server_pid
+    else:
+        if not args.duplicate_index:
+            os.environ["KOLAM_DUPLICATE_INDEX"] = "0"
+        import main
+        if args.warmup:
+            main.run_warmup()
+        transport = httpx.ASGITransport(app=main.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+        server_pid = os.getpid()
+
+    async with client:
+        run = LoadRun(client, args.endpoint, images, server_pid)
+        elapsed = await run.run(args.concurrency, args.rate, args.duration, args.requests, args.max_inflight)
+    return summarize(run.results, run.rss, elapsed, run.duplicate_hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Kolam backend with the image corpus")
+    parser.add_argument("--url", help="Target a running server instead of the in-process ASGI app")
+    parser.add_argument("--server-pid", type=int, help="PID whose RSS is sampled when using --url")
+    parser.add_argument("--endpoint", default="/predict")
+    parser.add_argument("--corpus", default="kolam,abhi,synthetic",
+                        help="Comma-separated sources: kolam, abhi, synthetic")
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed-loop concurrent clients")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate in requests/s (overrides --concurrency)")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--warmup", action="store_true", help="Run the startup warm-up first (in-process only)")
+    parser.add_argument("--duplicate-index", action="store_true",
+                        help="Keep the near-duplicate index on (in-process only; measures cache hits, not the pipeline)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sources = [s.strip() for s in args.corpus.split(",") if s.strip()]
+    unknown = [s for s in sources if s not in CORPUS_DIRS and s != "synthetic"]
+    if unknown:
+        parser.error(f"unknown corpus source(s): {', '.join(unknown)}")
+
+    images = load_corpus(sources)
+    if not images:
+        parser.error("no images found in the selected corpus")
+
+    # The pipeline prints per-step progress; keep it out of the report
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        report = asyncio.run(run_load(args, images))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    report["config"] = {
+        "target": args.url or "asgi",
+        "endpoint": args.endpoint,
+        "mode": f"open loop {args.rate} req/s" if args.rate else f"closed loop x{args.concurrency}",
+        "corpus": sources,
+        "images": len(images),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    lat = report["latency_ms"]
+    rss = report["rss_mb"]
+    print(f"🚦 Load test: {report['config']['endpoint']} on {report['config']['target']}, "
+          f"{report['config']['mode']}, {len(images)} images")
+    print(f"   requests    {report['requests']} in {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+    print(f"   latency ms  mean {lat['mean']}  p50 {lat['p50']}  p90 {lat['p90']}  "
+          f"p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"   errors      {report['error_rate'] * 100:.1f}%   429s {report['throttled_rate'] * 100:.1f}%   "
+          f"near-duplicate hits {report['near_duplicate_rate'] * 100:.1f}%")
+    print(f"   RSS MB      start {rss['start']}  peak {rss['peak']}  end {rss['end']}")
+
+
+if __name__ == "__main__":
+    main()
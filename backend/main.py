@@ -1,13 +1,46 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+import time
+_import_start = time.perf_counter()
+
+# Size OpenCV/BLAS thread pools before numpy and cv2 are loaded
+import runtime_budget
+runtime_layout = runtime_budget.configure_process()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image, ImageDraw
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional
 import io, base64, numpy as np, cv2
 import math
-import random
+import asyncio
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from kolam_processor import KolamAIProcessor
+from functools import lru_cache
+from kolam_processor import KolamAIProcessor, pipeline_version
+from models.daily_challenge import DailyChallengeService
+from pattern_render import PatternRenderCache, FORMATS, MIN_SIZE, MAX_SIZE
+from startup import StartupPhases, synthetic_kolam_image
+from tiled_analysis import analyze_tiled_bytes, DEFAULT_TILE_SIZE, DEFAULT_OVERLAP
+from live_analysis import LiveFrameAnalyzer
+from response_formats import Blob, build_response
+from profiling import ProfileCapture, profile_reason
+from near_duplicates import (
+    NearDuplicateIndex, rescale_analysis, DEFAULT_RADIUS as DEFAULT_DUPLICATE_RADIUS,
+    DEFAULT_MAX_ENTRIES as DEFAULT_DUPLICATE_MAX_ENTRIES,
+)
+from tile_encoding import tiles_to_text, tiles_from_text
+from color_palette import region_masks
+from artifacts import ArtifactStore, IMMUTABLE_CACHE_CONTROL, etag_matches
+from deadline import Deadline, request_budget
+# PIL is only needed by the drawing helpers below and is imported where used
+
+startup = StartupPhases()
+startup.record("imports", time.perf_counter() - _import_start)
+print(f"🧮 Worker {os.getpid()}: {runtime_layout.describe()}")
+_setup_start = time.perf_counter()
 
 app = FastAPI()
 app.add_middleware(
@@ -21,9 +54,61 @@ app.add_middleware(
 GENERATED_IMAGES_DIR = "generated_images"
 os.makedirs(GENERATED_IMAGES_DIR, exist_ok=True)
 
+# Content-hashed generated files, served from /artifacts
+artifacts = ArtifactStore()
+
+# Daily challenges, streaks and the materialized leaderboard
+challenge_service = DailyChallengeService()
+
+# Rendered regional pattern tiles (memory LRU + disk)
+pattern_cache = PatternRenderCache()
+
+# Perceptual-hash index of past analyses; KOLAM_DUPLICATE_INDEX=0 disables it,
+# KOLAM_DUPLICATE_INDEX_MAX bounds how many it keeps
+duplicate_index = None
+if os.environ.get("KOLAM_DUPLICATE_INDEX", "1") != "0":
+    duplicate_index = NearDuplicateIndex(
+        radius=int(os.environ.get("KOLAM_DUPLICATE_RADIUS", DEFAULT_DUPLICATE_RADIUS)),
+        pipeline_version=pipeline_version(),
+        max_entries=int(os.environ.get("KOLAM_DUPLICATE_INDEX_MAX", DEFAULT_DUPLICATE_MAX_ENTRIES)),
+    )
+
+# Set KOLAM_WARMUP=0 to skip warm-up (e.g. with --reload during development)
+WARMUP_ENABLED = os.environ.get("KOLAM_WARMUP", "1") != "0"
+
+startup.record("app_setup", time.perf_counter() - _setup_start)
+
+def run_warmup():
+    """Push one synthetic image through every stage and preload all caches"""
+    with startup.phase("warmup_pipeline"):
+        KolamAIProcessor().process_complete_pipeline(synthetic_kolam_image())
+    with startup.phase("warmup_reference_designs"):
+        generate_similar_designs(3)
+    with startup.phase("warmup_pattern_cache"):
+        pattern_cache.warm()
+    startup.mark_ready()
+
+@app.on_event("startup")
+def start_warmup():
+    # Warm up in the background so the process accepts health checks immediately;
+    # /ready stays 503 until this finishes
+    if WARMUP_ENABLED:
+        threading.Thread(target=run_warmup, daemon=True).start()
+    else:
+        startup.mark_ready()
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once warm-up has finished, 503 before"""
+    report = startup.report()
+    report["runtime"] = runtime_layout.as_dict()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
 # ---------- Enhanced Kolam AI System ----------
 def find_grid_size_from_image(img_bytes):
     """Analyzes an image to find the number of dots and determine the grid size."""
+    from PIL import Image
+
     img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
     img_np = np.array(img)
     
@@ -54,6 +139,8 @@ def find_grid_size_from_image(img_bytes):
 
 def create_recreated_image(img_bytes, grid_size, detected_dots, img_size=400):
     """Creates a recreated image highlighting dots and skeleton structure."""
+    from PIL import Image, ImageDraw
+
     original_img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
     
     # Create overlay image
@@ -103,27 +190,45 @@ def create_recreated_image(img_bytes, grid_size, detected_dots, img_size=400):
     
     return np.array(img.convert('RGB'))
 
-def generate_pattern_variant(grid_size, pattern_type, img_size=400):
-    """Generates different pattern variants based on grid size and pattern type."""
-    img = Image.new('RGB', (img_size, img_size), 'white')
-    draw = ImageDraw.Draw(img)
+# RGB colours (the variants are returned as RGB arrays)
+PATTERN_COLORS = {
+    'red': (255, 0, 0), 'blue': (0, 0, 255), 'green': (0, 128, 0),
+    'purple': (128, 0, 128), 'orange': (255, 165, 0),
+}
+PATTERN_TYPES = ("traditional", "geometric", "spiral", "lissajous")
+MAX_GEOMETRIC_CHORDS = 1000    # large grids have O(n^2) dot pairs; a seeded subset of the chosen ones is drawn
+MAX_GEOMETRIC_GRID_X_SIZE = 12288  # grid_size * size for geometric variants (~1.5 MB PNG, ~70 ms at the limit)
+GENERATED_CACHE_BYTES = int(os.environ.get("KOLAM_GENERATE_CACHE_MB", "64")) * 1024 * 1024
+
+def _draw_polylines_by_color(img, polylines, color_names, line_width, closed=False):
+    """Draw many polylines with one cv2.polylines call per colour."""
+    for name in dict.fromkeys(color_names):
+        batch = [p for p, c in zip(polylines, color_names) if c == name]
+        cv2.polylines(img, batch, closed, PATTERN_COLORS[name], max(1, line_width), cv2.LINE_AA)
+
+def generate_pattern_variant(grid_size, pattern_type, img_size=400, seed=None):
+    """Generates different pattern variants based on grid size and pattern type.
+    
+    Output is fully determined by the arguments when `seed` is given; all
+    strokes are built as NumPy arrays and drawn in batched OpenCV calls.
+    """
+    rng = np.random.default_rng(seed)
+    img = np.full((img_size, img_size, 3), 255, dtype=np.uint8)
     
     # Calculate spacing for dots
     border = 50
     available_space = img_size - 2 * border
     spacing = available_space / (grid_size + 1)
     
+    # Dot (pulli) centres, column by column
+    coords = border + np.arange(1, grid_size + 1) * spacing
+    xs, ys = np.meshgrid(coords, coords, indexing='ij')
+    dots = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    
     # Draw dots (pulli) first
     dot_radius = max(3, int(spacing / 15))
-    dots = []
-    for i in range(1, grid_size + 1):
-        for j in range(1, grid_size + 1):
-            x = border + i * spacing
-            y = border + j * spacing
-            dots.append((x, y))
-            # Draw black dot
-            draw.ellipse([x - dot_radius, y - dot_radius, 
-                         x + dot_radius, y + dot_radius], fill='black')
+    for x, y in np.round(dots).astype(int):
+        cv2.circle(img, (int(x), int(y)), dot_radius, (0, 0, 0), -1, cv2.LINE_AA)
     
     line_width = max(2, int(spacing / 20))
     
@@ -131,74 +236,86 @@ def generate_pattern_variant(grid_size, pattern_type, img_size=400):
         # Traditional interwoven pattern
         center_x, center_y = img_size // 2, img_size // 2
         radius = spacing * 0.4
+        colors = ['blue', 'green', 'purple', 'orange']
         
-        def draw_arc_polygon(cx, cy, r, start_angle, end_angle, color='blue'):
-            points = []
-            num_points = 20
-            for i in range(num_points + 1):
-                angle = start_angle + (end_angle - start_angle) * i / num_points
-                x = cx + r * math.cos(math.radians(angle))
-                y = cy + r * math.sin(math.radians(angle))
-                points.append((x, y))
-            
-            for i in range(len(points) - 1):
-                draw.line([points[i], points[i + 1]], fill=color, width=line_width)
+        def arc(cx, cy, start_angle, end_angle):
+            angles = np.radians(np.linspace(start_angle, end_angle, 21))
+            return np.round(np.stack([cx + radius * np.cos(angles), cy + radius * np.sin(angles)], axis=1)).astype(np.int32)
         
         # Draw interwoven arcs
-        colors = ['blue', 'green', 'purple', 'orange']
+        arcs, arc_colors = [], []
         for i in range(grid_size):
-            color = colors[i % len(colors)]
-            draw_arc_polygon(center_x + (i-1) * spacing/2, center_y, radius, 0, 180, color)
-            draw_arc_polygon(center_x + (i-1) * spacing/2, center_y - spacing, radius, 180, 360, color)
+            cx = center_x + (i - 1) * spacing / 2
+            arcs += [arc(cx, center_y, 0, 180), arc(cx, center_y - spacing, 180, 360)]
+            arc_colors += [colors[i % len(colors)]] * 2
+        _draw_polylines_by_color(img, arcs, arc_colors, line_width)
     
     elif pattern_type == "geometric":
-        # Geometric patterns with straight lines
+        # Geometric patterns: each dot pair is connected with 30% chance
         colors = ['red', 'blue', 'green', 'purple']
+        first, second = np.triu_indices(len(dots), k=1)
+        chosen = rng.random(len(first)) < 0.3
+        if chosen.sum() > MAX_GEOMETRIC_CHORDS:
+            keep = rng.choice(np.flatnonzero(chosen), MAX_GEOMETRIC_CHORDS, replace=False)
+            chosen = np.zeros_like(chosen)
+            chosen[keep] = True
+        segment_colors = rng.integers(0, len(colors), size=int(chosen.sum()))
+        segments = np.round(np.stack([dots[first[chosen]], dots[second[chosen]]], axis=1)).astype(np.int32)
         
-        # Draw geometric connections
-        for i in range(len(dots)):
-            for j in range(i + 1, len(dots)):
-                if random.random() < 0.3:  # 30% chance to connect
-                    color = colors[random.randint(0, len(colors) - 1)]
-                    draw.line([dots[i], dots[j]], fill=color, width=line_width // 2)
+        for index, name in enumerate(colors):
+            batch = segments[segment_colors == index]
+            if len(batch):
+                cv2.polylines(img, batch, False, PATTERN_COLORS[name], max(1, line_width // 2), cv2.LINE_AA)
     
     elif pattern_type == "spiral":
         # Spiral patterns
         center_x, center_y = img_size // 2, img_size // 2
-        num_points = 100
-        spiral_points = []
-        
-        for i in range(num_points):
-            t = i * 0.2
-            r = spacing * 0.5 * (1 + t * 0.1)
-            x = center_x + r * math.cos(t)
-            y = center_y + r * math.sin(t)
-            spiral_points.append((x, y))
-        
-        for i in range(len(spiral_points) - 1):
-            draw.line([spiral_points[i], spiral_points[i + 1]], fill='purple', width=line_width)
+        t = np.arange(100) * 0.2
+        r = spacing * 0.5 * (1 + t * 0.1)
+        spiral = np.stack([center_x + r * np.cos(t), center_y + r * np.sin(t)], axis=1)
+        _draw_polylines_by_color(img, [np.round(spiral).astype(np.int32)], ['purple'], line_width)
     
     else:  # "lissajous" 
         # Lissajous curves
-        num_points = 200
-        path_points = []
-        
-        for i in range(num_points):
-            t = 2 * math.pi * i / num_points
-            x = (available_space / 2) * math.sin(grid_size * t + math.pi/2) + img_size / 2
-            y = (available_space / 2) * math.sin((grid_size - 1) * t) + img_size / 2
-            path_points.append((x, y))
-        
-        for i in range(len(path_points) - 1):
-            draw.line([path_points[i], path_points[i + 1]], fill='purple', width=line_width)
-        
-        if len(path_points) > 1:
-            draw.line([path_points[-1], path_points[0]], fill='purple', width=line_width)
+        t = 2 * np.pi * np.arange(200) / 200
+        x = (available_space / 2) * np.sin(grid_size * t + math.pi/2) + img_size / 2
+        y = (available_space / 2) * np.sin((grid_size - 1) * t) + img_size / 2
+        curve = np.round(np.stack([x, y], axis=1)).astype(np.int32)
+        _draw_polylines_by_color(img, [curve], ['purple'], line_width, closed=True)
     
-    return np.array(img)
+    return img
+
+_generated_cache = OrderedDict()
+_generated_cache_bytes = 0
+_generated_cache_lock = threading.Lock()
+
+def render_generated_pattern(grid_size, pattern_type, seed, img_size):
+    """PNG bytes of a generated variant; identical parameters are served from an LRU bounded by total bytes."""
+    global _generated_cache_bytes
+    key = (grid_size, pattern_type, seed, img_size)
+    with _generated_cache_lock:
+        png = _generated_cache.get(key)
+        if png is not None:
+            _generated_cache.move_to_end(key)
+            return png
+
+    variant = generate_pattern_variant(grid_size, pattern_type, img_size=img_size, seed=seed)
+    ok, encoded = cv2.imencode(".png", cv2.cvtColor(variant, cv2.COLOR_RGB2BGR))
+    png = encoded.tobytes()
+
+    with _generated_cache_lock:
+        if key not in _generated_cache and len(png) <= GENERATED_CACHE_BYTES:
+            _generated_cache[key] = png
+            _generated_cache_bytes += len(png)
+            while _generated_cache_bytes > GENERATED_CACHE_BYTES:
+                _, evicted = _generated_cache.popitem(last=False)
+                _generated_cache_bytes -= len(evicted)
+    return png
 
 def create_exact_provided_kolam(pattern_id, img_size=400):
     """Creates exact replicas of the user's provided kolam images."""
+    from PIL import Image, ImageDraw
+
     img = Image.new('RGB', (img_size, img_size), 'white')
     draw = ImageDraw.Draw(img)
     
@@ -352,8 +469,31 @@ def create_exact_provided_kolam(pattern_id, img_size=400):
     
     return np.array(img)
 
-def generate_similar_designs(grid_size, num_designs=4):
-    """Use the exact original kolam images provided by the user - NO MODIFICATIONS."""
+@lru_cache(maxsize=None)
+def load_reference_design(index, filename):
+    """Bytes of an original reference image, read from disk once per process."""
+    original_image_path = os.path.join("original_kolam_images", filename)
+    
+    if os.path.exists(original_image_path):
+        # Use your exact original image - NO MODIFICATIONS
+        with open(original_image_path, "rb") as img_file:
+            return Blob(img_file.read())
+    
+    # Fallback: create placeholder if original not found
+    from PIL import Image
+    
+    print(f"Original image not found: {original_image_path}")
+    design = create_exact_provided_kolam(index)
+    pil_img = Image.fromarray(design)
+    buf = io.BytesIO()
+    pil_img.save(buf, format="PNG")
+    return Blob(buf.getvalue())
+
+def generate_similar_designs(grid_size, num_designs=4, raw=False):
+    """
+    Use the exact original kolam images provided by the user - NO MODIFICATIONS.
+    With raw=True thumbnails stay as Blobs so binary transports can send them unencoded.
+    """
     similar_designs = []
     
     # Your exact original image names and descriptions
@@ -372,22 +512,7 @@ def generate_similar_designs(grid_size, num_designs=4):
     ]
     
     for i in range(min(num_designs, len(original_kolam_files))):
-        # Load your exact original image
-        original_image_path = os.path.join("original_kolam_images", original_kolam_files[i])
-        
-        if os.path.exists(original_image_path):
-            # Use your exact original image - NO MODIFICATIONS
-            with open(original_image_path, "rb") as img_file:
-                img_data = img_file.read()
-                design_b64 = base64.b64encode(img_data).decode("utf-8")
-        else:
-            # Fallback: create placeholder if original not found
-            print(f"Original image not found: {original_image_path}")
-            design = create_exact_provided_kolam(i)
-            pil_img = Image.fromarray(design)
-            buf = io.BytesIO()
-            pil_img.save(buf, format="PNG")
-            design_b64 = base64.b64encode(buf.getvalue()).decode("utf-8")
+        design = load_reference_design(i, original_kolam_files[i])
         
         # Save reference to generated_images folder for consistency
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -399,7 +524,7 @@ def generate_similar_designs(grid_size, num_designs=4):
         similar_designs.append({
             "id": f"traditional_{i}_{timestamp}",
             "score": scores[i],
-            "thumb_base64": design_b64,
+            "thumb_base64": design if raw else design.b64(),
             "pattern_type": "traditional",
             "pattern_name": pattern_names[i],
             "filename": filename
@@ -407,40 +532,151 @@ def generate_similar_designs(grid_size, num_designs=4):
     
     return similar_designs
 
+def request_deadline(x_kolam_budget_ms):
+    """Deadline from X-Kolam-Budget-Ms and the server policy, started now; None without a budget"""
+    try:
+        budget = request_budget(x_kolam_budget_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Deadline(budget) if budget is not None else None
+
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(
+    file: UploadFile = File(...),
+    inline: bool = Query(False, description="Also return the visualization bytes as recreated_input"),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    x_kolam_profile: Optional[str] = Header(None),
+    x_kolam_budget_ms: Optional[str] = Header(None),
+):
     """
     Complete Kolam AI Pipeline following the 9 steps from the notebook:
     1. Upload Image 2. Preprocessing 3. Dot Detection 4. Skeletonization
     5. Noise Removal 6. Path Tracing 7. Mathematical Simulation
     8. Grid Analysis 9. Final Visualization
+
+    The response format follows the Accept header: JSON with base64 images (default),
+    application/msgpack with raw image bytes, or multipart/mixed with a JSON metadata
+    part and one raw part per image. JSON text is gzip/br compressed when accepted.
+
+    The visualization is stored as a content-hashed artifact and returned as
+    recreated_input_url (see /artifacts); inline=true also embeds its bytes.
+
+    Requests carrying X-Kolam-Profile (or picked by the sample rate) are profiled,
+    see profiling.py. Near-duplicates of earlier uploads (resized, recompressed)
+    return the stored analysis rescaled to the new image, see near_duplicates.py;
+    they run no pipeline and are not profiled.
+
+    X-Kolam-Budget-Ms (or the server's KOLAM_LATENCY_BUDGET_MS) sets a latency
+    budget: the pipeline degrades instead of running late and the response's
+    "deadline" lists what it gave up, see deadline.py.
     """
+    deadline = request_deadline(x_kolam_budget_ms)
     content = await file.read()
-    
+    # The pipeline is CPU-bound: keep it off the event loop (live frames, health checks)
+    return await run_in_threadpool(run_predict, content, deadline, inline, accept, accept_encoding, x_kolam_profile)
+
+
+def run_predict(content, deadline, inline, accept, accept_encoding, x_kolam_profile):
+    """Body of /predict, run in the thread pool"""
     # Initialize the comprehensive Kolam AI processor
-    processor = KolamAIProcessor()
-    
-    # Execute the complete 9-step pipeline
-    results = processor.process_complete_pipeline(content)
+    processor = KolamAIProcessor(deadline=deadline)
+    processor.load(content)
+    try:
+        processor.compute(["original"])  # a corrupt upload is a 400 on every path
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The decoded size, before a latency budget can shrink the working image
+    full_shape = processor.original_img.shape
+    full_height, full_width = full_shape[:2]
+    
+    # Near-duplicate of an earlier upload: reuse its analysis instead of running the pipeline
+    duplicate = fingerprint = None
+    if duplicate_index is not None:
+        fingerprint = processor.compute(["fingerprint"])["fingerprint"]
+        duplicate = duplicate_index.lookup(fingerprint, full_width, full_height)
+    
+    profile = analysis_id = None
+    if duplicate is not None:
+        analysis, visualization_bytes = duplicate
+        analysis_id = analysis["match"]["id"]
+        strokes_blob = base64.b64decode(analysis["strokes"])
+        results = {
+            'original_shape': full_shape,
+            'grid_size': analysis["grid_size"],
+            'detected_dots_count': len(analysis["dots"]),
+            'stroke_count': analysis["stroke_count"],
+            'symmetry': analysis.get("symmetry"),
+            'lissajous_fit': analysis.get("lissajous_fit"),
+            'tiles': analysis.get("tiles"),
+            'palette': analysis.get("palette"),
+            'stage_timings_ms': dict(processor.stage_timings),
+            'pipeline_mode': 'near_duplicate',
+        }
+        print(f"🔁 Near-duplicate of analysis {analysis['match']['id']} "
+              f"(distance {analysis['match']['distance']}) - pipeline skipped")
+    else:
+        # Execute the complete 9-step pipeline
+        reason = profile_reason(x_kolam_profile)
+        if reason is None:
+            results = processor.process_complete_pipeline(content)
+        else:
+            capture = ProfileCapture(reason)
+            with capture:
+                # Serial: the profilers only see the request thread, not the stage pool
+                results = processor.process_complete_pipeline(content, parallel=False)
+            profile = capture.save(content, processor.stage_timings)
+        visualization_bytes = processor.final_visualization
+        strokes_blob = processor.stroke_blob()
+        
+        height, width = processor.original_img.shape[:2]
+        if (width, height) != (full_width, full_height):
+            # Analysed at a smaller working resolution: map the pixel results back onto the upload
+            rescaled = rescale_analysis({
+                "width": width,
+                "height": height,
+                "dots": [],
+                "strokes": results['strokes'],
+                "lissajous_fit": results['lissajous_fit'],
+            }, full_width, full_height)
+            strokes_blob = base64.b64decode(rescaled["strokes"])
+            results['lissajous_fit'] = rescaled["lissajous_fit"]
+            results['original_shape'] = full_shape
+        
+        # A degraded analysis is not reused: a later request may have the time for a full one
+        if duplicate_index is not None and not (deadline is not None and deadline.degraded):
+            analysis_id = duplicate_index.add(fingerprint, {
+                "width": full_width,
+                "height": full_height,
+                "grid_size": processor.grid_size,
+                "dots": [[int(x), int(y), int(r)] for x, y, r in processor.detected_dots],
+                "strokes": results['strokes'],
+                "stroke_count": results['stroke_count'],
+                "symmetry": results['symmetry'],
+                "lissajous_fit": results['lissajous_fit'],
+                "tiles": results['tiles'],
+                "palette": results['palette'],
+            }, visualization_bytes)
     
     # Generate similar designs based on detected grid
-    similar_designs = generate_similar_designs(processor.grid_size, num_designs=4)
-    
-    # Save the final visualization
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    recreated_filename = f"kolam_pipeline_{timestamp}.png"
-    recreated_filepath = os.path.join(GENERATED_IMAGES_DIR, recreated_filename)
+    similar_designs = generate_similar_designs(results['grid_size'], num_designs=4, raw=True)
     
-    # Save the visualization to file
-    visualization_bytes = base64.b64decode(results['final_visualization'])
-    with open(recreated_filepath, 'wb') as f:
-        f.write(visualization_bytes)
+    # Save the final visualization; identical results share one file and URL
+    recreated_filename = artifacts.put(visualization_bytes)
     
-    return JSONResponse({
-        "recreated_input": results['final_visualization'],  # Complete pipeline visualization
+    return build_response({
+        **({"recreated_input": Blob(visualization_bytes)} if inline else {}),
+        "recreated_input_url": artifacts.url(recreated_filename),  # Complete pipeline visualization
         "similar": similar_designs,
         "grid_size": results['grid_size'],
         "num_dots_detected": results['detected_dots_count'],
+        "strokes": Blob(strokes_blob),  # int16 delta blob, see stroke_encoding
+        "stroke_count": results['stroke_count'],
+        "symmetry": results['symmetry'],
+        "lissajous_fit": results['lissajous_fit'],
+        "tiles": results['tiles'],  # per-pulli tile code, see tile_encoding
+        "palette": results['palette'],
+        "analysis_id": analysis_id,
         "recreated_filename": recreated_filename,
         "pipeline_steps_completed": [
             "✓ Image Upload & Reading",
@@ -456,6 +692,302 @@ async def predict(file: UploadFile = File(...)):
         "processing_details": {
             "original_image_shape": results['original_shape'],
             "estimated_grid": f"{results['grid_size']}x{results['grid_size']}",
-            "total_dots_found": results['detected_dots_count']
+            "total_dots_found": results['detected_dots_count'],
+            "stage_timings_ms": results['stage_timings_ms'],
+            "pipeline_mode": results['pipeline_mode']
+        },
+        **({"profile": profile} if profile else {}),
+        **({"deadline": deadline.report()} if deadline is not None else {}),
+        **({"near_duplicate": {**duplicate[0]["match"], "scale": duplicate[0]["scale"]}} if duplicate else {})
+    }, accept, accept_encoding)
+
+
+@app.post("/strokes")
+def strokes(
+    file: UploadFile = File(...),
+    format: str = Query("binary", pattern="^(binary|base64)$"),
+):
+    """
+    Ordered stroke sequence for client-side drawing animation.
+    Only the stages the skeleton needs are run (upload, preprocessing, skeletonization).
+    The binary format is little-endian int16:
+    [magic 0x4B53, version, width, height, n, len_1..len_n, x0, y0, dx1, dy1, ...]
+    where every stroke starts with an absolute point followed by deltas.
+    """
+    processor = KolamAIProcessor()
+    processor.load(file.file.read())
+    try:
+        processor.compute(["strokes"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    blob = processor.stroke_blob()
+
+    if format == "base64":
+        return {
+            "stroke_count": len(processor.strokes),
+            "point_count": sum(len(s) for s in processor.strokes),
+            "encoding": "int16-delta-v1",
+            "strokes": base64.b64encode(blob).decode("utf-8"),
         }
-    })
+    return Response(
+        content=blob,
+        media_type="application/octet-stream",
+        headers={"X-Stroke-Count": str(len(processor.strokes))},
+    )
+
+
+def _png(img):
+    ok, encoded = cv2.imencode(".png", img)
+    return Blob(encoded.tobytes())
+
+
+# Outputs /analyze can return, and how each is put into the response
+ANALYSIS_OUTPUTS = {
+    "shape": lambda p: list(p.original_img.shape),
+    "dots": lambda p: [[int(x), int(y), int(r)] for x, y, r in p.detected_dots],
+    "grid_size": lambda p: p.grid_size,
+    "strokes": lambda p: Blob(p.stroke_blob()),
+    "paths": lambda p: [
+        {"pixels": len(path), "bbox": list(cv2.boundingRect(np.array(path, dtype=np.int32)))}
+        for path in p.traced_paths
+    ],
+    "symmetry": lambda p: p.values["symmetry"],
+    "lissajous_fit": lambda p: p.values["lissajous_fit"],
+    "tiles": lambda p: tiles_to_text(p.values["tiles"]),
+    "tile_rendering": lambda p: _png(p.values["tile_panel"]) if p.values["tile_panel"] is not None else None,
+    "palette": lambda p: p.values["palette"],
+    "color_masks": lambda p: [_png(mask) for mask in region_masks(p.values["color_labels"],
+                                                                  len(p.values["palette"]["colors"]))]
+                             if p.values["palette"] is not None else None,
+    "lissajous": lambda p: [[[round(float(x), 4), round(float(y), 4)] for x, y in curve[::20]]
+                            for curve in p.values["lissajous"]],
+    "skeleton": lambda p: _png(p.skeleton_img),
+    "debug_dots": lambda p: _png(p.values["debug_dots"]),
+    "visualization": lambda p: Blob(p.final_visualization),
+}
+# Pipeline outputs each response field needs
+ANALYSIS_DEPENDENCIES = {"shape": ["original"], "tile_rendering": ["tile_panel"],
+                         "color_masks": ["palette", "color_labels"]}
+
+
+@app.post("/analyze")
+def analyze(
+    file: UploadFile = File(...),
+    outputs: str = Query("dots,grid_size", description="Comma-separated: " + ",".join(ANALYSIS_OUTPUTS)),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    x_kolam_budget_ms: Optional[str] = Header(None),
+):
+    """
+    Demand-driven analysis: only the pipeline stages the requested outputs depend on run,
+    so outputs=dots,grid_size costs a fraction of a full /predict.
+    Images come back as base64 in JSON or raw in msgpack/multipart (see /predict),
+    and a latency budget degrades the analysis as it does there.
+    """
+    deadline = request_deadline(x_kolam_budget_ms)
+    requested = [name.strip() for name in outputs.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in ANALYSIS_OUTPUTS]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown outputs: {', '.join(unknown) or '(none)'}; choose from {', '.join(ANALYSIS_OUTPUTS)}",
+        )
+
+    processor = KolamAIProcessor(deadline=deadline)
+    processor.load(file.file.read())
+    try:
+        processor.compute([dep for name in requested for dep in ANALYSIS_DEPENDENCIES.get(name, [name])])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    payload = {name: ANALYSIS_OUTPUTS[name](processor) for name in requested}
+    payload["stage_timings_ms"] = dict(processor.stage_timings)
+    if deadline is not None:
+        payload["deadline"] = deadline.report()
+    return build_response(payload, accept, accept_encoding)
+
+
+@app.post("/predict/tiled")
+def predict_tiled(
+    file: UploadFile = File(...),
+    tile_size: int = Query(DEFAULT_TILE_SIZE, ge=256, le=4096),
+    overlap: int = Query(DEFAULT_OVERLAP, ge=32, le=512),
+):
+    """
+    Tiled analysis for very large floor/drone photographs (8000x8000 px and up).
+    Returns merged dots, stitched skeleton paths and a downscaled skeleton preview;
+    memory stays bounded by the tile size instead of the image size.
+    """
+    content = file.file.read()
+    try:
+        return analyze_tiled_bytes(content, tile_size=tile_size, overlap=overlap)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.websocket("/ws/live")
+async def live_analysis(websocket: WebSocket):
+    """
+    Live camera analysis for the AR preview.
+    Send low-resolution JPEG frames (binary, or base64 text); each reply carries
+    the dots and grid size for the newest frame. Frames that arrive while one is
+    being analysed replace each other, so stale frames are dropped, not queued.
+    """
+    await websocket.accept()
+    analyzer = LiveFrameAnalyzer()
+    latest = {"frame": None, "dropped": 0}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            frame = message.get("bytes") or message.get("text")
+            if not frame:
+                continue
+            if latest["frame"] is not None:
+                latest["dropped"] += 1
+            latest["frame"] = frame
+            frame_ready.set()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            done, _ = await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                waiter.cancel()
+                receiver.result()  # re-raises the disconnect
+            frame_ready.clear()
+            frame, latest["frame"] = latest["frame"], None
+
+            result = await run_in_threadpool(analyzer.analyze, frame)
+            result["dropped_frames"] = latest["dropped"]
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+@app.get("/generate")
+def generate(
+    grid_size: int = Query(3, ge=2, le=30),
+    pattern_type: str = Query("traditional", pattern="^(traditional|geometric|spiral|lissajous)$"),
+    seed: int = Query(0, ge=0),
+    size: int = Query(400, ge=100, le=2048),
+):
+    """Generate a kolam pattern variant; deterministic per (grid_size, pattern_type, seed, size)"""
+    if pattern_type == "geometric" and grid_size * size > MAX_GEOMETRIC_GRID_X_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Geometric patterns are limited to grid_size * size <= {MAX_GEOMETRIC_GRID_X_SIZE}"
+        )
+    png = render_generated_pattern(grid_size, pattern_type, seed, size)
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"gen-{grid_size}-{pattern_type}-{seed}-{size}"',
+        },
+    )
+
+@app.api_route("/artifacts/{name}", methods=["GET", "HEAD"])
+def get_artifact(name: str, if_none_match: Optional[str] = Header(None)):
+    """
+    A generated file by content hash. Immutable, so it is cached for a year;
+    If-None-Match gets a 304 and Range requests are answered with 206. The
+    body goes out with sendfile when the server supports it (pathsend).
+    """
+    path = artifacts.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    headers = {"ETag": artifacts.etag(name), "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=artifacts.media_type(name), headers=headers)
+
+@app.get("/analyses/{analysis_id}/similar")
+def similar_analyses(analysis_id: int, limit: int = Query(5, ge=1, le=50)):
+    """Past analyses with the closest symmetry profile (rotational folds and reflection axes)"""
+    if duplicate_index is None:
+        raise HTTPException(status_code=404, detail="Analysis index is disabled")
+    similar = duplicate_index.similar_by_symmetry(analysis_id, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return {"analysis_id": analysis_id, "similar": similar}
+
+
+# ---------- Daily Challenges ----------
+class ChallengeCompletion(BaseModel):
+    user_id: str
+    score: Optional[int] = None
+
+@app.get("/challenges/today")
+def today_challenge():
+    """Current day's challenge (served from memory after the first request of the day)"""
+    challenge = challenge_service.get_today_challenge()
+    if challenge is None:
+        raise HTTPException(status_code=404, detail="No challenge available")
+    return challenge
+
+@app.post("/challenges/{challenge_id}/complete")
+def complete_challenge(challenge_id: int, completion: ChallengeCompletion):
+    """Record a completion; streak and leaderboard totals are updated in the same transaction"""
+    standing = challenge_service.record_completion(completion.user_id, challenge_id, completion.score)
+    if standing is None:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+    return standing
+
+@app.get("/challenges/leaderboard")
+def leaderboard(limit: int = 10, offset: int = 0):
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    return {"entries": challenge_service.get_leaderboard(limit=limit, offset=offset)}
+
+@app.get("/challenges/users/{user_id}")
+def user_standing(user_id: str):
+    standing = challenge_service.get_user_standing(user_id)
+    if standing is None:
+        raise HTTPException(status_code=404, detail="User has no completions")
+    return standing
+
+
+# ---------- Regional Patterns ----------
+@app.get("/patterns/regional")
+def list_regional_patterns():
+    patterns = sorted(pattern_cache.patterns().values(), key=lambda p: p["id"])
+    return {"patterns": [
+        {key: value for key, value in p.items() if key != "data"} | {"pattern_data": p["data"]}
+        for p in patterns
+    ]}
+
+@app.get("/patterns/regional/match")
+def match_regional_patterns(
+    tiles: str = Query(..., description="Tile code as returned by /predict, e.g. 3x3:f0ff..."),
+    limit: int = Query(5, ge=1, le=50),
+):
+    """Regional patterns stored as tile codes that match a kolam's tiles, up to rotation and reflection"""
+    try:
+        codes = tiles_from_text(tiles)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tiles": tiles, "matches": pattern_cache.match_tiles(codes, limit)}
+
+@app.get("/patterns/regional/{pattern_id}/render")
+def render_regional_pattern(
+    pattern_id: int,
+    size: int = Query(256, ge=MIN_SIZE, le=MAX_SIZE),
+    format: str = Query("png", pattern="^(png|jpeg|webp)$"),
+):
+    """Render a regional pattern tile; repeated requests are served from the render cache"""
+    rendered = pattern_cache.render(pattern_id, size, format)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Pattern not found")
+
+    data, key = rendered
+    return Response(
+        content=data,
+        media_type=FORMATS[format][1],
+        headers={"Cache-Control": "public, max-age=86400", "ETag": f'"{key}"'},
+    )
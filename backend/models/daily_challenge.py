@@ -0,0 +1,405 @@
+"""
+Daily challenges with streaks and a materialized leaderboard.
+
+One-off maintenance, run from backend/:
+    python -m models.daily_challenge dedupe-progress        # drop repeated completions, add the unique index
+    python -m models.daily_challenge rebuild-leaderboard
+"""
+
+import argparse
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+DB_PATH = "kolam_enhanced.db"
+LEADERBOARD_CACHE_SIZE = 100
+LEADERBOARD_COLUMNS = "user_id, total_score, completions, current_streak, best_streak, last_completed_date"
+
+LEADERBOARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_challenges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT UNIQUE NOT NULL,
+    pattern_name TEXT NOT NULL,
+    description TEXT,
+    difficulty TEXT,
+    points INTEGER DEFAULT 100,
+    cultural_context TEXT
+);
+CREATE TABLE IF NOT EXISTS user_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    challenge_id INTEGER,
+    completed_at TIMESTAMP,
+    score INTEGER,
+    streak_count INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leaderboard (
+    user_id TEXT PRIMARY KEY,
+    total_score INTEGER NOT NULL DEFAULT 0,
+    completions INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    best_streak INTEGER NOT NULL DEFAULT 0,
+    last_completed_date TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard (total_score DESC, user_id);
+CREATE INDEX IF NOT EXISTS idx_daily_challenges_date ON daily_challenges (date);
+"""
+
+# Older databases may hold repeated completions, so the unique index cannot be created at startup.
+# Until `dedupe-progress` (see main below) has run, a trigger refuses new repeats instead.
+PROGRESS_GUARD = """
+CREATE INDEX IF NOT EXISTS idx_user_progress_lookup ON user_progress (user_id, challenge_id);
+CREATE TRIGGER IF NOT EXISTS user_progress_no_repeat BEFORE INSERT ON user_progress
+WHEN EXISTS (SELECT 1 FROM user_progress WHERE user_id = NEW.user_id AND challenge_id = NEW.challenge_id)
+BEGIN
+    SELECT RAISE(ABORT, 'UNIQUE constraint failed: user_progress.user_id, user_progress.challenge_id');
+END;
+"""
+PROGRESS_DEDUPE = """
+DELETE FROM user_progress WHERE id NOT IN (
+    SELECT MIN(id) FROM user_progress GROUP BY user_id, challenge_id
+)
+"""
+PROGRESS_UNIQUE_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_progress_user_challenge ON user_progress (user_id, challenge_id)"
+)
+# The first completion of each (user, challenge); repeats left by older databases are not counted
+FIRST_COMPLETIONS = "SELECT MIN(id) FROM user_progress GROUP BY user_id, challenge_id"
+
+
+class DailyChallengeService:
+    """
+    Daily challenges with incrementally maintained streaks and leaderboard.
+
+    Every completion updates `user_progress` and the materialized `leaderboard`
+    row of that user inside one transaction, so reads never have to scan the
+    progress history. The current day's challenge and the top of the
+    leaderboard are kept in memory and patched in place on each completion.
+    """
+
+    def __init__(self, db_path=DB_PATH, cache_size=LEADERBOARD_CACHE_SIZE):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._today = None
+        self._today_challenge = None
+        self._top_entries = None
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_schema(self):
+        """Create missing tables; never rewrites existing rows (see dedupe_progress for that)"""
+        conn = self._connect()
+        try:
+            conn.executescript(LEADERBOARD_SCHEMA)
+            has_unique = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_user_progress_user_challenge'"
+            ).fetchone()
+            if not has_unique:
+                conn.executescript(PROGRESS_GUARD)
+            has_progress = conn.execute("SELECT 1 FROM user_progress LIMIT 1").fetchone()
+            has_leaderboard = conn.execute("SELECT 1 FROM leaderboard LIMIT 1").fetchone()
+        finally:
+            conn.close()
+
+        # One-off backfill for databases that recorded progress before the leaderboard existed
+        if has_progress and not has_leaderboard:
+            self.rebuild_leaderboard()
+
+    def dedupe_progress(self):
+        """
+        One-off migration: delete repeated completions (keeping the first),
+        replace the insert trigger with a unique index and rebuild the
+        leaderboard. Returns the number of rows removed.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(PROGRESS_DEDUPE).rowcount
+            conn.execute(PROGRESS_UNIQUE_INDEX)
+            conn.execute("DROP TRIGGER IF EXISTS user_progress_no_repeat")
+            conn.execute("DROP INDEX IF EXISTS idx_user_progress_lookup")
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        print(f"✓ Removed {removed} repeated challenge completion(s)")
+        self.rebuild_leaderboard()
+        return removed
+
+    # ---------- Challenges ----------
+    def get_today_challenge(self, today=None):
+        """
+        Return today's challenge (or the most recent one before it). Only a
+        challenge dated today is cached for the day; a miss or an older
+        fallback is looked up again, so a challenge added later today shows up.
+        """
+        today = (today or date.today()).isoformat()
+
+        with self._lock:
+            if self._today == today:
+                return self._today_challenge
+
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM daily_challenges WHERE date <= ? ORDER BY date DESC LIMIT 1",
+                (today,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        challenge = dict(row) if row else None
+        if challenge is not None and challenge["date"] == today:
+            with self._lock:
+                self._today = today
+                self._today_challenge = challenge
+        return challenge
+
+    def get_challenge(self, challenge_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM daily_challenges WHERE id = ?", (challenge_id,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    # ---------- Completions ----------
+    def record_completion(self, user_id, challenge_id, score=None):
+        """
+        Record a challenge completion and update the user's streak and totals.
+
+        Returns None if the challenge does not exist. Completing the same
+        challenge twice is a no-op that returns the existing standing (or,
+        without a leaderboard row, the recorded progress).
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            challenge = conn.execute(
+                "SELECT id, date, points FROM daily_challenges WHERE id = ?", (challenge_id,)
+            ).fetchone()
+            if challenge is None:
+                conn.execute("ROLLBACK")
+                return None
+
+            entry = conn.execute(
+                f"SELECT {LEADERBOARD_COLUMNS} FROM leaderboard WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            already_done = conn.execute(
+                "SELECT challenge_id, score, completed_at FROM user_progress WHERE user_id = ? AND challenge_id = ?",
+                (user_id, challenge_id)
+            ).fetchone()
+            if already_done:
+                conn.execute("ROLLBACK")
+                if entry:
+                    return {**self._live(dict(entry)), "already_completed": True}
+                return {"user_id": user_id, **dict(already_done), "already_completed": True}
+
+            if score is None:
+                score = challenge["points"]
+            standing = self._completed(entry, challenge["date"], score)
+
+            conn.execute(
+                "INSERT INTO user_progress (user_id, challenge_id, completed_at, score, streak_count) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, challenge_id, datetime.now().isoformat(timespec="seconds"), score,
+                 standing["current_streak"])
+            )
+            conn.execute(
+                "INSERT INTO leaderboard (user_id, total_score, completions, current_streak, best_streak, "
+                "last_completed_date, updated_at) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT(user_id) DO UPDATE SET total_score = excluded.total_score, "
+                "completions = excluded.completions, current_streak = excluded.current_streak, "
+                "best_streak = excluded.best_streak, last_completed_date = excluded.last_completed_date, "
+                "updated_at = CURRENT_TIMESTAMP",
+                (user_id, standing["total_score"], standing["completions"], standing["current_streak"],
+                 standing["best_streak"], standing["last_completed_date"])
+            )
+            standing = {"user_id": user_id, **standing, "already_completed": False}
+            # Patched while the write lock is held, so concurrent completions reach the cache in commit order
+            self._update_cached_top(standing)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self._lock:
+                self._top_entries = None    # may hold the standing that was rolled back
+            raise
+        finally:
+            conn.close()
+        return self._live(standing)
+
+    @classmethod
+    def _completed(cls, entry, challenge_date, score):
+        """
+        Standing after one more completion. The one rule for totals and
+        streaks: record_completion applies it live and rebuild_leaderboard
+        replays it over the history in the same (insertion) order.
+        """
+        streak, last_date = cls._next_streak(entry, challenge_date)
+        return {
+            "total_score": (entry["total_score"] if entry else 0) + (score or 0),
+            "completions": (entry["completions"] if entry else 0) + 1,
+            "current_streak": streak,
+            "best_streak": max(streak, entry["best_streak"] if entry else 0),
+            "last_completed_date": last_date,
+        }
+
+    @staticmethod
+    def _live(entry, today=None):
+        """
+        The standing as of today: a streak whose last challenge is older than
+        yesterday has lapsed. Stored streaks are left alone; _next_streak
+        restarts them anyway once a day was missed.
+        """
+        yesterday = ((today or date.today()) - timedelta(days=1)).isoformat()
+        last_date = entry["last_completed_date"]
+        if entry["current_streak"] and (not last_date or last_date < yesterday):
+            entry = dict(entry, current_streak=0)
+        return entry
+
+    @staticmethod
+    def _next_streak(entry, challenge_date):
+        """Streak after completing a challenge dated `challenge_date` (ISO string)"""
+        if entry is None or not entry["last_completed_date"]:
+            return 1, challenge_date
+
+        last_date = entry["last_completed_date"]
+        if challenge_date <= last_date:
+            # Back-filling an older challenge does not move the streak
+            return entry["current_streak"], last_date
+
+        previous_day = (date.fromisoformat(challenge_date) - timedelta(days=1)).isoformat()
+        if last_date == previous_day:
+            return entry["current_streak"] + 1, challenge_date
+        return 1, challenge_date
+
+    # ---------- Leaderboard ----------
+    def get_leaderboard(self, limit=10, offset=0):
+        """Return one page of the leaderboard; cost is proportional to the page, not the history"""
+        if offset + limit <= self.cache_size:
+            top = self._cached_top()
+            page = top[offset:offset + limit]
+        else:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    f"SELECT {LEADERBOARD_COLUMNS} FROM leaderboard ORDER BY total_score DESC, user_id LIMIT ? OFFSET ?",
+                    (limit, offset)
+                ).fetchall()
+            finally:
+                conn.close()
+            page = [dict(row) for row in rows]
+
+        today = date.today()
+        return [{"rank": offset + i + 1, **self._live(entry, today)} for i, entry in enumerate(page)]
+
+    def get_user_standing(self, user_id):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT {LEADERBOARD_COLUMNS} FROM leaderboard WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._live(dict(row)) if row else None
+
+    def _cached_top(self):
+        # Loaded under the lock, so a completion patched in meanwhile is not overwritten by an older read
+        with self._lock:
+            if self._top_entries is None:
+                conn = self._connect()
+                try:
+                    rows = conn.execute(
+                        f"SELECT {LEADERBOARD_COLUMNS} FROM leaderboard ORDER BY total_score DESC, user_id LIMIT ?",
+                        (self.cache_size,)
+                    ).fetchall()
+                finally:
+                    conn.close()
+                self._top_entries = [dict(row) for row in rows]
+            return self._top_entries
+
+    def _update_cached_top(self, standing):
+        """Patch the in-memory top-N with a new standing; totals only grow, so this stays exact"""
+        with self._lock:
+            if self._top_entries is None:
+                return
+
+            entries = [e for e in self._top_entries if e["user_id"] != standing["user_id"]]
+            in_range = (
+                len(entries) < self.cache_size
+                or standing["total_score"] >= entries[-1]["total_score"]
+            )
+            if in_range:
+                entry = {k: v for k, v in standing.items() if k != "already_completed"}
+                entries.append(entry)
+                entries.sort(key=lambda e: (-e["total_score"], e["user_id"]))
+            self._top_entries = entries[:self.cache_size]
+
+    def rebuild_leaderboard(self):
+        """Recompute the materialized leaderboard from the full progress history"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT p.user_id, p.score, c.date FROM user_progress p "
+                "JOIN daily_challenges c ON c.id = p.challenge_id "
+                f"WHERE p.id IN ({FIRST_COMPLETIONS}) "
+                "ORDER BY p.user_id, p.id"
+            ).fetchall()
+
+            standings = {}
+            for row in rows:
+                standings[row["user_id"]] = self._completed(standings.get(row["user_id"]), row["date"], row["score"])
+
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leaderboard")
+            conn.executemany(
+                "INSERT INTO leaderboard (user_id, total_score, completions, current_streak, "
+                "best_streak, last_completed_date) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (user_id, s["total_score"], s["completions"], s["current_streak"],
+                     s["best_streak"], s["last_completed_date"])
+                    for user_id, s in standings.items()
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._top_entries = None
+
+        print(f"✓ Leaderboard rebuilt for {len(standings)} users")
+        return len(standings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily challenge database maintenance")
+    parser.add_argument("command", choices=["dedupe-progress", "rebuild-leaderboard"])
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database with the challenge tables")
+    args = parser.parse_args()
+
+    service = DailyChallengeService(args.db)
+    if args.command == "dedupe-progress":
+        service.dedupe_progress()
+    else:
+        service.rebuild_leaderboard()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+Perceptual-hash near-duplicate detection.
+
+Every analysed upload is fingerprinted with a 64-bit pHash (DCT) and dHash
+(gradient). Fingerprints live in a BK-tree keyed by pHash, so a lookup only
+visits hashes within the Hamming radius; a candidate counts as a duplicate
+when both hashes are within the radius and the aspect ratio matches.
+Resized, recompressed (WhatsApp) or re-screenshotted uploads of the same
+kolam then reuse the stored analysis, rescaled to the new dimensions.
+
+Every row records the pipeline version that produced it (see
+kolam_processor.pipeline_version); only rows of the running version are
+loaded and served, so a new preset or stage change starts a fresh index.
+Each worker process holds its own BK-tree; a lookup that misses first picks
+up rows other workers have added since (one indexed query), so a repeat
+upload is found whichever worker it lands on.
+
+The index holds at most `max_entries` analyses (KOLAM_DUPLICATE_INDEX_MAX in
+main.py). Beyond that, adding one evicts rows of other pipeline versions
+first, then the least recently used, together with their visualizations;
+other workers drop an evicted row when a lookup no longer finds it.
+
+The same fingerprints flag duplicate `dataset_contributions`:
+
+    python near_duplicates.py flag-contributions --db kolamlab.db
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from symmetry import symmetry_vector
+
+INDEX_DB_PATH = os.path.join("data", "analysis_index.db")
+VISUALIZATION_DIR = os.path.join("generated_images", "analysis_cache")
+DEFAULT_MAX_ENTRIES = 5000       # analyses kept (a few KB of JSON plus a PNG each)
+DEFAULT_RADIUS = 6               # of 64 bits; recompression and resizing stay well below this
+MAX_ASPECT_DIFFERENCE = 0.03     # rescaling only makes sense for the same framing
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_index (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phash INTEGER NOT NULL,
+    dhash INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    analysis TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    symmetry TEXT,
+    pipeline_version TEXT,
+    last_used_at TEXT
+);
+"""
+
+CONTRIBUTION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contribution_fingerprints (
+    id TEXT PRIMARY KEY,
+    phash INTEGER,
+    dhash INTEGER,
+    duplicate_of TEXT,
+    distance INTEGER,
+    checked_at TEXT NOT NULL
+);
+"""
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def phash(gray_img):
+    """64-bit DCT hash: low-frequency 8x8 coefficients against their median"""
+    small = cv2.resize(gray_img, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    median = np.median(low.ravel()[1:])     # the DC term would dominate the median
+    return _bits_to_int(low > median)
+
+
+def dhash(gray_img):
+    """64-bit gradient hash: is each pixel brighter than its right neighbour"""
+    small = cv2.resize(gray_img, (9, 8), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def perceptual_hashes(gray_img):
+    return phash(gray_img), dhash(gray_img)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _to_sqlite(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _from_sqlite(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance"""
+
+    def __init__(self):
+        self.root = None     # [hash, items, {distance: child}]
+        self.size = 0
+
+    def add(self, key, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """All (distance, hash, item) within `radius`, nearest first"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= radius:
+                found.extend((distance, node[0], item) for item in node[1])
+            # Triangle inequality: only children at |d - distance| <= radius can match
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+
+def rescale_analysis(analysis, width, height):
+    """Map a stored analysis onto an image of a different size"""
+    from stroke_encoding import rescale_strokes_base64
+
+    sx, sy = width / analysis["width"], height / analysis["height"]
+    sr = (sx + sy) / 2
+    rescaled = dict(analysis)
+    rescaled["width"], rescaled["height"] = width, height
+    rescaled["dots"] = [[int(round(x * sx)), int(round(y * sy)), max(1, int(round(r * sr)))]
+                        for x, y, r in analysis["dots"]]
+    rescaled["strokes"] = rescale_strokes_base64(analysis["strokes"], width, height)
+    fit = analysis.get("lissajous_fit")
+    if fit:
+        # a, b and delta do not change with scale; the pixel measures do
+        rescaled["lissajous_fit"] = dict(
+            fit,
+            amplitude=[round(fit["amplitude"][0] * sx, 1), round(fit["amplitude"][1] * sy, 1)],
+            center=[round(fit["center"][0] * sx, 1), round(fit["center"][1] * sy, 1)],
+            path_length=round(fit["path_length"] * sr, 1),
+        )
+    rescaled["scale"] = [round(sx, 4), round(sy, 4)]
+    return rescaled
+
+
+class NearDuplicateIndex:
+    """
+    Index of past analyses keyed by perceptual hash.
+
+    The BK-tree holds only (hash, row id) pairs; analyses are read from SQLite
+    on a hit and the composite visualization from VISUALIZATION_DIR.
+    """
+
+    def __init__(self, db_path=INDEX_DB_PATH, radius=DEFAULT_RADIUS, pipeline_version=None,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.radius = radius
+        self.pipeline_version = pipeline_version
+        self.max_entries = max_entries
+        self.last_id = 0        # highest row id read from SQLite
+        self.tree = BKTree()
+        self.stale = 0          # evicted ids still in the tree; it is rebuilt once they are half of it
+        self.phashes = {}
+        self.dhashes = {}
+        self.aspects = {}
+        self.symmetry_vectors = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(VISUALIZATION_DIR, exist_ok=True)
+        self._load()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            conn.executescript(INDEX_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(analysis_index)")}
+            if "symmetry" not in columns:
+                conn.execute("ALTER TABLE analysis_index ADD COLUMN symmetry TEXT")
+            if "pipeline_version" not in columns:
+                conn.execute("ALTER TABLE analysis_index ADD COLUMN pipeline_version TEXT")
+            if "last_used_at" not in columns:
+                conn.execute("ALTER TABLE analysis_index ADD COLUMN last_used_at TEXT")
+        finally:
+            conn.close()
+        loaded = self._refresh()
+        print(f"🔎 Near-duplicate index: {loaded} analyses loaded (pipeline {self.pipeline_version})")
+
+    def _refresh(self):
+        """Load rows of this pipeline version added since the last load (by any worker); returns how many"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, phash, dhash, width, height, symmetry FROM analysis_index "
+                "WHERE id > ? AND pipeline_version IS ? ORDER BY id",
+                (self.last_id, self.pipeline_version)
+            ).fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            # Our own add() does not advance last_id: rows of other workers may sit below it
+            if rows:
+                self.last_id = max(self.last_id, rows[-1][0])
+            for row_id, p, d, width, height, vector in rows:
+                if row_id not in self.dhashes:
+                    self._insert(row_id, _from_sqlite(p), _from_sqlite(d), width, height,
+                                 json.loads(vector) if vector else None)
+        return len(rows)
+
+    def _insert(self, row_id, p, d, width, height, vector=None):
+        self.tree.add(p, row_id)
+        self.phashes[row_id] = p
+        self.dhashes[row_id] = d
+        self.aspects[row_id] = width / height
+        if vector is not None:
+            self.symmetry_vectors[row_id] = np.asarray(vector, dtype=np.float32)
+
+    def _forget(self, row_id):
+        """Drop an evicted row; the BK-tree cannot delete, so it is rebuilt once stale ids pile up"""
+        with self._lock:
+            if self.dhashes.pop(row_id, None) is None:
+                return
+            self.phashes.pop(row_id)
+            self.aspects.pop(row_id)
+            self.symmetry_vectors.pop(row_id, None)
+            self.stale += 1
+            if self.stale * 2 > self.tree.size:
+                self.tree = BKTree()
+                for other, p in self.phashes.items():
+                    self.tree.add(p, other)
+                self.stale = 0
+
+    def find(self, hashes, width, height):
+        """Closest indexed analysis within the radius as (row_id, distance), or None"""
+        p, d = hashes
+        aspect = width / height
+        with self._lock:
+            candidates = self.tree.search(p, self.radius)
+            for distance, _, row_id in candidates:
+                other = self.dhashes.get(row_id)
+                if other is None or hamming(d, other) > self.radius:
+                    continue
+                if abs(self.aspects[row_id] - aspect) > MAX_ASPECT_DIFFERENCE * aspect:
+                    continue
+                return row_id, distance
+        return None
+
+    def lookup(self, hashes, width, height):
+        """Stored analysis of a near-duplicate rescaled to width x height, plus its visualization"""
+        match = self.find(hashes, width, height)
+        if match is None and self._refresh():
+            match = self.find(hashes, width, height)
+        if match is None:
+            return None
+        row_id, distance = match
+
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT analysis FROM analysis_index WHERE id = ? AND pipeline_version IS ?",
+                (row_id, self.pipeline_version)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE analysis_index SET last_used_at = ? WHERE id = ?",
+                             (datetime.now().isoformat(), row_id))
+        finally:
+            conn.close()
+        visualization_path = os.path.join(VISUALIZATION_DIR, f"{row_id}.png")
+        if row is None or not os.path.exists(visualization_path):
+            self._forget(row_id)    # evicted by another worker
+            return None
+
+        with open(visualization_path, "rb") as f:
+            visualization = f.read()
+        analysis = rescale_analysis(json.loads(row[0]), width, height)
+        analysis["match"] = {"id": row_id, "distance": distance}
+        return analysis, visualization
+
+    def add(self, hashes, analysis, visualization):
+        """Store an analysis (dict with width, height, dots, strokes, ...) and its PNG"""
+        p, d = hashes
+        vector = symmetry_vector(analysis["symmetry"]) if analysis.get("symmetry") else None
+        conn = self._connect()
+        try:
+            now = datetime.now().isoformat()
+            cursor = conn.execute(
+                "INSERT INTO analysis_index (phash, dhash, width, height, analysis, created_at, symmetry, "
+                "pipeline_version, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (_to_sqlite(p), _to_sqlite(d), analysis["width"], analysis["height"],
+                 json.dumps(analysis), now,
+                 json.dumps(vector) if vector else None, self.pipeline_version, now)
+            )
+            row_id = cursor.lastrowid
+            evicted = self._evict(conn, keep=row_id)
+        finally:
+            conn.close()
+        for old_id in evicted:
+            self._forget(old_id)
+
+        with open(os.path.join(VISUALIZATION_DIR, f"{row_id}.png"), "wb") as f:
+            f.write(visualization)
+        with self._lock:
+            if row_id not in self.dhashes:
+                self._insert(row_id, p, d, analysis["width"], analysis["height"], vector)
+        return row_id
+
+    def _evict(self, conn, keep):
+        """Delete the rows over max_entries (other versions first, then least recently used); returns their ids"""
+        excess = conn.execute("SELECT COUNT(*) FROM analysis_index").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return []
+        evicted = [row[0] for row in conn.execute(
+            "SELECT id FROM analysis_index WHERE id != ? "
+            "ORDER BY pipeline_version IS ?, COALESCE(last_used_at, created_at), id LIMIT ?",
+            (keep, self.pipeline_version, excess)
+        )]
+        conn.executemany("DELETE FROM analysis_index WHERE id = ?", [(row_id,) for row_id in evicted])
+        for row_id in evicted:
+            try:
+                os.remove(os.path.join(VISUALIZATION_DIR, f"{row_id}.png"))
+            except FileNotFoundError:
+                pass
+        return evicted
+
+    def similar_by_symmetry(self, row_id, limit=5):
+        """Indexed analyses whose symmetry profile is closest to that of `row_id`"""
+        with self._lock:
+            target = self.symmetry_vectors.get(row_id)
+            if target is None:
+                return None
+            ids = [other for other in self.symmetry_vectors if other != row_id]
+            if not ids:
+                return []
+            vectors = np.stack([self.symmetry_vectors[other] for other in ids])
+        distances = np.linalg.norm(vectors - target, axis=1)
+        order = np.argsort(distances)[:limit]
+        return [{"id": ids[i], "distance": round(float(distances[i]), 4)} for i in order]
+
+
+def flag_duplicate_contributions(db_path="kolamlab.db", image_root=".", radius=DEFAULT_RADIUS):
+    """
+    Fingerprint every unchecked dataset contribution and record which earlier
+    contribution it duplicates (if any). Returns the newly flagged duplicates.
+    """
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    try:
+        conn.executescript(CONTRIBUTION_SCHEMA)
+        known = conn.execute(
+            "SELECT id, phash, dhash FROM contribution_fingerprints WHERE phash IS NOT NULL"
+        ).fetchall()
+        pending = conn.execute(
+            "SELECT id, original_image_path FROM dataset_contributions "
+            "WHERE id NOT IN (SELECT id FROM contribution_fingerprints) "
+            "ORDER BY COALESCE(timestamp, ''), id"
+        ).fetchall()
+
+        tree, dhashes = BKTree(), {}
+        for contribution_id, p, d in known:
+            tree.add(_from_sqlite(p), contribution_id)
+            dhashes[contribution_id] = _from_sqlite(d)
+
+        duplicates = []
+        now = datetime.now().isoformat()
+        for contribution_id, image_path in pending:
+            gray = None
+            if image_path:
+                gray = cv2.imread(os.path.join(image_root, image_path), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                conn.execute(
+                    "INSERT INTO contribution_fingerprints (id, checked_at) VALUES (?, ?)",
+                    (contribution_id, now)
+                )
+                continue
+
+            p, d = perceptual_hashes(gray)
+            duplicate_of, best = None, None
+            for distance, _, other_id in tree.search(p, radius):
+                if hamming(d, dhashes[other_id]) <= radius:
+                    duplicate_of, best = other_id, distance
+                    break
+
+            conn.execute(
+                "INSERT INTO contribution_fingerprints (id, phash, dhash, duplicate_of, distance, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (contribution_id, _to_sqlite(p), _to_sqlite(d), duplicate_of, best, now)
+            )
+            tree.add(p, contribution_id)
+            dhashes[contribution_id] = d
+            if duplicate_of:
+                duplicates.append({"id": contribution_id, "duplicate_of": duplicate_of, "distance": best})
+    finally:
+        conn.close()
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual-hash near-duplicate tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    flag = sub.add_parser("flag-contributions", help="Flag duplicate dataset_contributions")
+    flag.add_argument("--db", default="kolamlab.db")
+    flag.add_argument("--image-root", default=".")
+    flag.add_argument("--radius", type=int, default=DEFAULT_RADIUS)
+    args = parser.parse_args()
+
+    duplicates = flag_duplicate_contributions(args.db, args.image_root, args.radius)
+    for dup in duplicates:
+        print(f"🔁 {dup['id']} duplicates {dup['duplicate_of']} (distance {dup['distance']})")
+    print(f"✅ {len(duplicates)} new duplicate contribution(s) flagged")
+
+
+if __name__ == "__main__":
+    main()
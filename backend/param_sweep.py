@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep for dot detection and binarization.
+
+Scores KolamConfig variants on a labelled corpus for accuracy and latency.
+The default corpus is synthetic: pulli grids with loops, tinted backgrounds,
+noise, blur and JPEG artefacts, with exact dot and ink labels. Every trial
+runs only the stages the parameters affect (preprocessing, dot detection and
+grid analysis) on images decoded once per worker, and trials are spread over
+a process pool.
+
+Metrics per trial:
+    f1 / precision / recall  dots matched to labels within max(5, r) pixels
+    grid_accuracy            estimated grid size equals the label
+    mask_iou                 binary image against the ink mask (threshold)
+    latency_ms               mean per image for the stages above
+
+The result is the Pareto front of latency against --metric. It can be
+exported as a named preset for `KOLAM_PRESET=<name>` and
+`batch_analyze.py --config <name>`.
+
+Usage:
+    python param_sweep.py                                   # default grid, synthetic corpus
+    python param_sweep.py --grid hough_param2=8,10,12,15 --grid threshold=110,127,150
+    python param_sweep.py --max-trials 200 --export fast --tolerance 0.02
+    python param_sweep.py --grid max_dots=12,none --grid hough_param2=12,20
+    python param_sweep.py --labels data/dot_labels.jsonl    # {"path": ..., "dots": [[x, y, r], ...]}
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields, replace
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import runtime_budget
+from kolam_types import DEFAULT_CONFIG, KolamConfig, save_preset
+
+SWEEP_OUTPUTS = ["binary", "dots", "grid_size"]
+SWEEP_STAGES = ("preprocessing", "dot_candidates", "dot_detection", "grid_analysis")
+METRICS = ("f1", "precision", "recall", "grid_accuracy", "mask_iou")
+
+# Around the notebook values; override any axis with --grid name=v1,v2,...
+DEFAULT_GRID = {
+    "hough_param2": [8, 10, 12, 15, 20],
+    "hough_param1": [30, 50, 80],
+    "hough_min_dist": [10, 20, 30],
+    "min_contrast": [2.0, 5.0, 10.0],
+    "edge_margin": [5, 15],
+    "threshold": [110, 127, 150],
+}
+
+
+# ---------- Corpus ----------
+
+def synthetic_sample(rng, grid_size, size):
+    """(BGR image, [(x, y, r)] dot labels, ink mask) of a randomised pulli grid"""
+    ink = np.zeros((size, size), dtype=np.uint8)
+    spacing = size / (grid_size + 1)
+    radius = int(max(4, min(12, spacing / 7 * rng.uniform(0.8, 1.2))))
+    thickness = int(rng.integers(2, 5))
+    jitter = spacing * 0.04
+
+    dots = []
+    for i in range(1, grid_size + 1):
+        for j in range(1, grid_size + 1):
+            x = int(round(i * spacing + rng.normal(0, jitter)))
+            y = int(round(j * spacing + rng.normal(0, jitter)))
+            dots.append((x, y, radius))
+            cv2.circle(ink, (x, y), radius, 255, -1)
+            loop = int(spacing / 2 - thickness - 2)
+            if rng.random() < 0.8:
+                cv2.circle(ink, (x, y), loop, 255, thickness)
+            else:
+                cv2.ellipse(ink, (x, y), (loop, loop // 2), float(rng.uniform(0, 180)), 0, 360, 255, thickness)
+
+    background = rng.uniform(200, 255, size=3)
+    stroke = rng.uniform(0, 80, size=3)
+    img = np.empty((size, size, 3), dtype=np.float32)
+    img[:] = background
+    # Uneven lighting: a linear gradient of up to +-25 grey levels
+    gradient = np.linspace(-1, 1, size, dtype=np.float32) * rng.uniform(0, 25)
+    img += gradient[None, :, None] if rng.random() < 0.5 else gradient[:, None, None]
+    img[ink > 0] = stroke
+    img += rng.normal(0, rng.uniform(0, 10), size=img.shape).astype(np.float32)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    if rng.random() < 0.5:
+        img = cv2.GaussianBlur(img, (3, 3), 0)
+
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(55, 95))])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR), dots, ink > 0
+
+
+def synthetic_corpus(count=24, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = []
+    for index in range(count):
+        grid_size = 2 + index % 6
+        size = int(rng.choice([240, 320, 400, 480, 640]))
+        img, dots, mask = synthetic_sample(rng, grid_size, size)
+        samples.append({"name": f"synthetic_{index:03d}", "image": img, "dots": dots,
+                        "grid_size": grid_size, "mask": mask})
+    return samples
+
+
+def labelled_corpus(labels_path):
+    """Samples from a JSONL of {"path", "dots", optional "grid_size"}; paths relative to the file"""
+    base = os.path.dirname(os.path.abspath(labels_path))
+    samples = []
+    with open(labels_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            label = json.loads(line)
+            img = cv2.imread(os.path.join(base, label["path"]), cv2.IMREAD_COLOR)
+            if img is None:
+                print(f"⚠️  Skipping unreadable {label['path']}")
+                continue
+            samples.append({"name": label["path"], "image": img, "dots": [tuple(d) for d in label["dots"]],
+                            "grid_size": label.get("grid_size"), "mask": None})
+    return samples
+
+
+# ---------- Scoring ----------
+
+def match_dots(detected, labels):
+    """Greedy nearest matching within max(5, r) pixels; returns the number of true positives"""
+    if not detected or not labels:
+        return 0
+    found = np.array([(x, y) for x, y, r in detected], dtype=np.float32)
+    truth = np.array([(x, y) for x, y, r in labels], dtype=np.float32)
+    tolerance = np.array([max(5, r) for x, y, r in labels], dtype=np.float32)
+    distances = np.linalg.norm(found[:, None, :] - truth[None, :, :], axis=2)
+    matched = 0
+    used_found, used_truth = set(), set()
+    for flat in np.argsort(distances, axis=None):
+        i, j = divmod(int(flat), len(truth))
+        if distances[i, j] > tolerance[j]:
+            break
+        if i in used_found or j in used_truth:
+            continue
+        used_found.add(i)
+        used_truth.add(j)
+        matched += 1
+    return matched
+
+
+def score_trial(config, samples):
+    from kolam_processor import PIPELINE
+
+    true_positives = detected = expected = 0
+    grid_hits = grid_total = 0
+    ious = []
+    elapsed = []
+    for sample in samples:
+        values = {"original": sample["image"], "config": config}
+        timings = {}
+        PIPELINE.run(values, SWEEP_OUTPUTS, timings)
+        elapsed.append(sum(timings[name] for name in SWEEP_STAGES if name in timings))
+
+        dots = values["dots"]
+        true_positives += match_dots(dots, sample["dots"])
+        detected += len(dots)
+        expected += len(sample["dots"])
+        if sample["grid_size"] is not None:
+            grid_total += 1
+            grid_hits += values["grid_size"] == sample["grid_size"]
+        if sample["mask"] is not None:
+            binary = values["binary"] > 0
+            union = np.logical_or(binary, sample["mask"]).sum()
+            ious.append(np.logical_and(binary, sample["mask"]).sum() / union if union else 1.0)
+
+    precision = true_positives / detected if detected else 0.0
+    recall = true_positives / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "f1": round(f1, 4),
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "grid_accuracy": round(grid_hits / grid_total, 4) if grid_total else None,
+        "mask_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "latency_ms": round(float(np.mean(elapsed)), 3),
+    }
+
+
+# ---------- Workers ----------
+
+_samples = None
+
+
+def _worker_init(samples):
+    global _samples
+    _samples = samples
+    # One OpenCV thread per process; the pool already provides the parallelism
+    cv2.setNumThreads(1)
+    # detect_dots reports every image on stdout
+    sys.stdout = open(os.devnull, "w")
+
+
+def run_trial(config):
+    return config, score_trial(config, _samples)
+
+
+# ---------- Sweep ----------
+
+def parse_grid(overrides):
+    """DEFAULT_GRID with --grid name=v1,v2 axes replaced (values cast to the field's type)"""
+    # Fields that default to None (max_candidates) take counts
+    types = {f.name: type(getattr(DEFAULT_CONFIG, f.name)) if getattr(DEFAULT_CONFIG, f.name) is not None else int
+             for f in fields(KolamConfig)}
+    grid = dict(DEFAULT_GRID)
+    for override in overrides or []:
+        name, _, raw = override.partition("=")
+        if name not in types:
+            raise ValueError(f"Unknown parameter '{name}'; choose from {', '.join(types)}")
+        cast = types[name]
+        values = []
+        for value in raw.split(","):
+            value = value.strip()
+            if value.lower() == "none":
+                values.append(None)     # max_dots=none keeps every dot
+            elif cast is bool:
+                values.append(value.lower() in ("1", "true", "yes"))
+            else:
+                values.append(cast(float(value)) if cast is int else cast(value))
+        grid[name] = values
+    return grid
+
+
+def grid_configs(grid, max_trials=None, seed=0):
+    """Every config of the grid (or a random subset), always including the defaults first"""
+    names = list(grid)
+    configs = [replace(DEFAULT_CONFIG, **dict(zip(names, combo))) for combo in itertools.product(*grid.values())]
+    configs = [c for c in configs if c.min_radius < c.max_radius]
+    configs = list(dict.fromkeys(configs))     # KolamConfig is hashable: drop duplicates
+    if DEFAULT_CONFIG in configs:
+        configs.remove(DEFAULT_CONFIG)
+    if max_trials is not None and len(configs) > max_trials - 1:
+        configs = random.Random(seed).sample(configs, max(0, max_trials - 1))
+    return [DEFAULT_CONFIG] + configs
+
+
+def pareto_front(trials, metric):
+    """Trials not beaten on both latency and `metric`, fastest first"""
+    ranked = sorted(trials, key=lambda t: (t["latency_ms"], -(t[metric] or 0.0)))
+    front, best = [], -1.0
+    for trial in ranked:
+        if (trial[metric] or 0.0) > best:
+            front.append(trial)
+            best = trial[metric] or 0.0
+    return front
+
+
+def pick(front, metric, tolerance):
+    """Fastest point of the front within `tolerance` of its best `metric`"""
+    best = max(t[metric] or 0.0 for t in front)
+    return next(t for t in front if (t[metric] or 0.0) >= best - tolerance)
+
+
+def changed_parameters(config):
+    return {f.name: getattr(config, f.name) for f in fields(KolamConfig)
+            if getattr(config, f.name) != getattr(DEFAULT_CONFIG, f.name)}
+
+
+def run_sweep(samples, configs, workers=None, progress=True):
+    workers = workers or max(1, int(runtime_budget.detect_cpus()[0]))
+    trials = []
+    start = time.perf_counter()
+    chunksize = max(1, len(configs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(samples,)) as pool:
+        for config, metrics in pool.map(run_trial, configs, chunksize=chunksize):
+            trials.append({"config": config, **metrics})
+            if progress and (len(trials) % 25 == 0 or len(trials) == len(configs)):
+                rate = len(trials) / (time.perf_counter() - start)
+                eta = (len(configs) - len(trials)) / rate
+                print(f"⏳ {len(trials)}/{len(configs)} trials  {rate:.1f}/s  ETA {eta:.0f}s", file=sys.stderr)
+    return trials
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep dot-detection and threshold parameters")
+    parser.add_argument("--labels", help="JSONL of labelled images (default: synthetic corpus)")
+    parser.add_argument("--synthetic", type=int, default=24, help="Synthetic images when no --labels")
+    parser.add_argument("--grid", action="append", metavar="NAME=V1,V2",
+                        help="Replace one axis of the default grid (repeatable)")
+    parser.add_argument("--max-trials", type=int, help="Random subset of the grid (the defaults always run)")
+    parser.add_argument("--metric", choices=METRICS, default="f1", help="Accuracy axis of the Pareto front")
+    parser.add_argument("--workers", type=int, help="Processes (default: all usable cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write every trial as JSONL")
+    parser.add_argument("--export", metavar="NAME", help="Save the picked front point as preset NAME")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="Pick the fastest front point within this much of the best metric")
+    args = parser.parse_args()
+
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    samples = labelled_corpus(args.labels) if args.labels else synthetic_corpus(args.synthetic, args.seed)
+    if not samples:
+        parser.error("empty corpus")
+    configs = grid_configs(grid, args.max_trials, args.seed)
+
+    print(f"🔧 Sweeping {len(configs)} configs over {len(samples)} "
+          f"{'labelled' if args.labels else 'synthetic'} images")
+    trials = run_sweep(samples, configs, args.workers)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            for trial in trials:
+                f.write(json.dumps({**trial, "config": trial["config"].to_dict()}) + "\n")
+
+    if all(t[args.metric] is None for t in trials):
+        parser.error(f"metric '{args.metric}' is not available for this corpus")
+    baseline = trials[0]
+    front = pareto_front(trials, args.metric)
+    print(f"\n📈 Pareto front ({args.metric} vs latency), baseline: {args.metric}={baseline[args.metric]} "
+          f"latency={baseline['latency_ms']}ms")
+    print(f"   {'latency ms':>10}  {'f1':>6}  {'prec':>6}  {'recall':>6}  {'grid':>6}  {'iou':>6}  changes")
+    for trial in front:
+        changes = changed_parameters(trial["config"]) or "(defaults)"
+        print(f"   {trial['latency_ms']:>10}  {trial['f1']:>6}  {trial['precision']:>6}  {trial['recall']:>6}  "
+              f"{str(trial['grid_accuracy']):>6}  {str(trial['mask_iou']):>6}  {changes}")
+
+    chosen = pick(front, args.metric, args.tolerance)
+    print(f"\n🎯 Pick (fastest within {args.tolerance} of the best {args.metric}): "
+          f"{changed_parameters(chosen['config']) or '(defaults)'}")
+    if args.export:
+        metrics = {k: v for k, v in chosen.items() if k != "config"}
+        source = {
+            "tool": "param_sweep",
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "corpus": args.labels or f"synthetic x{len(samples)} (seed {args.seed})",
+            "metric": args.metric,
+            "trials": len(trials),
+            "baseline": {k: v for k, v in baseline.items() if k != "config"},
+        }
+        path = save_preset(args.export, chosen["config"], metrics, source)
+        print(f"💾 Preset '{args.export}' saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import cv2
+import numpy as np
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from tile_encoding import render_tiles, tiles_from_text, canonical_tiles, tile_distance
+
+DB_PATH = "kolam_enhanced.db"
+CACHE_DIR = os.path.join("generated_images", "pattern_cache")
+
+# Tile sizes requested by the RegionalStyles gallery and detail views
+COMMON_SIZES = (128, 256, 512)
+MIN_SIZE, MAX_SIZE = 32, 1024
+
+FORMATS = {
+    "png": (".png", "image/png", [cv2.IMWRITE_PNG_COMPRESSION, 6]),
+    "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 90]),
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 90]),
+}
+
+
+def parse_grid_size(value, default=5):
+    """Accepts 5, "5" or "5x7" and returns (rows, cols)"""
+    if value is None:
+        return default, default
+    if isinstance(value, int):
+        return value, value
+    parts = str(value).lower().split("x")
+    try:
+        rows = int(parts[0])
+        cols = int(parts[1]) if len(parts) > 1 else rows
+    except ValueError:
+        return default, default
+    return max(1, min(rows, 25)), max(1, min(cols, 25))
+
+
+def pattern_style(pattern):
+    """Pick a drawing style from pattern_data, falling back to the pattern name"""
+    style = pattern["data"].get("style")
+    if style:
+        return style
+    if pattern.get("tiles") is not None:
+        return "tiles"
+    name = pattern["name"].lower()
+    if "sikku" in name:
+        return "sikku"
+    if "pulli" in name or "muggu" in name or name == "kolam":
+        return "pulli"
+    return "lissajous"
+
+
+def render_regional_pattern(pattern, size):
+    """Render a regional pattern definition as a size x size BGR image"""
+    if pattern.get("tiles") is not None and pattern_style(pattern) == "tiles":
+        return render_tiles(pattern["tiles"], size)
+
+    img = np.full((size, size, 3), 255, dtype=np.uint8)
+    rows, cols = parse_grid_size(pattern["data"].get("grid_size"))
+
+    border = size * 0.1
+    spacing = (size - 2 * border) / max(rows, cols)
+    xs = border + spacing * (np.arange(cols) + 0.5) + (max(rows, cols) - cols) * spacing / 2
+    ys = border + spacing * (np.arange(rows) + 0.5) + (max(rows, cols) - rows) * spacing / 2
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    dots = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+
+    line_width = max(1, int(spacing / 12))
+    dot_radius = max(1, int(spacing / 14))
+    color = (60, 40, 160)
+    style = pattern_style(pattern)
+
+    if style == "sikku":
+        # Diamond loops woven between neighbouring dots
+        h = spacing / 2
+        offsets = np.array([(0, -h), (h, 0), (0, h), (-h, 0)])
+        loops = np.round(dots[:, None, :] + offsets[None, :, :]).astype(np.int32)
+        cv2.polylines(img, list(loops), True, color, line_width, cv2.LINE_AA)
+    elif style == "pulli":
+        for x, y in np.round(dots).astype(int):
+            cv2.circle(img, (x, y), int(spacing * 0.4), color, line_width, cv2.LINE_AA)
+    else:
+        t = np.linspace(0, 2 * np.pi, 720)
+        half = (size - 2 * border) / 2
+        curve = np.stack([
+            size / 2 + half * np.sin(cols * t + np.pi / 2),
+            size / 2 + half * np.sin(max(1, rows - 1) * t),
+        ], axis=1)
+        cv2.polylines(img, [np.round(curve).astype(np.int32)], True, color, line_width, cv2.LINE_AA)
+
+    for x, y in np.round(dots).astype(int):
+        cv2.circle(img, (x, y), dot_radius, (0, 0, 0), -1, cv2.LINE_AA)
+
+    return img
+
+
+class PatternRenderCache:
+    """
+    Two-tier render cache for `regional_patterns`.
+
+    Tiles are keyed by (pattern id, content hash, size, format). Hits are served
+    from an in-memory LRU, then from files under `cache_dir`; only a miss on
+    both tiers renders. Editing a pattern changes its hash, so stale tiles are
+    never served and need no explicit invalidation.
+    """
+
+    def __init__(self, db_path=DB_PATH, cache_dir=CACHE_DIR, max_items=1024, pattern_ttl=60):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.pattern_ttl = pattern_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self._patterns = {}
+        self._patterns_loaded_at = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ---------- Pattern definitions ----------
+    def _load_patterns(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                "SELECT id, region, name, description, difficulty, pattern_data FROM regional_patterns"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        patterns = {}
+        for row in rows:
+            raw = row["pattern_data"] or "{}"
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError:
+                data = {}
+            digest = hashlib.sha1(f"{row['name']}|{raw}".encode("utf-8")).hexdigest()[:12]
+            data = data if isinstance(data, dict) else {}
+            # Designs stored as a tile code (see tile_encoding); a bad code just isn't one
+            tiles = None
+            if data.get("tiles"):
+                try:
+                    tiles = tiles_from_text(data["tiles"])
+                except ValueError:
+                    pass
+            patterns[row["id"]] = {
+                "id": row["id"],
+                "region": row["region"],
+                "name": row["name"],
+                "description": row["description"],
+                "difficulty": row["difficulty"],
+                "data": data,
+                "tiles": tiles,
+                "hash": digest,
+            }
+        return patterns
+
+    def patterns(self):
+        """All pattern definitions, re-read from the database at most every `pattern_ttl` seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._patterns_loaded_at < self.pattern_ttl:
+                return self._patterns
+
+        patterns = self._load_patterns()
+        with self._lock:
+            self._patterns = patterns
+            self._patterns_loaded_at = now
+        return patterns
+
+    def get_pattern(self, pattern_id):
+        return self.patterns().get(pattern_id)
+
+    def match_tiles(self, tiles, limit=5, max_distance=0.25):
+        """
+        Patterns stored as tile codes that match `tiles` up to rotation and
+        reflection, closest first: [{id, name, region, distance, exact}]
+        """
+        canonical = canonical_tiles(tiles).tobytes()
+        matches = []
+        for pattern in self.patterns().values():
+            if pattern["tiles"] is None:
+                continue
+            distance = tile_distance(tiles, pattern["tiles"])
+            if distance is None or distance > max_distance:
+                continue
+            matches.append({
+                "id": pattern["id"],
+                "name": pattern["name"],
+                "region": pattern["region"],
+                "distance": round(distance, 4),
+                "exact": canonical_tiles(pattern["tiles"]).tobytes() == canonical,
+            })
+        matches.sort(key=lambda m: (m["distance"], m["id"]))
+        return matches[:limit]
+
+    # ---------- Rendering ----------
+    def _memory_get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def render(self, pattern_id, size, fmt="png"):
+        """Return (encoded bytes, cache key) for a pattern tile, or None if the pattern is unknown"""
+        pattern = self.get_pattern(pattern_id)
+        if pattern is None:
+            return None
+
+        ext, _, params = FORMATS[fmt]
+        key = f"{pattern_id}_{pattern['hash']}_{size}_{fmt}"
+
+        data = self._memory_get(key)
+        if data is not None:
+            return data, key
+
+        # Serialize renders of the same tile so concurrent gallery requests render it once
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+
+        with render_lock:
+            data = self._memory_get(key)
+            if data is not None:
+                return data, key
+
+            path = os.path.join(self.cache_dir, key + ext)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+            else:
+                img = render_regional_pattern(pattern, size)
+                ok, encoded = cv2.imencode(ext, img, params)
+                if not ok:
+                    raise RuntimeError(f"Could not encode pattern {pattern_id} as {fmt}")
+                data = encoded.tobytes()
+
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+            self._memory_put(key, data)
+
+        with self._lock:
+            self._render_locks.pop(key, None)
+        return data, key
+
+    def warm(self, sizes=COMMON_SIZES, formats=("png",)):
+        """Render (or load from disk) every pattern at the common sizes"""
+        start = time.time()
+        count = 0
+        for pattern_id in self.patterns():
+            for size in sizes:
+                for fmt in formats:
+                    self.render(pattern_id, size, fmt)
+                    count += 1
+        print(f"✓ Pattern render cache warmed - {count} tiles in {time.time() - start:.2f}s")
+        return count
@@ -0,0 +1,154 @@
+"""
+Opt-in per-request profiling for /predict.
+
+A request is profiled when it carries `X-Kolam-Profile: <KOLAM_PROFILE_TOKEN>`
+or when it is picked by KOLAM_PROFILE_SAMPLE_RATE (0..1, default 0). Profiles
+are written to generated_images/profiles, named after the image hash:
+
+    sample   (default) statistical sampler -> collapsed stacks (.folded), readable
+             by flamegraph.pl, speedscope and inferno
+    cprofile deterministic cProfile -> .prof (snakeviz, flameprof)
+
+Both profilers watch only the calling thread, so a profiled request runs
+its pipeline serially (no stage pool). Near-duplicate hits skip the pipeline
+and are not profiled.
+
+Each profile gets a .json sidecar with the image hash, stage timings and
+profiler settings. With no token configured and a zero sample rate the only
+cost per request is one comparison.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = os.path.join("generated_images", "profiles")
+PROFILE_TOKEN = os.environ.get("KOLAM_PROFILE_TOKEN")
+SAMPLE_RATE = float(os.environ.get("KOLAM_PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_MODE = os.environ.get("KOLAM_PROFILE_MODE", "sample")
+SAMPLE_INTERVAL = float(os.environ.get("KOLAM_PROFILE_INTERVAL_MS", "5")) / 1000
+
+
+def profile_reason(header_value):
+    """Why this request should be profiled ("header" / "sampled"), or None"""
+    if header_value and PROFILE_TOKEN and hmac.compare_digest(header_value, PROFILE_TOKEN):
+        return "header"
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="kolam-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileCapture:
+    """
+    Context manager around the profiled work; `save()` writes the artifacts.
+
+        capture = ProfileCapture("header")
+        with capture:
+            results = processor.process_complete_pipeline(content, parallel=False)
+        info = capture.save(content, processor.stage_timings)
+    """
+
+    def __init__(self, reason, mode=PROFILE_MODE):
+        self.reason = reason
+        self.mode = mode if mode in ("sample", "cprofile") else "sample"
+        self.profiler = None
+        self.wall_ms = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler()
+            self.profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        self.wall_ms = round((time.perf_counter() - self._start) * 1000, 1)
+        return False
+
+    def save(self, image_bytes, stage_timings=None):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{image_hash[:12]}"
+
+        if self.mode == "cprofile":
+            filename = f"{profile_id}.prof"
+            self.profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+            samples = None
+        else:
+            filename = f"{profile_id}.folded"
+            self.profiler.write(os.path.join(PROFILE_DIR, filename))
+            samples = self.profiler.samples
+
+        info = {
+            "id": profile_id,
+            "file": filename,
+            "mode": self.mode,
+            "reason": self.reason,
+            "image_sha256": image_hash,
+            "image_bytes": len(image_bytes),
+            "wall_ms": self.wall_ms,
+            "stage_timings_ms": dict(stage_timings or {}),
+            "samples": samples,
+            "interval_ms": SAMPLE_INTERVAL * 1000 if self.mode == "sample" else None,
+        }
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+            json.dump(info, f, indent=2)
+
+        print(f"🔥 Profile saved: {filename} ({self.reason}, {self.wall_ms}ms)")
+        return info
@@ -0,0 +1,178 @@
+import base64
+import gzip
+import json
+import uuid
+
+from fastapi.responses import Response
+
+# Optional accelerators: every format still works without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MULTIPART_TYPE = "multipart/mixed"
+
+MIN_COMPRESS_BYTES = 1024    # smaller text bodies are not worth compressing
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5           # good ratio at a fraction of quality 11's CPU cost
+
+
+class Blob(bytes):
+    """Raw bytes inside a response payload; base64-encoded (once) only when JSON needs it"""
+
+    def b64(self):
+        encoded = self.__dict__.get("_b64")
+        if encoded is None:
+            encoded = self.__dict__["_b64"] = base64.b64encode(self).decode("utf-8")
+        return encoded
+
+
+def _parse_header_list(value):
+    """'a;q=0.5, b' -> {'a': 0.5, 'b': 1.0}"""
+    items = {}
+    for part in (value or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(val)
+                except ValueError:
+                    quality = 0.0
+        items[name.strip().lower()] = quality
+    return items
+
+
+def negotiate_format(accept):
+    """Pick json, msgpack or multipart from the Accept header; JSON unless asked otherwise"""
+    offers = {JSON_TYPE: "json", MULTIPART_TYPE: "multipart"}
+    if msgpack is not None:
+        offers.update({media_type: "msgpack" for media_type in MSGPACK_TYPES})
+
+    best, best_q = "json", 0.0
+    for media_type, quality in _parse_header_list(accept).items():
+        fmt = offers.get(media_type)
+        # Ties keep the first listed type; wildcards such as */* fall back to JSON
+        if fmt and quality > best_q:
+            best, best_q = fmt, quality
+    return best
+
+
+def negotiate_encoding(accept_encoding):
+    encodings = _parse_header_list(accept_encoding)
+    if brotli is not None and encodings.get("br", 0) > 0:
+        return "br"
+    if encodings.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def _json_default(value):
+    if isinstance(value, Blob):
+        return value.b64()
+    if hasattr(value, "tolist"):      # numpy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps_json(payload):
+    """Compact JSON bytes; orjson when installed (several times faster on large base64 strings)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _replace_blobs(value, parts, path):
+    """Swap Blobs for {"$part": id} references, collecting (id, bytes) for multipart bodies"""
+    if isinstance(value, Blob):
+        parts.append((path, value))
+        return {"$part": path}
+    if isinstance(value, dict):
+        return {k: _replace_blobs(v, parts, f"{path}.{k}" if path else k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_blobs(v, parts, f"{path}.{i}") for i, v in enumerate(value)]
+    return value
+
+
+def _sniff_media_type(data):
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _multipart_body(payload, encoding):
+    parts = []
+    metadata = dumps_json(_replace_blobs(payload, parts, ""))
+    boundary = uuid.uuid4().hex
+
+    headers = [f"Content-Type: {JSON_TYPE}", "Content-ID: <metadata>"]
+    if encoding and len(metadata) >= MIN_COMPRESS_BYTES:
+        metadata = compress(metadata, encoding)
+        headers.append(f"Content-Encoding: {encoding}")
+
+    chunks = []
+    for part_headers, body in [(headers, metadata)] + [
+        ([f"Content-Type: {_sniff_media_type(data)}", f"Content-ID: <{part_id}>"], data)
+        for part_id, data in parts
+    ]:
+        part_headers = part_headers + [f"Content-Length: {len(body)}"]
+        head = "".join(f"{h}\r\n" for h in part_headers)
+        chunks.append(f"--{boundary}\r\n{head}\r\n".encode())
+        chunks.append(bytes(body))
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), f"{MULTIPART_TYPE}; boundary={boundary}"
+
+
+def build_response(payload, accept=None, accept_encoding=None):
+    """
+    Serialize a payload whose binary fields are Blobs in the format the client asked for:
+      application/json     base64 strings, as before (gzip/br when accepted)
+      application/msgpack  raw bytes in msgpack bin fields
+      multipart/mixed      JSON metadata part with {"$part": id} references, then one raw part per Blob
+    """
+    fmt = negotiate_format(accept)
+    encoding = negotiate_encoding(accept_encoding)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    if fmt == "msgpack":
+        body = msgpack.packb(payload, default=_json_default, use_bin_type=True)
+        media_type = MSGPACK_TYPES[0]
+    elif fmt == "multipart":
+        body, media_type = _multipart_body(payload, encoding)
+    else:
+        body = dumps_json(payload)
+        media_type = JSON_TYPE
+        if encoding and len(body) >= MIN_COMPRESS_BYTES:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type=media_type, headers=headers)
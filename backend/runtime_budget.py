@@ -0,0 +1,184 @@
+"""
+CPU and thread budget for the backend.
+
+Detects how many cores the container may actually use (cgroup quota and CPU
+affinity) and splits them between uvicorn worker processes and the per-worker
+thread pools of OpenCV, NumPy's BLAS and our own executors, so that scaling a
+container from 2 to 32 cores never oversubscribes it.
+
+Policies (KOLAM_THREAD_POLICY):
+    throughput  one single-threaded worker per core (best for many small requests)
+    latency     one worker using every core (best for few large images)
+    balanced    workers with two threads each (default)
+
+KOLAM_CPUS, KOLAM_WORKERS and KOLAM_THREADS_PER_WORKER override the detected
+values. This module must not import numpy or cv2 at import time: the BLAS
+thread environment has to be set before they load.
+"""
+
+import math
+import os
+from dataclasses import dataclass, asdict
+
+POLICIES = ("throughput", "latency", "balanced")
+DEFAULT_POLICY = "balanced"
+
+# Environment variables read by the BLAS/OpenMP runtimes bundled with NumPy and OpenCV
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+@dataclass(frozen=True)
+class RuntimeLayout:
+    cpus: float
+    cpu_source: str
+    policy: str
+    workers: int
+    threads_per_worker: int
+
+    def as_dict(self):
+        return asdict(self)
+
+    def describe(self):
+        return (f"{self.cpus:g} CPUs ({self.cpu_source}), policy={self.policy} -> "
+                f"{self.workers} worker(s) x {self.threads_per_worker} thread(s)")
+
+
+def _read_file(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota():
+    """CPU limit from the cgroup (v2 cpu.max or v1 cfs quota), or None if unlimited"""
+    cpu_max = _read_file("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    for base in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        quota = _read_file(os.path.join(base, "cpu.cfs_quota_us"))
+        period = _read_file(os.path.join(base, "cpu.cfs_period_us"))
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    return None
+
+
+def detect_cpus():
+    """Usable CPUs as (count, source), honouring KOLAM_CPUS, cgroup quota and affinity"""
+    override = os.environ.get("KOLAM_CPUS")
+    if override:
+        return max(1.0, float(override)), "KOLAM_CPUS"
+
+    try:
+        available = len(os.sched_getaffinity(0))
+        source = "affinity"
+    except AttributeError:
+        available = os.cpu_count() or 1
+        source = "cpu_count"
+
+    quota = cgroup_cpu_quota()
+    if quota is not None and quota < available:
+        return max(1.0, quota), "cgroup quota"
+    return float(available), source
+
+
+def plan_layout(cpus, policy=DEFAULT_POLICY, workers=None, threads_per_worker=None):
+    """Split `cpus` between worker processes and threads per worker"""
+    if policy not in POLICIES:
+        print(f"⚠️  Unknown KOLAM_THREAD_POLICY '{policy}', using '{DEFAULT_POLICY}'")
+        policy = DEFAULT_POLICY
+
+    # Fractional quotas (e.g. 2.5 CPUs) round down; every process still gets one core
+    cores = max(1, int(math.floor(cpus)))
+
+    if workers is None and threads_per_worker is None:
+        if policy == "throughput":
+            workers, threads_per_worker = cores, 1
+        elif policy == "latency":
+            workers, threads_per_worker = 1, cores
+        else:
+            threads_per_worker = 2 if cores >= 4 else 1
+            workers = max(1, cores // threads_per_worker)
+    elif workers is None:
+        workers = max(1, cores // threads_per_worker)
+    elif threads_per_worker is None:
+        threads_per_worker = max(1, cores // workers)
+
+    return workers, threads_per_worker
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def current_layout():
+    """The layout for this process, derived from the environment and the cgroup"""
+    cpus, source = detect_cpus()
+    policy = os.environ.get("KOLAM_THREAD_POLICY", DEFAULT_POLICY)
+    workers, threads = plan_layout(
+        cpus,
+        policy,
+        workers=_env_int("KOLAM_WORKERS"),
+        threads_per_worker=_env_int("KOLAM_THREADS_PER_WORKER"),
+    )
+    return RuntimeLayout(cpus, source, policy if policy in POLICIES else DEFAULT_POLICY, workers, threads)
+
+
+def thread_env(layout):
+    """Environment that pins BLAS/OpenMP pools to the per-worker thread budget"""
+    threads = str(layout.threads_per_worker)
+    return {name: threads for name in THREAD_ENV_VARS}
+
+
+_process_layout = None
+
+
+def process_layout():
+    """The layout applied by configure_process, worked out once per process"""
+    global _process_layout
+    if _process_layout is None:
+        _process_layout = current_layout()
+    return _process_layout
+
+
+def configure_process(layout=None):
+    """
+    Apply the thread budget to this process and return the layout.
+
+    Call before numpy/cv2 are imported so the BLAS variables take effect;
+    explicitly set variables are left alone.
+    """
+    global _process_layout
+    layout = _process_layout = layout or current_layout()
+    for name, value in thread_env(layout).items():
+        os.environ.setdefault(name, value)
+
+    import cv2
+    cv2.setNumThreads(layout.threads_per_worker)
+
+    # If numpy was already imported, its BLAS pool is sized; threadpoolctl can still resize it
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(layout.threads_per_worker)
+    except ImportError:
+        pass
+
+    return layout
+
+
+def executor_workers(layout=None):
+    """Thread pool size for in-request parallelism within one worker"""
+    layout = layout or process_layout()
+    return layout.threads_per_worker
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Production entry point: size uvicorn workers and per-worker threads to the container.
+
+Usage:
+    python serve.py                       # host 0.0.0.0, port $PORT or 8080
+    KOLAM_THREAD_POLICY=latency python serve.py
+"""
+
+import os
+
+import runtime_budget
+
+
+def main():
+    layout = runtime_budget.current_layout()
+
+    # Workers inherit the environment, so every process agrees on the same budget
+    os.environ["KOLAM_WORKERS"] = str(layout.workers)
+    os.environ["KOLAM_THREADS_PER_WORKER"] = str(layout.threads_per_worker)
+    for name, value in runtime_budget.thread_env(layout).items():
+        os.environ.setdefault(name, value)
+
+    print(f"🧮 Runtime layout: {layout.describe()}")
+
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8080")),
+        workers=layout.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class Stage:
+    """One pipeline stage: `fn(*inputs)` returns its outputs (a tuple when there are several)"""
+
+    def __init__(self, name, fn, inputs, outputs):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def __repr__(self):
+        return f"Stage({self.name}: {', '.join(self.inputs)} -> {', '.join(self.outputs)})"
+
+
+class StageGraph:
+    """
+    Declarative stage graph with demand-driven execution.
+
+    `run(values, outputs)` executes only the stages the requested outputs
+    transitively depend on and stores every intermediate in `values`, so a
+    later call on the same dict reuses them instead of recomputing.
+    """
+
+    def __init__(self, stages, sources=()):
+        self.stages = list(stages)
+        self.sources = set(sources)
+        self.producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self.producers or output in self.sources:
+                    raise ValueError(f"Output '{output}' is produced twice")
+                self.producers[output] = stage
+
+        for stage in self.stages:
+            missing = [i for i in stage.inputs if i not in self.producers and i not in self.sources]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' needs unknown inputs: {', '.join(missing)}")
+
+    @property
+    def outputs(self):
+        return tuple(self.producers)
+
+    def plan(self, outputs, available=()):
+        """Stages needed for `outputs` in dependency order, skipping what is already available"""
+        available = set(available)
+        order, seen = [], set()
+
+        def visit(name, chain):
+            if name in available:
+                return
+            if name in self.sources:
+                raise ValueError(f"Source '{name}' was not provided")
+            stage = self.producers.get(name)
+            if stage is None:
+                raise ValueError(f"Unknown output '{name}'")
+            if stage.name in seen:
+                return
+            if stage.name in chain:
+                raise ValueError(f"Cycle through stage '{stage.name}'")
+            for dependency in stage.inputs:
+                visit(dependency, chain | {stage.name})
+            seen.add(stage.name)
+            order.append(stage)
+
+        for name in outputs:
+            visit(name, frozenset())
+        return order
+
+    @staticmethod
+    def _call(stage, args):
+        start = time.perf_counter()
+        result = stage.fn(*args)
+        if len(stage.outputs) == 1:
+            result = (result,)
+        return result, round((time.perf_counter() - start) * 1000, 2)
+
+    def _store(self, stage, result, elapsed_ms, values, timings):
+        values.update(zip(stage.outputs, result))
+        if timings is not None:
+            timings[stage.name] = elapsed_ms
+
+    def _skipped(self, stage, values, before):
+        """Give the `before` hook its chance; True if it filled in the stage's outputs itself"""
+        if before is None:
+            return False
+        before(stage, values)
+        return all(name in values for name in stage.outputs)
+
+    def run(self, values, outputs, timings=None, before=None):
+        """
+        Compute `outputs` into the memo dict `values` and return them as a dict.
+
+        `before(stage, values)`, if given, is called ahead of each stage and
+        may adjust its inputs in `values`, or store its outputs to skip it
+        (the stages only that one needed are then dropped from the plan).
+        """
+        plan = self.plan(outputs, values)
+        while plan:
+            stage = plan.pop(0)
+            if self._skipped(stage, values, before):
+                plan = self.plan(outputs, values)
+                continue
+            result, elapsed_ms = self._call(stage, [values[name] for name in stage.inputs])
+            self._store(stage, result, elapsed_ms, values, timings)
+        return {name: values[name] for name in outputs}
+
+    def run_parallel(self, values, outputs, executor, timings=None, before=None):
+        """
+        Same as `run`, but every stage whose inputs are ready is submitted to
+        `executor` at once, so independent stages overlap. Only this thread
+        touches `values`; stage functions must not mutate their inputs.
+        """
+        pending = self.plan(outputs, values)
+        running = {}
+        while pending or running:
+            for stage in [s for s in pending if all(name in values for name in s.inputs)]:
+                if stage not in pending:
+                    continue
+                pending.remove(stage)
+                if self._skipped(stage, values, before):
+                    pending = [s for s in self.plan(outputs, values) if s not in running.values()]
+                    continue
+                args = [values[name] for name in stage.inputs]
+                running[executor.submit(self._call, stage, args)] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                result, elapsed_ms = future.result()
+                self._store(stage, result, elapsed_ms, values, timings)
+        return {name: values[name] for name in outputs}
@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+import base64
+
+STROKE_MAGIC = 0x4B53        # "KS"
+STROKE_VERSION = 1
+HEADER_SIZE = 5              # magic, version, width, height, stroke count
+MAX_STROKE_POINTS = 32767    # lengths are stored as int16
+INT16_MIN, INT16_MAX = -32768, 32767
+MIN_STROKE_PIXELS = 10       # same significance threshold as step 6
+
+# 4-neighbours first so walks follow the line instead of cutting corners
+NEIGHBOUR_OFFSETS = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def trace_strokes(skeleton_img, min_pixels=MIN_STROKE_PIXELS, epsilon=1.0):
+    """
+    Order skeleton pixels into drawable strokes.
+
+    Walks start at line ends (pixels with one neighbour), then at whatever is
+    left (closed loops and branches). Each walk follows unvisited neighbours
+    until it dead-ends; the resulting polylines are simplified with
+    Douglas-Peucker (`epsilon` px). Returns a list of (N, 2) int32 arrays of x, y.
+    """
+    mask = skeleton_img > 0
+    ys, xs = np.nonzero(mask)
+    n = len(xs)
+    if n == 0:
+        return []
+
+    # Index image with a -1 border so neighbour lookups never go out of bounds
+    index = np.full((mask.shape[0] + 2, mask.shape[1] + 2), -1, dtype=np.int32)
+    index[ys + 1, xs + 1] = np.arange(n, dtype=np.int32)
+    neighbours = np.stack([index[ys + 1 + dy, xs + 1 + dx] for dy, dx in NEIGHBOUR_OFFSETS], axis=1)
+
+    degree = (neighbours >= 0).sum(axis=1)
+    neighbour_lists = [row[row >= 0].tolist() for row in neighbours]
+    starts = np.concatenate([np.flatnonzero(degree == 1), np.flatnonzero(degree != 1)]).tolist()
+
+    visited = bytearray(n)
+    strokes = []
+    for start in starts:
+        if visited[start]:
+            continue
+        visited[start] = 1
+        path = [start]
+        current = start
+        while True:
+            for nxt in neighbour_lists[current]:
+                if not visited[nxt]:
+                    break
+            else:
+                break
+            visited[nxt] = 1
+            path.append(nxt)
+            current = nxt
+
+        if len(path) < min_pixels:
+            continue
+        points = np.stack([xs[path], ys[path]], axis=1).astype(np.int32)
+        if epsilon > 0:
+            points = cv2.approxPolyDP(points.reshape(-1, 1, 2), epsilon, False).reshape(-1, 2)
+        strokes.append(points)
+
+    # Longest strokes first: clients can start animating the dominant line immediately
+    strokes.sort(key=len, reverse=True)
+    return strokes
+
+
+def encode_strokes(strokes, width, height):
+    """
+    Pack strokes into a compact little-endian int16 blob:
+        [magic, version, width, height, n, len_1..len_n, x0, y0, dx1, dy1, ...]
+    Each stroke stores its first point absolutely and the rest as deltas.
+    ValueError if a size, the stroke count or a coordinate step does not fit int16.
+    """
+    chunks = []
+    for stroke in strokes:
+        # Over-long strokes are split; each chunk starts on the last point of the previous one
+        for start in range(0, max(1, len(stroke) - 1), MAX_STROKE_POINTS - 1):
+            chunks.append(np.asarray(stroke[start:start + MAX_STROKE_POINTS], dtype=np.int32))
+
+    header = [STROKE_MAGIC, STROKE_VERSION, width, height, len(chunks)]
+    lengths = [len(chunk) for chunk in chunks]
+    bodies = [np.diff(chunk, axis=0, prepend=np.zeros((1, 2), np.int32)).ravel() for chunk in chunks]
+    values = np.concatenate([np.array(header + lengths, dtype=np.int64)] + bodies)
+    if values.min() < INT16_MIN or values.max() > INT16_MAX:
+        raise ValueError(f"Strokes for a {width}x{height} image with {len(chunks)} strokes do not fit the int16 format")
+    return values.astype("<i2").tobytes()
+
+
+def decode_strokes(blob):
+    """Inverse of encode_strokes: returns (strokes, width, height)"""
+    values = np.frombuffer(blob, dtype="<i2").astype(np.int32)
+    if len(values) < HEADER_SIZE or values[0] != STROKE_MAGIC or values[1] != STROKE_VERSION:
+        raise ValueError("Not a kolam stroke blob")
+
+    width, height, count = int(values[2]), int(values[3]), int(values[4])
+    lengths = values[HEADER_SIZE:HEADER_SIZE + count]
+    offset = HEADER_SIZE + count
+
+    strokes = []
+    for length in lengths:
+        deltas = values[offset:offset + 2 * length].reshape(-1, 2)
+        strokes.append(np.cumsum(deltas, axis=0))
+        offset += 2 * length
+    return strokes, width, height
+
+
+def strokes_to_base64(strokes, width, height):
+    return base64.b64encode(encode_strokes(strokes, width, height)).decode("utf-8")
+
+
+def rescale_strokes_base64(encoded, width, height):
+    """Re-encode a base64 stroke blob for an image of width x height"""
+    strokes, old_width, old_height = decode_strokes(base64.b64decode(encoded))
+    scale = np.array([width / old_width, height / old_height])
+    scaled = [np.round(stroke * scale).astype(np.int32) for stroke in strokes]
+    return strokes_to_base64(scaled, width, height)
@@ -0,0 +1,103 @@
+import time
+
+import cv2
+import numpy as np
+
+SYMMETRY_SIZE = 128         # the binary image is downsampled to this before analysis
+ANGLE_BINS = 256            # polar resolution; 360/256 = 1.4 deg per bin
+FOLDS = (2, 4, 8)
+AXIS_THRESHOLD = 0.5        # minimum reflection score to report an axis
+AXIS_SEPARATION = 10.0      # degrees between reported axes
+MAX_AXES = 8
+FOLD_THRESHOLD = 0.6        # rotational score needed to call a pattern n-fold symmetric
+
+
+def _polar_rows(binary_img):
+    """Mean-free polar rows (radius x angle) around the stroke centroid, area-weighted"""
+    height, width = binary_img.shape[:2]
+    # Cheap strided pick first so INTER_AREA never touches a full-resolution image
+    step = max(1, min(height, width) // (4 * SYMMETRY_SIZE))
+    reduced = binary_img[::step, ::step]
+    scale = SYMMETRY_SIZE / max(reduced.shape[:2])     # keep the aspect ratio: squashing breaks rotations
+    size = (max(8, round(reduced.shape[1] * scale)), max(8, round(reduced.shape[0] * scale)))
+    small = cv2.resize(reduced, size, interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+    moments = cv2.moments(small)
+    if moments["m00"] > 0:
+        cx, cy = moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+    else:
+        cx, cy = size[0] / 2, size[1] / 2
+    radius = max(4.0, min(cx, cy, size[0] - cx, size[1] - cy))
+
+    # warpPolar rows are angles and columns radii; transpose to one row per radius
+    polar = cv2.warpPolar(small, (int(radius), ANGLE_BINS), (cx, cy), radius,
+                          cv2.WARP_POLAR_LINEAR + cv2.INTER_LINEAR).T
+    weights = np.sqrt(np.arange(1, polar.shape[0] + 1, dtype=np.float32))[:, None]
+    total = float(((polar * weights) ** 2).sum())
+    polar = (polar - polar.mean(axis=1, keepdims=True)) * weights
+    return polar, total, (cx * width / size[0], cy * height / size[1])
+
+
+def _axis_peaks(scores):
+    """Local maxima of the reflection score over axis angles in [0, 180)"""
+    axes = []
+    order = np.argsort(scores)[::-1]
+    step = 180.0 / len(scores)
+    for index in order:
+        score = float(scores[index])
+        if score < AXIS_THRESHOLD or len(axes) >= MAX_AXES:
+            break
+        angle = float(index * step)
+        close = [a for a in axes if min(abs(a["angle"] - angle), 180 - abs(a["angle"] - angle)) < AXIS_SEPARATION]
+        if not close:
+            axes.append({"angle": round(angle, 1), "score": round(score, 3)})
+    return axes
+
+
+def analyze_symmetry(binary_img):
+    """
+    Rotational (2/4/8-fold) and mirror symmetry of a binary kolam image.
+
+    In polar coordinates a rotation is a circular shift along the angle axis
+    and a reflection about the axis at angle t maps phi to 2t - phi. So one FFT
+    per radius gives both the angular autocorrelation (rotations) and the
+    self-convolution (every reflection axis at once). Runs in a few
+    milliseconds because the image is first reduced to SYMMETRY_SIZE.
+    """
+    start = time.perf_counter()
+    rows, total, center = _polar_rows(binary_img)
+    energy = float((rows * rows).sum())
+
+    if energy <= 1e-4 * max(total, 1e-6):
+        # No angular variation (blank image, rings): invariant under every rotation
+        rotational = {str(n): 1.0 for n in FOLDS}
+        axes = []
+    else:
+        spectrum = np.fft.rfft(rows, axis=1)
+        autocorrelation = np.fft.irfft((spectrum * np.conj(spectrum)).sum(axis=0), n=ANGLE_BINS) / energy
+        convolution = np.fft.irfft((spectrum * spectrum).sum(axis=0), n=ANGLE_BINS) / energy
+
+        rotational = {}
+        for n in FOLDS:
+            shifts = [round(ANGLE_BINS * k / n) % ANGLE_BINS for k in range(1, n)]
+            rotational[str(n)] = round(float(np.clip(autocorrelation[shifts].mean(), 0.0, 1.0)), 3)
+        # convolution[j] compares phi with (j * 360 / ANGLE_BINS) - phi, i.e. the axis at j * 180 / ANGLE_BINS
+        axes = _axis_peaks(np.clip(convolution, 0.0, 1.0))
+
+    dominant_fold = max([n for n in FOLDS if rotational[str(n)] >= FOLD_THRESHOLD], default=1)
+    return {
+        "rotational": rotational,
+        "dominant_fold": dominant_fold,
+        "reflection_axes": axes,
+        "center": [round(center[0], 1), round(center[1], 1)],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def symmetry_vector(symmetry):
+    """Fixed-length feature vector for similarity search over stored analyses"""
+    axes = symmetry["reflection_axes"]
+    return [symmetry["rotational"][str(n)] for n in FOLDS] + [
+        axes[0]["score"] if axes else 0.0,
+        min(len(axes), MAX_AXES) / MAX_AXES,
+    ]
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules are flat top-level modules; the tests import them as the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("KOLAM_WARMUP", "0")
@@ -0,0 +1,133 @@
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from models.daily_challenge import DailyChallengeService
+
+
+def legacy_db(path):
+    """A database from before the leaderboard, holding a repeated completion"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE daily_challenges (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT UNIQUE NOT NULL,
+            pattern_name TEXT NOT NULL, description TEXT, difficulty TEXT, points INTEGER DEFAULT 100,
+            cultural_context TEXT);
+        CREATE TABLE user_progress (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, challenge_id INTEGER,
+            completed_at TIMESTAMP, score INTEGER, streak_count INTEGER DEFAULT 0);
+        INSERT INTO daily_challenges (date, pattern_name, points) VALUES
+            ('2026-03-01', 'a', 100), ('2026-03-02', 'b', 100), ('2026-03-03', 'c', 100);
+        INSERT INTO user_progress (user_id, challenge_id, score) VALUES
+            ('u', 1, 100), ('u', 2, 80), ('u', 2, 80), ('v', 3, 50);
+    """)
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def progress_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT user_id, challenge_id FROM user_progress ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_startup_keeps_existing_rows_and_counts_each_challenge_once(tmp_path):
+    db_path = legacy_db(tmp_path / "challenges.db")
+    service = DailyChallengeService(db_path)
+
+    assert len(progress_rows(db_path)) == 4
+    standing = service.get_user_standing("u")
+    assert standing["total_score"] == 180 and standing["completions"] == 2
+
+
+def test_new_repeats_are_refused_before_the_migration(tmp_path):
+    db_path = legacy_db(tmp_path / "challenges.db")
+    DailyChallengeService(db_path)
+
+    conn = sqlite3.connect(db_path)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO user_progress (user_id, challenge_id, score) VALUES ('v', 3, 50)")
+    conn.close()
+
+
+def test_dedupe_progress_removes_repeats_and_adds_the_unique_index(tmp_path):
+    db_path = legacy_db(tmp_path / "challenges.db")
+    service = DailyChallengeService(db_path)
+
+    assert service.dedupe_progress() == 1
+    assert progress_rows(db_path) == [("u", 1), ("u", 2), ("v", 3)]
+    assert service.get_user_standing("u")["total_score"] == 180
+
+    conn = sqlite3.connect(db_path)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    conn.close()
+    assert "idx_user_progress_user_challenge" in names and "user_progress_no_repeat" not in names
+
+    # A restart after the migration leaves the unique index in charge
+    DailyChallengeService(db_path)
+    assert service.record_completion("v", 3)["already_completed"] is True
+
+
+def test_fresh_database(tmp_path):
+    service = DailyChallengeService(str(tmp_path / "fresh.db"))
+    assert service.get_today_challenge() is None
+    assert service.get_leaderboard() == []
+
+
+def service_with_days(tmp_path, days):
+    """A fresh service with one challenge per day for the last `days` days (oldest first)"""
+    db_path = str(tmp_path / "streaks.db")
+    service = DailyChallengeService(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO daily_challenges (date, pattern_name, points) VALUES (?, ?, ?)",
+        [((date.today() - timedelta(days=days - 1 - i)).isoformat(), f"p{i}", 10 + i) for i in range(days)]
+    )
+    conn.commit()
+    conn.close()
+    return service
+
+
+def test_rebuilt_streaks_match_the_incremental_ones(tmp_path):
+    service = service_with_days(tmp_path, 20)
+    rng = random.Random(7)
+    for user in ("a", "b", "c", "d"):
+        # In order with gaps, then back-filling a few older challenges out of order
+        ids = sorted(rng.sample(range(1, 21), 12))
+        ids = ids[:9] + rng.sample(ids[9:], 3)
+        ids[3:6] = ids[3:6][::-1]
+        for challenge_id in ids:
+            service.record_completion(user, challenge_id)
+
+    incremental = service.get_leaderboard(limit=10)
+    service.rebuild_leaderboard()
+    assert service.get_leaderboard(limit=10) == incremental
+
+
+def test_back_filling_does_not_move_the_streak(tmp_path):
+    service = service_with_days(tmp_path, 5)
+    for challenge_id in (4, 5):
+        service.record_completion("u", challenge_id)
+    standing = service.record_completion("u", 1)
+    assert standing["current_streak"] == 2 and standing["completions"] == 3
+
+    service.rebuild_leaderboard()
+    assert service.get_user_standing("u")["current_streak"] == 2
+
+
+def test_streaks_lapse_after_a_missed_day(tmp_path):
+    service = service_with_days(tmp_path, 6)
+    for challenge_id in (1, 2, 3):
+        service.record_completion("u", challenge_id)   # three days in a row, ending three days ago
+    service.record_completion("v", 5)                 # yesterday: still alive
+
+    standing = service.get_user_standing("u")
+    assert standing["current_streak"] == 0 and standing["best_streak"] == 3
+    assert service.get_user_standing("v")["current_streak"] == 1
+    assert {e["user_id"]: e["current_streak"] for e in service.get_leaderboard()} == {"u": 0, "v": 1}
+
+    # Picking up again starts a new streak
+    assert service.record_completion("u", 6)["current_streak"] == 1
@@ -0,0 +1,102 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import deadline as deadline_module
+from deadline import Deadline, request_budget
+from kolam_processor import DEFAULT_CONFIG, analyze
+from stage_graph import Stage
+
+
+def started(budget_ms, elapsed_ms=0):
+    """A Deadline that has already used `elapsed_ms` of its budget"""
+    return Deadline(budget_ms, start=time.perf_counter() - elapsed_ms / 1000)
+
+
+def test_request_budget_takes_the_tighter_limit():
+    assert request_budget(None, None) is None
+    assert request_budget(None, 300) == 300
+    assert request_budget("500", None) == 500
+    assert request_budget("500", 300) == 300
+    assert request_budget("200", 300) == 200
+
+
+@pytest.mark.parametrize("header", ["x", "0", "-5", "inf", "nan"])
+def test_request_budget_rejects_bad_headers(header):
+    with pytest.raises(ValueError):
+        request_budget(header, None)
+
+
+def test_large_image_is_downscaled_once():
+    deadline = started(20)
+    values = {"original": np.zeros((4000, 3000, 3), np.uint8)}
+    stage = Stage("preprocess", None, ["original", "config"], ["gray"])
+    deadline.before_stage(stage, values)
+    deadline.before_stage(stage, values)
+
+    height, width = values["original"].shape[:2]
+    assert max(width, height) == deadline_module.MIN_WORKING_SIDE
+    [step] = deadline.degradations
+    assert step["step"] == "working_resolution"
+    assert step["size"] == [width, height] and step["original_size"] == [3000, 4000]
+
+
+def test_small_image_within_budget_is_untouched():
+    deadline = started(10_000)
+    original = np.zeros((200, 200, 3), np.uint8)
+    values = {"original": original, "config": DEFAULT_CONFIG}
+    deadline.before_stage(Stage("preprocess", None, ["original"], ["gray"]), values)
+    deadline.before_stage(Stage("dot_candidates", None, ["gray", "original", "config"], ["candidates"]), values)
+    assert values["original"] is original and values["config"] is DEFAULT_CONFIG
+    assert not deadline.degraded
+
+
+def test_late_dot_detection_is_cheap():
+    deadline = started(1000, elapsed_ms=600)
+    values = {"original": np.zeros((100, 100, 3), np.uint8), "config": DEFAULT_CONFIG}
+    deadline.before_stage(Stage("dot_candidates", None, ["config"], ["candidates"]), values)
+
+    config = values["config"]
+    assert config.fallback is False
+    assert config.max_candidates == deadline_module.CHEAP_DETECTION["max_candidates"]
+    assert config.hough_param2 >= DEFAULT_CONFIG.hough_param2
+    assert [d["step"] for d in deadline.degradations] == ["cheap_detection"]
+
+
+def test_optional_analyses_then_panels_are_skipped():
+    analyses = Stage("symmetry", None, ["skeleton"], ["symmetry"])
+    panel = Stage("dots_panel", None, ["dots"], ["dots_panel"])
+
+    deadline, values = started(1000, elapsed_ms=700), {}
+    deadline.before_stage(analyses, values)
+    deadline.before_stage(panel, values)
+    assert values == {"symmetry": None}
+
+    deadline, values = started(1000, elapsed_ms=900), {}
+    deadline.before_stage(panel, values)
+    assert values == {"dots_panel": None}
+    assert deadline.degradations[0]["stage"] == "dots_panel"
+
+
+def synthetic_kolam(side=600, grid=5):
+    img = np.full((side, side, 3), 255, np.uint8)
+    step = side // (grid + 1)
+    for row in range(1, grid + 1):
+        for col in range(1, grid + 1):
+            cv2.circle(img, (col * step, row * step), 8, (0, 0, 0), -1)
+    cv2.ellipse(img, (side // 2, side // 2), (side // 3, side // 4), 0, 0, 360, (0, 0, 0), 3)
+    return img
+
+
+def test_pipeline_degrades_instead_of_failing():
+    img = synthetic_kolam()
+    full = analyze(img, outputs=["visualization"])
+    degraded = analyze(img, outputs=["visualization"], deadline=Deadline(0.001))
+
+    steps = {d["step"] for d in degraded.deadline["degradations"]}
+    assert {"cheap_detection", "skipped_stage"} <= steps
+    assert degraded.symmetry is None and degraded.tiles is None
+    assert degraded.visualization is not None and degraded.grid_size
+    assert full.deadline is None and full.symmetry is not None
@@ -0,0 +1,154 @@
+import base64
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import near_duplicates
+from near_duplicates import DEFAULT_RADIUS, BKTree, NearDuplicateIndex, hamming, perceptual_hashes
+from stroke_encoding import decode_strokes, strokes_to_base64
+
+
+@pytest.fixture(autouse=True)
+def visualization_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(near_duplicates, "VISUALIZATION_DIR", str(tmp_path / "visualizations"))
+
+
+def kolam_image(width=600, height=400, shift=0):
+    img = np.full((height, width), 255, np.uint8)
+    for x in range(60, width - 40, 90):
+        for y in range(60, height - 40, 90):
+            cv2.circle(img, (x + shift, y), 10, 0, -1)
+    cv2.ellipse(img, (width // 2, height // 2), (width // 3, height // 3), 30, 0, 360, 0, 4)
+    return img
+
+
+def analysis(width=600, height=400):
+    return {
+        "width": width,
+        "height": height,
+        "grid_size": 4,
+        "dots": [[60, 60, 10], [150, 60, 10]],
+        "strokes": strokes_to_base64([np.array([[100, 100], [300, 200]])], width, height),
+        "stroke_count": 1,
+        "symmetry": None,
+        "lissajous_fit": None,
+        "tiles": None,
+        "palette": None,
+    }
+
+
+def recompressed(img, scale):
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, jpeg = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, 60])
+    return cv2.imdecode(jpeg, cv2.IMREAD_GRAYSCALE)
+
+
+def test_bk_tree_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    keys = [int(k) for k in rng.integers(0, 1 << 62, 300)]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+    query = keys[7] ^ 0b1011
+    found = tree.search(query, 20)
+    expected = sorted((hamming(query, key), i) for i, key in enumerate(keys) if hamming(query, key) <= 20)
+    assert [(d, i) for d, _, i in found] == expected
+    assert found[0][0] == 3
+
+
+def test_resized_recompressed_upload_reuses_the_rescaled_analysis(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "index.db"), pipeline_version="v1")
+    img = kolam_image()
+    row_id = index.add(perceptual_hashes(img), analysis(), b"png")
+
+    copy = recompressed(img, 0.5)
+    result, visualization = index.lookup(perceptual_hashes(copy), 300, 200)
+    assert visualization == b"png"
+    assert result["match"]["id"] == row_id and result["match"]["distance"] <= index.radius
+    assert result["scale"] == [0.5, 0.5]
+    assert result["dots"] == [[30, 30, 5], [75, 30, 5]]
+    strokes, width, height = decode_strokes(base64.b64decode(result["strokes"]))
+    assert (width, height) == (300, 200)
+    np.testing.assert_array_equal(strokes[0], [[50, 50], [150, 100]])
+
+
+def test_other_images_and_framings_miss(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "index.db"), pipeline_version="v1")
+    img = kolam_image()
+    index.add(perceptual_hashes(img), analysis(), b"png")
+
+    other = np.full((400, 600), 255, np.uint8)
+    cv2.rectangle(other, (100, 50), (500, 350), 0, 6)
+    cv2.line(other, (0, 0), (600, 400), 0, 5)
+    assert index.lookup(perceptual_hashes(other), 600, 400) is None
+    # Same hashes, different aspect ratio: the stored coordinates would not map
+    assert index.lookup(perceptual_hashes(img), 600, 600) is None
+
+
+def test_rows_of_another_pipeline_version_are_ignored(tmp_path):
+    db_path = str(tmp_path / "index.db")
+    img = kolam_image()
+    NearDuplicateIndex(db_path, pipeline_version="v1").add(perceptual_hashes(img), analysis(), b"png")
+
+    assert NearDuplicateIndex(db_path, pipeline_version="v2").lookup(perceptual_hashes(img), 600, 400) is None
+    assert NearDuplicateIndex(db_path, pipeline_version="v1").lookup(perceptual_hashes(img), 600, 400) is not None
+
+
+def test_a_miss_picks_up_rows_added_by_another_worker(tmp_path):
+    db_path = str(tmp_path / "index.db")
+    first, second = (NearDuplicateIndex(db_path, pipeline_version="v1") for _ in range(2))
+    images = [kolam_image(), kolam_image(shift=25)]
+    assert hamming(perceptual_hashes(images[0])[0], perceptual_hashes(images[1])[0]) > first.radius
+
+    # The other worker's row sits below the first worker's own, so add() must not move the refresh point past it
+    second_id = second.add(perceptual_hashes(images[0]), analysis(), b"a")
+    first_id = first.add(perceptual_hashes(images[1]), analysis(), b"b")
+    assert first_id > second_id
+
+    result, visualization = first.lookup(perceptual_hashes(images[0]), 600, 400)
+    assert result["match"]["id"] == second_id and visualization == b"a"
+    result, visualization = second.lookup(perceptual_hashes(images[1]), 600, 400)
+    assert result["match"]["id"] == first_id and visualization == b"b"
+
+
+def distinct_images(count):
+    rng = np.random.default_rng(1)
+    images = [cv2.resize(rng.integers(0, 256, (8, 12), dtype=np.uint8), (600, 400), interpolation=cv2.INTER_NEAREST)
+              for _ in range(count)]
+    hashes = [perceptual_hashes(img) for img in images]
+    assert all(hamming(a[0], b[0]) > DEFAULT_RADIUS for i, a in enumerate(hashes) for b in hashes[i + 1:])
+    return hashes
+
+
+def test_least_recently_used_analyses_are_evicted(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "index.db"), pipeline_version="v1", max_entries=3)
+    hashes = distinct_images(5)
+    ids = [index.add(h, analysis(), b"png") for h in hashes[:3]]
+    assert index.lookup(hashes[0], 600, 400) is not None    # the oldest is now the most recently used
+
+    ids.append(index.add(hashes[3], analysis(), b"png"))
+    assert index.lookup(hashes[1], 600, 400) is None
+    assert not os.path.exists(os.path.join(near_duplicates.VISUALIZATION_DIR, f"{ids[1]}.png"))
+    assert all(index.lookup(hashes[i], 600, 400) is not None for i in (0, 2, 3))
+
+    # Other pipeline versions go first, however recently they were used
+    other = NearDuplicateIndex(str(tmp_path / "index.db"), pipeline_version="v2", max_entries=3)
+    other.add(hashes[4], analysis(), b"png")
+    assert index.lookup(hashes[4], 600, 400) is None
+    assert other.lookup(hashes[4], 600, 400) is not None
+
+
+def test_a_worker_drops_rows_another_worker_evicted(tmp_path):
+    db_path = str(tmp_path / "index.db")
+    first, second = (NearDuplicateIndex(db_path, pipeline_version="v1", max_entries=2) for _ in range(2))
+    hashes = distinct_images(4)
+    for h in hashes[:2]:
+        first.add(h, analysis(), b"png")
+    second.lookup(hashes[3], 600, 400)      # a miss: the second worker loads both rows
+    assert len(second.dhashes) == 2
+
+    first.add(hashes[2], analysis(), b"png")    # evicts hashes[0]
+    assert second.lookup(hashes[0], 600, 400) is None
+    assert len(second.dhashes) == 1 and second.lookup(hashes[1], 600, 400) is not None
@@ -0,0 +1,82 @@
+import gzip
+import json
+
+import pytest
+
+import response_formats
+from response_formats import Blob, build_response, negotiate_encoding, negotiate_format
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+
+
+def payload():
+    return {"image": Blob(PNG), "grid_size": 5, "nested": {"strokes": Blob(b"\x53\x4b\x01\x00")}}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "json"),
+    ("*/*", "json"),
+    ("text/html", "json"),
+    ("application/json", "json"),
+    ("multipart/mixed", "multipart"),
+    ("application/json;q=0.5, multipart/mixed", "multipart"),
+    ("multipart/mixed;q=0.2, application/json;q=0.9", "json"),
+])
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept) == expected
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    if response_formats.brotli is not None:
+        assert negotiate_encoding("gzip, br") == "br"
+
+
+def test_json_carries_blobs_as_base64():
+    response = build_response(payload())
+    assert response.media_type == "application/json"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    body = json.loads(response.body)
+    assert body["grid_size"] == 5
+    assert body["image"] == Blob(PNG).b64()
+    assert body["nested"]["strokes"] == "U0sBAA=="
+
+
+def test_json_is_compressed_only_when_large_and_accepted():
+    small = build_response({"grid_size": 5}, accept_encoding="gzip")
+    assert "content-encoding" not in small.headers
+
+    large = build_response(payload(), accept_encoding="gzip")
+    assert large.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(large.body))["image"] == Blob(PNG).b64()
+
+
+def test_msgpack_carries_raw_bytes():
+    msgpack = pytest.importorskip("msgpack")
+    response = build_response(payload(), accept="application/msgpack")
+    assert response.media_type == "application/msgpack"
+    body = msgpack.unpackb(response.body, raw=False)
+    assert body["image"] == PNG and body["nested"]["strokes"] == b"\x53\x4b\x01\x00"
+
+
+def test_multipart_references_one_part_per_blob():
+    response = build_response(payload(), accept="multipart/mixed")
+    media_type, _, boundary = response.headers["content-type"].partition("; boundary=")
+    assert media_type == "multipart/mixed"
+
+    chunks = response.body.split(b"--" + boundary.encode())
+    assert chunks[-1] == b"--\r\n"
+    parts = {}
+    for chunk in chunks[1:-1]:
+        head, _, body = chunk.strip(b"\r\n").partition(b"\r\n\r\n")
+        headers = dict(line.split(": ", 1) for line in head.decode().split("\r\n"))
+        assert int(headers["Content-Length"]) == len(body)
+        parts[headers["Content-ID"]] = (headers["Content-Type"], body)
+
+    metadata = json.loads(parts["<metadata>"][1])
+    assert metadata == {"image": {"$part": "image"}, "grid_size": 5,
+                        "nested": {"strokes": {"$part": "nested.strokes"}}}
+    assert parts["<image>"] == ("image/png", PNG)
+    assert parts["<nested.strokes>"] == ("application/octet-stream", b"\x53\x4b\x01\x00")
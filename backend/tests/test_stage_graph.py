@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from stage_graph import Stage, StageGraph
+
+
+def counting_graph(calls):
+    def stage(name, fn, inputs, outputs):
+        def wrapped(*args):
+            calls.append(name)
+            return fn(*args)
+        return Stage(name, wrapped, inputs, outputs)
+
+    return StageGraph([
+        stage("double", lambda x: 2 * x, ["x"], ["doubled"]),
+        stage("split", lambda d: (d - 1, d + 1), ["doubled"], ["low", "high"]),
+        stage("sum", lambda lo, hi: lo + hi, ["low", "high"], ["total"]),
+        stage("square", lambda x: x * x, ["x"], ["squared"]),
+    ], sources=["x"])
+
+
+def test_run_computes_only_what_the_outputs_need():
+    calls = []
+    graph = counting_graph(calls)
+    assert graph.run({"x": 3}, ["total"]) == {"total": 12}
+    assert calls == ["double", "split", "sum"]
+
+
+def test_values_are_a_memo_across_runs():
+    calls = []
+    graph = counting_graph(calls)
+    values = {"x": 3}
+    graph.run(values, ["low"])
+    graph.run(values, ["total", "squared"])
+    assert calls == ["double", "split", "sum", "square"]
+    assert values["total"] == 12 and values["squared"] == 9
+
+
+def test_run_parallel_matches_run():
+    graph = counting_graph([])
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parallel = graph.run_parallel({"x": 5}, ["total", "squared"], executor)
+    assert parallel == graph.run({"x": 5}, ["total", "squared"]) == {"total": 20, "squared": 25}
+
+
+def test_timings_are_recorded_per_stage():
+    timings = {}
+    counting_graph([]).run({"x": 1}, ["total"], timings)
+    assert set(timings) == {"double", "split", "sum"}
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_before_hook_can_adjust_inputs_and_skip_stages(parallel):
+    calls = []
+    graph = counting_graph(calls)
+
+    def before(stage, values):
+        if stage.name == "double":
+            values["x"] = 10
+        if stage.name == "sum":
+            values["total"] = None
+
+    values = {"x": 1}
+    if parallel:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            result = graph.run_parallel(values, ["total", "squared"], executor, before=before)
+    else:
+        result = graph.run(values, ["total", "squared"], before=before)
+    assert result == {"total": None, "squared": 100}
+    assert sorted(calls) == ["double", "split", "square"]
+    assert values["high"] == 21
+
+
+def test_skipping_keeps_stages_other_outputs_still_need():
+    calls = []
+    graph = counting_graph(calls)
+
+    def before(stage, values):
+        if stage.name == "sum":
+            values["total"] = None
+
+    assert graph.run({"x": 2}, ["total", "high"], before=before) == {"total": None, "high": 5}
+    assert calls == ["double", "split"]
+
+
+def test_construction_rejects_inconsistent_graphs():
+    with pytest.raises(ValueError, match="produced twice"):
+        StageGraph([Stage("a", int, ["x"], ["y"]), Stage("b", int, ["x"], ["y"])], sources=["x"])
+    with pytest.raises(ValueError, match="unknown inputs"):
+        StageGraph([Stage("a", int, ["nope"], ["y"])])
+
+
+def test_plan_errors():
+    graph = counting_graph([])
+    with pytest.raises(ValueError, match="not provided"):
+        graph.run({}, ["total"])
+    with pytest.raises(ValueError, match="Unknown output"):
+        graph.run({"x": 1}, ["missing"])
+    cyclic = StageGraph([Stage("a", int, ["b"], ["a"]), Stage("b", int, ["a"], ["b"])])
+    with pytest.raises(ValueError, match="Cycle"):
+        cyclic.plan(["a"])
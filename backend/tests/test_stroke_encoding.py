@@ -0,0 +1,66 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from stroke_encoding import (
+    MAX_STROKE_POINTS, decode_strokes, encode_strokes, rescale_strokes_base64, strokes_to_base64, trace_strokes,
+)
+
+
+def test_round_trip():
+    strokes = [np.array([[5, 7], [6, 7], [40, 2], [0, 90]]), np.array([[100, 100]])]
+    decoded, width, height = decode_strokes(encode_strokes(strokes, 120, 95))
+    assert (width, height) == (120, 95)
+    assert len(decoded) == 2
+    for original, result in zip(strokes, decoded):
+        np.testing.assert_array_equal(original, result)
+
+
+def test_empty_stroke_list():
+    assert decode_strokes(encode_strokes([], 10, 20)) == ([], 10, 20)
+
+
+def test_long_strokes_are_split_into_chained_chunks():
+    points = np.stack([np.arange(MAX_STROKE_POINTS + 10) % 500, np.arange(MAX_STROKE_POINTS + 10) // 500], axis=1)
+    decoded, _, _ = decode_strokes(encode_strokes([points], 500, 500))
+    assert [len(chunk) for chunk in decoded] == [MAX_STROKE_POINTS, 11]
+    # The second chunk starts on the last point of the first, so nothing is lost between them
+    np.testing.assert_array_equal(np.concatenate([decoded[0], decoded[1][1:]]), points)
+
+
+@pytest.mark.parametrize("strokes, width, height", [
+    ([np.array([[1, 1]])], 40000, 10),
+    ([np.array([[0, 0], [1, 1]])] * 40000, 10, 10),
+    ([np.array([[0, 0], [33000, 0]])], 30000, 10),
+])
+def test_values_outside_int16_are_refused(strokes, width, height):
+    with pytest.raises(ValueError, match="int16"):
+        encode_strokes(strokes, width, height)
+
+
+def test_decode_rejects_other_blobs():
+    with pytest.raises(ValueError):
+        decode_strokes(b"\x89PNG\r\n\x1a\n0000")
+    with pytest.raises(ValueError):
+        decode_strokes(b"")
+
+
+def test_rescale_maps_points_onto_the_new_size():
+    encoded = strokes_to_base64([np.array([[10, 20], [30, 40]])], 100, 200)
+    decoded, width, height = decode_strokes(base64.b64decode(rescale_strokes_base64(encoded, 200, 100)))
+    assert (width, height) == (200, 100)
+    np.testing.assert_array_equal(decoded[0], [[20, 10], [60, 20]])
+
+
+def test_trace_strokes_follows_a_drawn_line():
+    skeleton = np.zeros((50, 80), np.uint8)
+    cv2.line(skeleton, (5, 10), (70, 10), 255, 1)
+    cv2.line(skeleton, (10, 30), (10, 45), 255, 1)
+    strokes = trace_strokes(skeleton, epsilon=0)
+    assert [len(s) for s in strokes] == [66, 16]
+    assert {tuple(strokes[0][0]), tuple(strokes[0][-1])} == {(5, 10), (70, 10)}
+    decoded, _, _ = decode_strokes(encode_strokes(strokes, 80, 50))
+    for original, result in zip(strokes, decoded):
+        np.testing.assert_array_equal(original, result)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from tile_encoding import MAX_GRID, canonical_tiles, tile_distance, tile_variants, tiles_from_text, tiles_to_text
+
+
+def sample_codes():
+    return np.array([[0x01, 0x12, 0xF0], [0x3C, 0x00, 0xFF]], dtype=np.uint8)
+
+
+def test_text_round_trip():
+    codes = sample_codes()
+    text = tiles_to_text(codes)
+    assert text == "2x3:0112f03c00ff"
+    np.testing.assert_array_equal(tiles_from_text(text), codes)
+    np.testing.assert_array_equal(tiles_from_text(text.upper()), codes)
+
+
+def test_none_has_no_text_form():
+    assert tiles_to_text(None) is None
+
+
+@pytest.mark.parametrize("text", [
+    None, "", "2x3", "2x3:zz", "2by3:00", "2x3:0011",
+    "0x0:", f"{MAX_GRID + 1}x1:" + "00" * (MAX_GRID + 1),
+])
+def test_malformed_text_is_a_value_error(text):
+    with pytest.raises(ValueError):
+        tiles_from_text(text)
+
+
+def test_variants_cover_the_square_symmetries():
+    codes = sample_codes()
+    variants = tile_variants(codes)
+    assert len(variants) == 8
+    assert sum(v.shape == (2, 3) for v in variants) == 4
+    # The first variant is the code itself
+    np.testing.assert_array_equal(variants[0], codes)
+
+
+def test_rotated_designs_compare_equal():
+    codes = sample_codes()
+    for variant in tile_variants(codes):
+        np.testing.assert_array_equal(canonical_tiles(variant), canonical_tiles(codes))
+        assert tile_distance(codes, variant) == tile_distance(variant, codes) == 0
+
+
+def test_tile_distance_counts_differing_bits():
+    codes = sample_codes()
+    changed = codes.copy()
+    changed[0, 0] ^= 0x0F
+    assert tile_distance(codes, changed) == pytest.approx(4 / (8 * codes.size))
+    assert tile_distance(codes, np.zeros((4, 4), np.uint8)) is None
@@ -0,0 +1,227 @@
+import cv2
+import numpy as np
+
+# One uint8 per pulli cell. Bits 0-3: the line crosses the cell edge midway
+# to the N, E, S, W neighbour; bits 4-7: it arcs round the pulli through the
+# NE, SE, SW, NW quadrant. 0xF0 is a loop round the pulli, 0xFF a loop with
+# four spokes; the codes of a sikku kolam use a small subset of the 256.
+EDGE_BITS = ((0, (0, -1)), (1, (1, 0)), (2, (0, 1)), (3, (-1, 0)))
+QUADRANT_BITS = ((4, (1, -1)), (5, (1, 1)), (6, (-1, 1)), (7, (-1, -1)))
+
+ARC_RADIUS = 0.35            # quadrant sample / arc radius, as a fraction of the pulli spacing
+SAMPLE_REACH = 0.08          # how far from a sample point a skeleton pixel still counts, same units
+MAX_GRID = 25                # largest lattice side, as for regional pattern grids
+LATTICE_TOLERANCE = 0.15     # how far off a lattice point a dot may sit, as a fraction of the spacing
+MAX_SPACINGS = 12            # candidate spacings tried by the lattice fit
+MAX_LATTICE_DOTS = 96        # highest-contrast candidates voted on; the fit is quadratic in their number
+EMPTY_CELL_COST = 0.5        # lattice score: +1 per dot on the lattice, -this per lattice point without one
+
+# Where each bit goes when the code is rotated 90 degrees clockwise / mirrored left-right
+_ROTATE_BITS = (1, 2, 3, 0, 5, 6, 7, 4)
+_MIRROR_BITS = (0, 3, 2, 1, 7, 6, 5, 4)
+
+
+def _bit_table(destinations):
+    table = np.zeros(256, dtype=np.uint8)
+    for code in range(256):
+        table[code] = sum(1 << destinations[bit] for bit in range(8) if code >> bit & 1)
+    return table
+
+
+ROTATE_TABLE = _bit_table(_ROTATE_BITS)
+MIRROR_TABLE = _bit_table(_MIRROR_BITS)
+
+
+def dot_lattice(detected_dots):
+    """
+    Fit an axis-aligned square lattice to (x, y, r) dot candidates.
+    Returns (origin x, origin y, spacing, rows, cols) or None.
+
+    Hough also fires on line junctions, so the candidates are voted on: each
+    distance between two dots in a row or column (binned to 2%) is tried as the spacing and each
+    dot as the anchor, and the lattice with the most dots on it and the
+    fewest empty points wins (half the true spacing fits the junctions too,
+    but leaves most of its points empty). Spacing and origin are then refined
+    by least squares over the dots on the winning lattice.
+    """
+    detected_dots = detected_dots[:MAX_LATTICE_DOTS]
+    if len(detected_dots) < 2:
+        return None
+    points = np.array([(x, y) for x, y, r in detected_dots], dtype=np.float64)
+    # offsets[i, j]: dot j relative to anchor i
+    offsets = points[None, :, :] - points[:, None, :]
+    distances = np.linalg.norm(offsets, axis=2)
+    # The spacing is the distance between two dots in the same row or column
+    aligned = np.abs(offsets).min(axis=2) < LATTICE_TOLERANCE * distances
+    distances = distances[aligned & (distances >= 2 * max(r for x, y, r in detected_dots))]
+    if len(distances) == 0:
+        return None
+    bins, votes = np.unique(np.round(np.log(distances) / np.log(1.02)), return_counts=True)
+    # On a lattice the spacing recurs between many pairs; only the commonest bins are tried
+    bins = bins[np.argsort(-votes, kind="stable")[:MAX_SPACINGS]]
+
+    best, best_score = None, 0.0
+    for spacing in np.exp(bins * np.log(1.02)):
+        units = offsets / spacing
+        index = np.round(units)
+        inliers = (np.abs(units - index) < LATTICE_TOLERANCE).all(axis=2)
+        low = np.where(inliers[..., None], index, np.inf).min(axis=1)
+        high = np.where(inliers[..., None], index, -np.inf).max(axis=1)
+        cols, rows = (high - low + 1).T
+        # Dots on distinct lattice points; at a large spacing several dots can share one
+        outside = np.iinfo(np.int64).max
+        cells = index.astype(np.int64)
+        keys = np.where(inliers, cells[..., 0] * 4096 + cells[..., 1], outside)
+        keys.sort(axis=1)
+        counts = (np.diff(keys, axis=1) > 0).sum(axis=1) + 1 - (keys == outside).any(axis=1)
+        scores = np.where((rows <= MAX_GRID) & (cols <= MAX_GRID),
+                          counts - EMPTY_CELL_COST * (rows * cols - counts), -np.inf)
+        anchor = int(np.argmax(scores))
+        if scores[anchor] > best_score:
+            best_score = scores[anchor]
+            best = inliers[anchor], index[anchor] - low[anchor], int(rows[anchor]), int(cols[anchor])
+    if best is None:
+        return None
+
+    inliers, index, rows, cols = best
+    # points = origin + index * spacing, solved jointly over x and y
+    count = int(inliers.sum())
+    design = np.zeros((2 * count, 3))
+    design[:count, 0] = design[count:, 1] = 1
+    design[:, 2] = np.concatenate([index[inliers, 0], index[inliers, 1]])
+    targets = np.concatenate([points[inliers, 0], points[inliers, 1]])
+    (origin_x, origin_y, spacing), *_ = np.linalg.lstsq(design, targets, rcond=None)
+    return float(origin_x), float(origin_y), float(spacing), rows, cols
+
+
+def classify_tiles(skeleton, detected_dots):
+    """
+    Symbolic tile code of a pulli kolam: a (rows, cols) uint8 array, one code
+    per lattice cell (see EDGE_BITS / QUADRANT_BITS), or None without a lattice.
+
+    Each bit is a probe: a skeleton pixel within SAMPLE_REACH of the edge
+    midpoint or of the quadrant point at ARC_RADIUS from the pulli.
+    """
+    lattice = dot_lattice(detected_dots)
+    if lattice is None:
+        return None
+    origin_x, origin_y, spacing, rows, cols = lattice
+    height, width = skeleton.shape[:2]
+    reach = max(2, int(round(SAMPLE_REACH * spacing)))
+    diagonal = ARC_RADIUS * spacing / np.sqrt(2)
+
+    probes = [(bit, dx * spacing / 2, dy * spacing / 2) for bit, (dx, dy) in EDGE_BITS]
+    probes += [(bit, dx * diagonal, dy * diagonal) for bit, (dx, dy) in QUADRANT_BITS]
+
+    codes = np.zeros((rows, cols), dtype=np.uint8)
+    for row in range(rows):
+        for col in range(cols):
+            cx, cy = origin_x + col * spacing, origin_y + row * spacing
+            code = 0
+            for bit, dx, dy in probes:
+                x, y = int(round(cx + dx)), int(round(cy + dy))
+                if 0 <= x < width and 0 <= y < height and \
+                        skeleton[max(0, y - reach):y + reach + 1, max(0, x - reach):x + reach + 1].any():
+                    code |= 1 << bit
+            codes[row, col] = code
+    return codes
+
+
+def render_tiles(codes, size, color=(60, 40, 160), background=255, dot_color=(0, 0, 0)):
+    """
+    Redraw a tile code as a clean size x size BGR image at any resolution:
+    quarter arcs round each pulli, spokes out to the crossed edges, then the pulli.
+    """
+    img = np.full((size, size, 3), background, dtype=np.uint8)
+    rows, cols = codes.shape
+    # Same layout as the regional pattern tiles (pattern_render)
+    border = size * 0.1
+    spacing = (size - 2 * border) / max(rows, cols)
+    left = border + (max(rows, cols) - cols) * spacing / 2 + spacing / 2
+    top = border + (max(rows, cols) - rows) * spacing / 2 + spacing / 2
+
+    line_width = max(1, int(spacing / 12))
+    dot_radius = max(1, int(spacing / 14))
+    radius = ARC_RADIUS * spacing
+    # Sub-pixel coordinates: cv2 drawing functions take 2**SHIFT fixed point
+    shift = 4
+    one = 1 << shift
+
+    def fixed(x, y):
+        return int(round(x * one)), int(round(y * one))
+
+    for row in range(rows):
+        for col in range(cols):
+            code = int(codes[row, col])
+            cx, cy = left + col * spacing, top + row * spacing
+            for bit, (dx, dy) in QUADRANT_BITS:
+                if code >> bit & 1:
+                    # cv2 angles run clockwise from +x (image y points down)
+                    start = {(1, -1): 270, (1, 1): 0, (-1, 1): 90, (-1, -1): 180}[(dx, dy)]
+                    cv2.ellipse(img, fixed(cx, cy), fixed(radius, radius), 0, start, start + 90,
+                                color, line_width, cv2.LINE_AA, shift)
+            for bit, (dx, dy) in EDGE_BITS:
+                if code >> bit & 1:
+                    cv2.line(img, fixed(cx + dx * radius, cy + dy * radius),
+                             fixed(cx + dx * spacing / 2, cy + dy * spacing / 2),
+                             color, line_width, cv2.LINE_AA, shift)
+
+    for row in range(rows):
+        for col in range(cols):
+            cv2.circle(img, fixed(left + col * spacing, top + row * spacing), dot_radius * one,
+                       dot_color, -1, cv2.LINE_AA, shift)
+    return img
+
+
+# ---------- Text form ----------
+
+def tiles_to_text(codes):
+    """Compact text form, "<rows>x<cols>:<hex codes row-major>" (e.g. 5x5 is 54 characters)"""
+    if codes is None:
+        return None
+    rows, cols = codes.shape
+    return f"{rows}x{cols}:{codes.tobytes().hex()}"
+
+
+def tiles_from_text(text):
+    """Inverse of tiles_to_text; raises ValueError on a malformed code"""
+    try:
+        shape, hex_codes = text.split(":")
+        rows, cols = (int(n) for n in shape.lower().split("x"))
+        data = bytes.fromhex(hex_codes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Malformed tile code '{text}'")
+    if not (1 <= rows <= MAX_GRID and 1 <= cols <= MAX_GRID) or len(data) != rows * cols:
+        raise ValueError(f"Tile code '{text}' does not match its {rows}x{cols} shape")
+    return np.frombuffer(data, dtype=np.uint8).reshape(rows, cols)
+
+
+# ---------- Matching ----------
+
+def tile_variants(codes):
+    """The code under the 8 rotations and reflections of the square"""
+    variants = []
+    for mirrored in (codes, MIRROR_TABLE[codes[:, ::-1]]):
+        current = mirrored
+        for _ in range(4):
+            variants.append(current)
+            current = ROTATE_TABLE[np.rot90(current, -1)]
+    return variants
+
+
+def canonical_tiles(codes):
+    """One representative per rotation/reflection class, so equal designs compare equal"""
+    return min(tile_variants(codes), key=lambda v: (v.shape, v.tobytes()))
+
+
+def tile_distance(a, b):
+    """
+    Fraction of differing bits between two codes under the best rotation or
+    reflection of `b` (0 = same design); None if no variant has a's shape.
+    """
+    best = None
+    for variant in tile_variants(b):
+        if variant.shape == a.shape:
+            differing = int(np.unpackbits(np.bitwise_xor(a, variant)).sum())
+            best = differing if best is None else min(best, differing)
+    return None if best is None else best / (8 * a.size)
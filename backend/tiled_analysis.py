@@ -0,0 +1,245 @@
+import cv2
+import numpy as np
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import runtime_budget
+from kolam_processor import binarize, detect_dots, skeletonize, estimate_grid_size
+
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_OVERLAP = 64        # must exceed the Hough edge margin plus the largest dot radius
+MIN_PATH_PIXELS = 10        # same significance threshold as step 6
+DOT_MERGE_DISTANCE = 15     # same minimum spacing as detect_dots
+PREVIEW_SIZE = 1024
+MAX_REPORTED_PATHS = 50
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, a):
+        parent = self.parent.setdefault(a, a)
+        if parent != a:
+            parent = self.parent[a] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def tile_layout(height, width, tile_size, overlap):
+    """Core boxes partition the image; each tile is processed with `overlap` px of context"""
+    tiles = []
+    for row, y0 in enumerate(range(0, height, tile_size)):
+        for col, x0 in enumerate(range(0, width, tile_size)):
+            y1, x1 = min(y0 + tile_size, height), min(x0 + tile_size, width)
+            tiles.append({
+                "row": row,
+                "col": col,
+                "core": (y0, y1, x0, x1),
+                "padded": (max(0, y0 - overlap), min(height, y1 + overlap),
+                           max(0, x0 - overlap), min(width, x1 + overlap)),
+            })
+    return tiles
+
+
+def process_tile(gray_img, tile, preview_scale):
+    """Threshold, detect dots and skeletonize one tile; returns only compact results"""
+    py0, py1, px0, px1 = tile["padded"]
+    y0, y1, x0, x1 = tile["core"]
+    crop = gray_img[py0:py1, px0:px1]
+
+    # Dots: keep those near the core so seam duplicates can be merged globally
+    dots = []
+    for x, y, r in detect_dots(crop, max_dots=None, fallback=False, verbose=False):
+        gx, gy = x + px0, y + py0
+        if (x0 - DOT_MERGE_DISTANCE <= gx < x1 + DOT_MERGE_DISTANCE and
+                y0 - DOT_MERGE_DISTANCE <= gy < y1 + DOT_MERGE_DISTANCE):
+            roi = crop[max(0, y - r):y + r + 1, max(0, x - r):x + r + 1]
+            dots.append((gx, gy, r, float(np.std(roi))))
+
+    # Skeleton of the padded tile, cropped back to the core
+    skeleton = skeletonize(binarize(crop))
+    core = skeleton[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+    del skeleton
+
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+        (core > 0).astype(np.uint8), connectivity=8
+    )
+    components = {
+        label: (int(stats[label, cv2.CC_STAT_AREA]),
+                int(stats[label, cv2.CC_STAT_LEFT]) + x0,
+                int(stats[label, cv2.CC_STAT_TOP]) + y0,
+                int(stats[label, cv2.CC_STAT_LEFT] + stats[label, cv2.CC_STAT_WIDTH]) + x0,
+                int(stats[label, cv2.CC_STAT_TOP] + stats[label, cv2.CC_STAT_HEIGHT]) + y0)
+        for label in range(1, n_labels)
+    }
+
+    # Downscaled skeleton for the stitched preview
+    preview_box = tuple(int(round(v * preview_scale)) for v in (y0, y1, x0, x1))
+    preview_h, preview_w = preview_box[1] - preview_box[0], preview_box[3] - preview_box[2]
+    preview = None
+    if preview_h > 0 and preview_w > 0:
+        preview = cv2.resize(core, (preview_w, preview_h), interpolation=cv2.INTER_AREA)
+
+    return {
+        "dots": dots,
+        "components": components,
+        "skeleton_pixels": int(cv2.countNonZero(core)),
+        # Only the label strips along the core border are needed to stitch seams
+        "edges": {
+            "top": labels[0, :].copy(),
+            "bottom": labels[-1, :].copy(),
+            "left": labels[:, 0].copy(),
+            "right": labels[:, -1].copy(),
+        },
+        "preview": preview,
+        "preview_box": preview_box,
+    }
+
+
+def _union_edges(uf, a_id, a_edge, b_id, b_edge):
+    """Union labels of two facing border strips under 8-connectivity"""
+    n = min(len(a_edge), len(b_edge))
+    for shift in (-1, 0, 1):
+        a = a_edge[max(0, shift):n + min(0, shift)]
+        b = b_edge[max(0, -shift):n - max(0, shift)]
+        touching = (a > 0) & (b > 0)
+        for la, lb in set(zip(a[touching].tolist(), b[touching].tolist())):
+            uf.union((a_id, la), (b_id, lb))
+
+
+def stitch_paths(tiles, results):
+    """Merge per-tile skeleton components that continue across tile seams"""
+    uf = _UnionFind()
+    by_position = {(t["row"], t["col"]): i for i, t in enumerate(tiles)}
+
+    for i, tile in enumerate(tiles):
+        for label in results[i]["components"]:
+            uf.find((i, label))
+
+        right = by_position.get((tile["row"], tile["col"] + 1))
+        if right is not None:
+            _union_edges(uf, i, results[i]["edges"]["right"], right, results[right]["edges"]["left"])
+
+        below = by_position.get((tile["row"] + 1, tile["col"]))
+        if below is not None:
+            _union_edges(uf, i, results[i]["edges"]["bottom"], below, results[below]["edges"]["top"])
+
+        # Diagonal neighbours touch only through their corner pixels
+        for d_col, own, other in ((1, -1, 0), (-1, 0, -1)):
+            diagonal = by_position.get((tile["row"] + 1, tile["col"] + d_col))
+            if diagonal is None:
+                continue
+            la = results[i]["edges"]["bottom"][own]
+            lb = results[diagonal]["edges"]["top"][other]
+            if la > 0 and lb > 0:
+                uf.union((i, int(la)), (diagonal, int(lb)))
+
+    merged = {}
+    for i, result in enumerate(results):
+        for label, (area, x0, y0, x1, y1) in result["components"].items():
+            root = uf.find((i, label))
+            if root in merged:
+                m = merged[root]
+                merged[root] = (m[0] + area, min(m[1], x0), min(m[2], y0), max(m[3], x1), max(m[4], y1))
+            else:
+                merged[root] = (area, x0, y0, x1, y1)
+
+    paths = [
+        {"pixels": area, "bbox": [x0, y0, x1 - x0, y1 - y0]}
+        for area, x0, y0, x1, y1 in merged.values()
+        if area > MIN_PATH_PIXELS
+    ]
+    paths.sort(key=lambda p: p["pixels"], reverse=True)
+    return paths
+
+
+def merge_dots(dots, min_distance=DOT_MERGE_DISTANCE):
+    """Greedy merge of dots detected twice in tile overlaps, best contrast first"""
+    dots = sorted(dots, key=lambda d: d[3], reverse=True)
+    cell = float(min_distance)
+    buckets = {}
+    kept = []
+
+    for x, y, r, quality in dots:
+        cx, cy = int(x // cell), int(y // cell)
+        duplicate = False
+        for nx in (cx - 1, cx, cx + 1):
+            for ny in (cy - 1, cy, cy + 1):
+                for kx, ky in buckets.get((nx, ny), ()):
+                    if (x - kx) ** 2 + (y - ky) ** 2 < min_distance ** 2:
+                        duplicate = True
+                        break
+                if duplicate:
+                    break
+            if duplicate:
+                break
+        if not duplicate:
+            buckets.setdefault((cx, cy), []).append((x, y))
+            kept.append((x, y, r))
+    return kept
+
+
+def analyze_tiled(gray_img, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP, workers=None):
+    """
+    Tiled analysis of a large grayscale image.
+
+    Thresholding, dot detection and skeletonization run per tile on a thread
+    pool (OpenCV releases the GIL), so working memory is bounded by
+    workers x tile size; only the grayscale input is image-sized. Dots found
+    twice in overlaps are merged and skeleton paths are stitched across seams.
+    """
+    start = time.perf_counter()
+    height, width = gray_img.shape[:2]
+    tiles = tile_layout(height, width, tile_size, overlap)
+    preview_scale = min(1.0, PREVIEW_SIZE / max(height, width))
+    workers = workers or runtime_budget.executor_workers()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda tile: process_tile(gray_img, tile, preview_scale), tiles))
+    tiles_done = time.perf_counter()
+
+    dots = merge_dots([dot for result in results for dot in result["dots"]])
+    paths = stitch_paths(tiles, results)
+
+    preview = np.zeros((int(round(height * preview_scale)), int(round(width * preview_scale))), np.uint8)
+    for result in results:
+        if result["preview"] is not None:
+            y0, y1, x0, x1 = result["preview_box"]
+            preview[y0:y1, x0:x1] = result["preview"]
+    ok, preview_png = cv2.imencode(".png", preview)
+
+    print(f"✓ Tiled analysis: {len(tiles)} tiles of {tile_size}px on {workers} threads - "
+          f"{len(dots)} dots, {len(paths)} paths")
+
+    return {
+        "image_shape": [height, width],
+        "tile_size": tile_size,
+        "overlap": overlap,
+        "tiles": len(tiles),
+        "workers": workers,
+        "dots": [list(d) for d in dots],
+        "detected_dots_count": len(dots),
+        "grid_size": estimate_grid_size(dots),
+        "paths_count": len(paths),
+        "paths": paths[:MAX_REPORTED_PATHS],
+        "skeleton_pixels": sum(result["skeleton_pixels"] for result in results),
+        "skeleton_preview": base64.b64encode(preview_png.tobytes()).decode("utf-8"),
+        "timings_ms": {
+            "tiles": round((tiles_done - start) * 1000, 1),
+            "merge": round((time.perf_counter() - tiles_done) * 1000, 1),
+        },
+    }
+
+
+def analyze_tiled_bytes(image_bytes, **kwargs):
+    """Decode straight to grayscale (1 byte/px) and run the tiled analysis"""
+    gray_img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray_img is None:
+        raise ValueError("Could not decode image")
+    return analyze_tiled(gray_img, **kwargs)
@@ -18,6 +18,8 @@ import LoginTest from './components/LoginTest';
 import { CartProvider } from './contexts/CartContext';
 import { AuthProvider, useAuth } from './contexts/AuthContext';
 
+const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
+
 function App() {
   const [selectedFile, setSelectedFile] = useState(null);
   const [uploading, setUploading] = useState(false);
@@ -78,7 +80,6 @@ function AppContent({
     formData.append('file', selectedFile);
 
     try {
-      const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
       const response = await fetch(`${API_URL}/predict`, {
         method: 'POST',
         body: formData,
@@ -292,7 +293,7 @@ function AppContent({
                 <h2>✨ Your Kolam Pattern</h2>
                 <p>Preserving the beautiful traditional design you uploaded</p>
                 <img 
-                  src={`data:image/png;base64,${result.recreated_input}`} 
+                  src={`${API_URL}${result.recreated_input_url}`} 
                   alt="Your Kolam Pattern" 
                   className="result-image"
                 />